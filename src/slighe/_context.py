@@ -0,0 +1,257 @@
+from typing import Generator, Optional, TypeVar
+from dataclasses import dataclass, field
+from collections import defaultdict
+from itertools import count as _count
+import contextlib
+import threading
+import json
+import time
+import sys
+import os
+
+try: import resource
+except ImportError: resource = None
+
+T = TypeVar('T')
+
+_ENABLED = False
+_ECHO = False
+
+@dataclass
+class Span:
+    name: str
+    span_id: int
+    parent_id: Optional[int]
+    thread_id: int
+    start: float
+    end: float = None
+    peak_rss: Optional[int] = None
+    traced_memory: Optional[tuple[int, int]] = None
+    blocks: Optional[int] = None
+    counters: dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    attrs: dict = field(default_factory=dict)
+
+    @property
+    def duration(self) -> float: return (self.end or time.perf_counter()) - self.start
+
+class _Recorder:
+    """
+    Holds the spans and counters of an instrumented run, one span stack per thread, and the calls and
+    total seconds of every timing() block whether enabled or not
+    """
+    def __init__(self) -> None:
+        self.spans: list[Span] = []
+        self.counters: dict[str, int] = defaultdict(int)
+        self.timings: dict[str, list] = defaultdict(lambda: [0, 0.0])
+        self.origin = time.perf_counter()
+        self.profiler = None
+        self.stats = None
+        self._ids = _count(1)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @property
+    def stack(self) -> list[Span]:
+        if not hasattr(self._local, 'stack'): self._local.stack = []
+        return self._local.stack
+
+    def open(self, name: str, attrs: dict) -> Span:
+        stack = self.stack
+        span = Span(name, next(self._ids), stack[-1].span_id if stack else None, threading.get_ident(), time.perf_counter(), attrs=attrs)
+        if _tracemalloc_on(): span.blocks = sys.getallocatedblocks()
+        stack.append(span)
+        with self._lock: self.spans.append(span)
+        return span
+
+    def close(self, span: Span) -> None:
+        span.end, span.peak_rss = time.perf_counter(), peak_rss()
+        if _tracemalloc_on(): span.traced_memory = _tracemalloc().get_traced_memory()
+        if span.blocks is not None: span.counters['objects_allocated'] += allocated_since(span)
+        if self.stack and self.stack[-1] is span: self.stack.pop()
+
+    def count(self, name: str, n: int) -> None:
+        with self._lock: self.counters[name] += n
+        if self.stack: self.stack[-1].counters[name] += n
+
+    def time(self, name: str, seconds: float) -> None:
+        with self._lock:
+            timing = self.timings[name]
+            timing[0], timing[1] = timing[0] + 1, timing[1] + seconds
+
+_RECORDER = _Recorder()
+_HOOKS: set[str] = set()
+
+def _tracemalloc():
+    import tracemalloc
+    return tracemalloc
+
+def _tracemalloc_on() -> bool: return 'tracemalloc' in _HOOKS
+
+def allocated_since(span: Span) -> int:
+    """
+    objects (allocated memory blocks) the process gained since span opened, 0 when it freed more than it allocated
+    """
+    return max(0, sys.getallocatedblocks() - span.blocks)
+
+def peak_rss() -> Optional[int]:
+    """
+    peak resident set size of the process in bytes, None where the platform cannot report it
+    """
+    if resource is not None:
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == 'darwin' else rss * 1024
+    try: import psutil
+    except ImportError: return None
+    info = psutil.Process().memory_info()
+    return getattr(info, 'peak_wset', info.rss)
+
+def enable(cprofile: bool = False, tracemalloc: bool = False, echo: Optional[bool] = None) -> None:
+    """
+    Start recording spans and counters, spans opened before this call are not recorded
+
+    cprofile: bool = False
+        also run cProfile over everything until disable(), see export_pstats
+    tracemalloc: bool = False
+        trace python allocations, record traced current/peak bytes and an objects_allocated counter on every
+        span, and objects_allocated.<name> for every counted() constructor
+    echo: bool = None
+        also print the LOG lines of timing() to stdout, left unchanged when None (off by default)
+    """
+    global _ENABLED
+    if echo is not None: configure(echo=echo)
+    if cprofile and _RECORDER.profiler is None:
+        import cProfile
+        _RECORDER.profiler = cProfile.Profile()
+        _RECORDER.profiler.enable()
+        _HOOKS.add('cprofile')
+    if tracemalloc and not _tracemalloc().is_tracing():
+        _tracemalloc().start()
+        _HOOKS.add('tracemalloc')
+    _ENABLED = True
+
+def disable() -> None:
+    global _ENABLED
+    _ENABLED = False
+    if _RECORDER.profiler is not None:
+        _RECORDER.profiler.disable()
+        _RECORDER.stats = _RECORDER.profiler
+        _RECORDER.profiler = None
+        _HOOKS.discard('cprofile')
+    if 'tracemalloc' in _HOOKS: _tracemalloc().stop(); _HOOKS.discard('tracemalloc')
+
+def enabled() -> bool: return _ENABLED
+
+def configure(echo: bool = False) -> None:
+    """
+    echo: bool = False
+        print a LOG line when a timing() block starts and how long it took when it ends
+    """
+    global _ECHO
+    _ECHO = echo
+
+def reset() -> None:
+    global _RECORDER
+    disable()
+    _HOOKS.clear()
+    _RECORDER = _Recorder()
+
+def spans() -> list[Span]: return list(_RECORDER.spans)
+
+def counters() -> dict[str, int]: return dict(_RECORDER.counters)
+
+def timings() -> dict[str, dict]:
+    """
+    calls and total seconds of every timing() block since the last reset()
+    """
+    return {name: {'calls': calls, 'seconds': seconds} for name, (calls, seconds) in _RECORDER.timings.items()}
+
+def count(name: str, n: int = 1) -> None:
+    """
+    Add n to a named counter, and to the innermost open span, no-op unless enabled
+    """
+    if _ENABLED: _RECORDER.count(name, n)
+
+def counted(name: str, objects: T, scanned: int = None) -> T:
+    """
+    Count the rows a constructor matched (one object each) and pass its result through, with the tracemalloc
+    hook also the objects allocated since the constructor's build span opened
+    """
+    if _ENABLED:
+        _RECORDER.count(f'rows_matched.{name}', len(objects))
+        if scanned is not None: _RECORDER.count(f'rows_scanned.{name}', scanned)
+        stack = _RECORDER.stack
+        if stack and stack[-1].blocks is not None: _RECORDER.count(f'objects_allocated.{name}', allocated_since(stack[-1]))
+    return objects
+
+@contextlib.contextmanager
+def span(name: str, **attrs) -> Generator[Optional[Span], None, None]:
+    """
+    Nested timing span, the parent is whichever span is open on the same thread
+    yields None and records nothing unless enabled
+    """
+    if not _ENABLED:
+        yield None
+        return
+    s = _RECORDER.open(name, attrs)
+    try: yield s
+    finally: _RECORDER.close(s)
+
+@contextlib.contextmanager
+def timing(fnc_name: str) -> Generator[None, None, None]:
+    """
+    Adds the duration of the block to timings(), and a span when enabled, prints LOG lines only with echo
+    """
+    t0 = time.perf_counter()
+    if _ECHO: print(f'LOG: STARTING PROCESS {fnc_name}')
+    s = _RECORDER.open(fnc_name, {}) if _ENABLED else None
+    try: yield
+    finally:
+        if s is not None: _RECORDER.close(s)
+        seconds = time.perf_counter() - t0
+        _RECORDER.time(fnc_name, seconds)
+        if _ECHO: print(f' ---> {fnc_name} TOOK {round(seconds, 4)} SECONDS')
+
+@contextlib.contextmanager
+def profile(json_path: str = None, trace_path: str = None, pstats_path: str = None, tracemalloc: bool = False) -> Generator[None, None, None]:
+    """
+    Record everything in the block and write the requested exports on the way out
+
+    with _context.profile(trace_path='corridor.trace.json'):
+        CorridorConstructor(...).build()
+    """
+    reset()
+    enable(cprofile=pstats_path is not None, tracemalloc=tracemalloc)
+    try:
+        with span('profile'): yield
+    finally:
+        disable()
+        if json_path: export_json(json_path)
+        if trace_path: export_chrome_trace(trace_path)
+        if pstats_path: export_pstats(pstats_path)
+
+def _span_dict(s: Span) -> dict:
+    return {'name': s.name, 'span_id': s.span_id, 'parent_id': s.parent_id, 'thread_id': s.thread_id, 'start': s.start - _RECORDER.origin,
+            'duration': s.duration, 'peak_rss': s.peak_rss, 'traced_memory': s.traced_memory, 'counters': dict(s.counters),
+            'attrs': {k: str(v) for k, v in s.attrs.items()}}
+
+def export_json(file_path: str) -> None:
+    with open(file_path, 'w') as f:
+        json.dump({'origin': _RECORDER.origin, 'spans': [_span_dict(s) for s in _RECORDER.spans], 'counters': counters(), 'timings': timings(),
+                   'peak_rss': peak_rss()}, f, indent=1)
+
+def export_chrome_trace(file_path: str) -> None:
+    """
+    Chrome trace event format, open with chrome://tracing or ui.perfetto.dev
+    """
+    pid, us = os.getpid(), lambda t: round((t - _RECORDER.origin) * 1e6, 3)
+    events = []
+    for s in _RECORDER.spans:
+        events.append({'name': s.name, 'ph': 'X', 'pid': pid, 'tid': s.thread_id, 'ts': us(s.start), 'dur': round(s.duration * 1e6, 3),
+                       'args': {'span_id': s.span_id, 'parent_id': s.parent_id, **dict(s.counters), **{k: str(v) for k, v in s.attrs.items()}}})
+        if s.peak_rss is not None: events.append({'name': 'peak_rss', 'ph': 'C', 'pid': pid, 'tid': s.thread_id, 'ts': us(s.end or s.start), 'args': {'bytes': s.peak_rss}})
+    with open(file_path, 'w') as f: json.dump({'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': {'counters': counters()}}, f)
+
+def export_pstats(file_path: str) -> None:
+    profiler = _RECORDER.profiler or _RECORDER.stats
+    if profiler is None: raise RuntimeError('cProfile was not enabled, call enable(cprofile=True)')
+    profiler.dump_stats(file_path)
@@ -0,0 +1,126 @@
+from slighe.dtypes import Corridor, CorridorTimetable
+from slighe.constructors import CorridorConstructor, CorrdidorTimetableConstructor
+from slighe import dload
+from slighe import _context
+
+from dataclasses import dataclass
+from collections import OrderedDict
+from typing import Optional, Any, Callable
+import threading
+import hashlib
+import pickle
+import os
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    disk_hits: int = 0
+    disk_writes: int = 0
+
+    @property
+    def hit_rate(self) -> float: return (self.hits + self.disk_hits) / max(1, self.hits + self.disk_hits + self.misses)
+
+    def __str__(self) -> str: return f'HITS: {self.hits} DISK HITS: {self.disk_hits} MISSES: {self.misses} EVICTIONS: {self.evictions} HIT RATE: {round(self.hit_rate, 3)}'
+
+class CorridorCache:
+    """
+    Memoizes built corridors and corridor timetables
+
+    Entries are keyed by (feed fingerprint, kind, corridor_id, sorted route_ids, options), so a new feed
+    version never serves stale builds. The memory tier is an LRU bounded to maxsize entries, when a
+    directory is given every build is also pickled there and survives evictions and restarts.
+
+    Cached objects are shared between callers, treat them as read only (filter_by returns views for this)
+
+    maxsize: int = 128
+        entries held in memory
+    directory: str = None
+        optional on-disk tier
+    """
+    def __init__(self, maxsize: int = 128, directory: str = None) -> None:
+        self.maxsize, self.directory = maxsize, directory
+        self.stats = CacheStats()
+        self._entries: OrderedDict[tuple, Any] = OrderedDict()
+        self._lock = threading.RLock()
+        if directory and not os.path.exists(directory): os.makedirs(directory)
+
+    def __len__(self) -> int: return len(self._entries)
+    def __contains__(self, key: tuple) -> bool: return key in self._entries or bool(self.directory and os.path.exists(self._disk_path(key)))
+
+    @staticmethod
+    def key(gtfs_loader: dload.BaseDataLoader, kind: str, corridor_id: Any, route_ids: list, **options) -> tuple:
+        return (gtfs_loader.fingerprint(), kind, str(corridor_id), tuple(sorted(str(r) for r in route_ids)), tuple(sorted(options.items())))
+
+    def _disk_path(self, key: tuple) -> str: return os.path.join(self.directory, f'{hashlib.sha1(repr(key).encode("utf8")).hexdigest()}.pkl')
+
+    def get(self, key: tuple) -> Optional[Any]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats.hits += 1
+                _context.count('cache.hits')
+                return self._entries[key]
+        if self.directory and os.path.exists(self._disk_path(key)):
+            with open(self._disk_path(key), 'rb') as f: value = pickle.load(f)
+            with self._lock:
+                self.stats.disk_hits += 1
+                self._insert(key, value)
+            _context.count('cache.disk_hits')
+            return value
+        with self._lock: self.stats.misses += 1
+        _context.count('cache.misses')
+        return None
+
+    def put(self, key: tuple, value: Any) -> Any:
+        with self._lock: self._insert(key, value)
+        if self.directory:
+            path = self._disk_path(key)
+            with open(path + '.tmp', 'wb') as f: pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(path + '.tmp', path)
+            with self._lock: self.stats.disk_writes += 1
+        return value
+
+    def _insert(self, key: tuple, value: Any) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+            _context.count('cache.evictions')
+
+    def get_or_build(self, key: tuple, build: Callable[[], Any]) -> Any:
+        value = self.get(key)
+        return value if value is not None else self.put(key, build())
+
+    def clear(self, disk: bool = False) -> None:
+        with self._lock: self._entries.clear()
+        if disk and self.directory:
+            for name in os.listdir(self.directory):
+                if name.endswith('.pkl'): os.remove(os.path.join(self.directory, name))
+
+    def corridor(self, corridor_id: int, corridor_name: str, route_ids: list, gtfs_loader: dload.BaseDataLoader) -> Corridor:
+        return self.get_or_build(self.key(gtfs_loader, 'corridor', corridor_id, route_ids),
+                                 lambda: CorridorConstructor(corridor_id, corridor_name, route_ids, gtfs_loader).build())
+
+    def corridor_timetable(self, corridor_id: int, corridor_name: str, route_ids: list, gtfs_loader: dload.BaseDataLoader,
+                           sort: bool = False, disolve: bool = False, layout: bool = False, interpolate: bool = False) -> CorridorTimetable:
+        """
+        layout: bool = False
+            build with the merged stop order layout, see CorrdidorTimetableConstructor
+        sort: bool = False
+            sort_by_time before caching, ignored with layout
+        disolve: bool = False
+            disolve_stops before caching, ignored with layout
+        interpolate: bool = False
+            interpolate_times before caching, needs layout
+        """
+        if layout: sort = disolve = False # the layout rows are in stop order already, both would be no-ops
+        def build() -> CorridorTimetable:
+            corridor_timetable = CorrdidorTimetableConstructor(self.corridor(corridor_id, corridor_name, route_ids, gtfs_loader), layout).build()
+            if interpolate: corridor_timetable.interpolate_times()
+            if sort: corridor_timetable.sort_by_time()
+            if disolve and corridor_timetable.timetable: corridor_timetable.disolve_stops()
+            return corridor_timetable
+        return self.get_or_build(self.key(gtfs_loader, 'corridor_timetable', corridor_id, route_ids, sort=sort, disolve=disolve, layout=layout, interpolate=interpolate), build)
\ No newline at end of file
@@ -0,0 +1,286 @@
+"""
+slighe command line
+
+    slighe load        parse the feed once and pickle it in the cache directory
+    slighe corridors   corridor timetables for the corridors of a routes_corridors.csv
+    slighe expand      one column per trip again from a corridors --frequency timetable
+    slighe frequency   trips serving a stop on a set of routes inside a time window
+    slighe export      trip timetables
+    slighe discover    routes_corridors.csv from the route stop sets
+    slighe plan        earliest arrival journey between two stops
+    slighe matrix      settlement to settlement travel time matrix
+    slighe validate    referential integrity, ordering, duplicate and time checks over the feed
+    slighe serve       local HTTP service over the feed
+    slighe nta         NTA corridor timetables with pandas (pip install slighe[nta])
+
+Only argparse is imported at start up, every subcommand imports what it needs when it runs, so
+`slighe --help` never pays for the loaders, the planner or pandas. Feed subcommands go through
+dload.GTFSLoadCached: the parsed feed is pickled under its fingerprint in --cache and corridor builds
+are kept there too, so a rerun over an unchanged feed reads the pickles and a fully cached corridor
+run never loads the feed at all.
+"""
+import functools
+import argparse
+import os
+import sys
+
+FEED_FILES = ['agency', 'calendar', 'calendar_dates', 'routes', 'stop_times', 'stops', 'trips']
+DEFAULT_CACHE = os.environ.get('SLIGHE_CACHE', os.path.join('.', '.slighe'))
+
+def _list(value: str) -> list[str]: return [v for v in value.split(',') if v]
+
+def _service_types(names: list[str]) -> list:
+    from slighe.dtypes import ServiceTypes
+    try: return [ServiceTypes[name.upper()] for name in names]
+    except KeyError as e: raise SystemExit(f'unknown service type {e}, expected one of {", ".join(st.name for st in ServiceTypes)}')
+
+def _loader(args: argparse.Namespace):
+    from slighe import dload
+    if args.txc:
+        method, paths, factory = dload.GTFSLoadMethod.from_transxchange, args.txc + [args.stops], lambda: dload.GTFSLoadTXC(*args.txc, stops_path=args.stops)
+    else:
+        paths = [os.path.join(args.feed, f'{name}.csv') for name in FEED_FILES]
+        method, factory = dload.GTFSLoadMethod.from_csv, lambda: dload.GTFSLoadCSV(*paths)
+    if args.no_cache: return factory()
+    return dload.GTFSLoadCached(method, paths, factory, args.cache)
+
+def _corridor_cache(args: argparse.Namespace):
+    from slighe.cache import CorridorCache
+    return CorridorCache(directory=None if args.no_cache else os.path.join(args.cache, 'corridors'))
+
+def _routes_corridors(file_path: str) -> dict[str, list[str]]:
+    import csv
+    corridors = {}
+    with open(file_path, 'r', encoding='utf_8_sig') as f:
+        for row in csv.DictReader(f): corridors.setdefault(row['corridor_id'], []).append(row['route_id'])
+    return corridors
+
+def cmd_load(args: argparse.Namespace) -> int:
+    from slighe import dload
+    loader = _loader(args)
+    tables = loader.loader() if isinstance(loader, dload.GTFSLoadCached) else loader
+    print(f'FEED {loader.fingerprint()}')
+    for file in dload.LoadCSVFiles: print(f'{file.name.lower()}: {len(tables.load(file))} rows')
+    if isinstance(loader, dload.GTFSLoadCached): print(f'CACHED {loader.cache_path}')
+    return 0
+
+def cmd_corridors(args: argparse.Namespace) -> int:
+    corridors = _routes_corridors(args.routes_corridors)
+    if args.corridor: corridors = {c: corridors[c] for c in args.corridor if c in corridors}
+    loader, cache = _loader(args), _corridor_cache(args)
+    filtered = args.start or args.end or args.service_type or args.settlement or args.county
+    if not os.path.exists(args.out): os.makedirs(args.out)
+    for corridor_id, route_ids in corridors.items():
+        corridor_timetable = cache.corridor_timetable(corridor_id, '', route_ids, loader, sort=args.sort, disolve=args.disolve, layout=args.layout or args.interpolate or args.frequency, interpolate=args.interpolate)
+        if not corridor_timetable.timetable:
+            print(f'WARNING: corridor {corridor_id} has no timetable'); continue
+        path = os.path.join(args.out, f'{corridor_id}_timetable.csv')
+        if args.frequency:
+            blocks = corridor_timetable.to_frequency_csv(path)
+            print(f'{corridor_id}: {path} {len(corridor_timetable.trips)} TRIPS IN {len(blocks)} BLOCKS'); continue
+        if filtered:
+            corridor_timetable.filter_by(time=(args.start, args.end) if args.start or args.end else None,
+                                         service_type=_service_types(args.service_type) if args.service_type else None,
+                                         settlement=args.settlement, county=args.county).to_csv(path)
+        else: corridor_timetable.to_csv(path)
+        print(f'{corridor_id}: {path}')
+    print(cache.stats)
+    return 0
+
+def cmd_expand(args: argparse.Namespace) -> int:
+    from slighe.dtypes import CorridorTimetable
+    try: CorridorTimetable.expand_frequency_csv(args.timetable, args.out)
+    except (ValueError, FileNotFoundError) as e: raise SystemExit(str(e))
+    print(args.out)
+    return 0
+
+def cmd_frequency(args: argparse.Namespace) -> int:
+    from slighe.dtypes import ServiceTypes
+    from slighe.constructors import StopBaseConstructor
+    from slighe.ops import stop_ops
+    loader, cache = _loader(args), _corridor_cache(args)
+    stops = StopBaseConstructor([args.stop_id], loader).build()
+    if not stops: raise SystemExit(f'unknown stop {args.stop_id}')
+    corridor = cache.corridor(f'routes:{",".join(sorted(args.routes))}', '', args.routes, loader)
+    service_types = _service_types(args.service_type) if args.service_type else list(ServiceTypes)
+    # window defaults live here, set_defaults on this parser would also change them for the parsers sharing window
+    print(stop_ops.frequency(stops[0], service_types, corridor.routes, args.start or '00:00:00', args.end or '48:00:00'))
+    return 0
+
+def cmd_export(args: argparse.Namespace) -> int:
+    from slighe import dload
+    from slighe.constructors import TripTimetableConstructor
+    loader, cache = _loader(args), _corridor_cache(args)
+    trip_routes = {row['trip_id']: row['route_id'] for row in loader.load(dload.LoadCSVFiles.TRIPS)}
+    if not os.path.exists(args.out): os.makedirs(args.out)
+    for trip_id in args.trip_id:
+        if trip_id not in trip_routes:
+            print(f'WARNING: unknown trip {trip_id}'); continue
+        corridor = cache.corridor(f'routes:{trip_routes[trip_id]}', '', [trip_routes[trip_id]], loader)
+        trip = next(trip for route in corridor.routes for trip in route.trips if trip.trip_id == trip_id)
+        path = os.path.join(args.out, f'{trip_id}.csv')
+        TripTimetableConstructor(trip).build().to_csv(path)
+        print(f'{trip_id}: {path}')
+    return 0
+
+def cmd_discover(args: argparse.Namespace) -> int:
+    from slighe.ops import corridor_ops
+    corridors = corridor_ops.discover_corridors(_loader(args), args.threshold, args.num_perm, args.bands)
+    corridor_ops.to_routes_corridors_csv(corridors, args.out)
+    print(f'{len(corridors)} CORRIDORS: {args.out}')
+    return 0
+
+def cmd_plan(args: argparse.Namespace) -> int:
+    from datetime import date
+    from slighe.ops.journey_ops import RaptorPlanner
+    planner = RaptorPlanner.from_loader(_loader(args), date.fromisoformat(args.date) if args.date else None,
+                                        _service_types(args.service_type) if args.service_type else None, args.max_walk)
+    journey = planner.earliest_arrival(args.origin, args.destination, args.departure, args.max_rounds)
+    print(journey if journey is not None else f'no journey within {args.max_rounds} trips')
+    return 0 if journey is not None else 1
+
+def cmd_matrix(args: argparse.Namespace) -> int:
+    from datetime import date
+    from slighe.ops import settlement_ops
+    names = settlement_ops.settlement_matrix(_loader(args), args.out, args.start, args.end, date.fromisoformat(args.date) if args.date else None,
+                                             _service_types(args.service_type) if args.service_type else None, args.settlement,
+                                             args.processes, args.max_rounds, args.max_walk, not args.restart)
+    print(f'{len(names)} SETTLEMENTS: {args.out}')
+    return 0
+
+def cmd_validate(args: argparse.Namespace) -> int:
+    try: from slighe.ops import validate_ops
+    except ImportError as e: raise SystemExit(f'{e}, the validate subcommand needs pip install slighe[validate]')
+    report = validate_ops.validate_feed(_loader(args) if args.txc else args.feed, args.sample)
+    print(report)
+    if args.json: report.to_json(args.json)
+    return 0 if report.ok else 1
+
+def cmd_serve(args: argparse.Namespace) -> int:
+    from slighe.service import FeedService
+    FeedService(functools.partial(_loader, args), args.host, args.port, _corridor_cache(args), processes=args.processes).run()
+    return 0
+
+def cmd_nta(args: argparse.Namespace) -> int:
+    try: from slighe.data_aggregator import NTATimeTable
+    except ImportError as e: raise SystemExit(f'{e}, the nta subcommand needs pip install slighe[nta]')
+    feed = lambda name: os.path.join(args.feed, name)
+    NTATimeTable(stop_times_file_path=feed('stop_times.csv'), trips_file_path=feed('trips.csv'), routes_file_path=feed('routes.csv'),
+                 stops_file_path=args.stops or feed('stops.csv'), calendar_file_path=feed('calendar.csv'),
+                 routes_corridors_file_path=args.routes_corridors, settlements_filter_file_path=args.settlement_filter,
+                 output_directory=args.out, stop_layout=args.layout, low_memory=args.low_memory, corridor_ids=args.corridor,
+                 chunksize=args.chunksize, interpolate=args.interpolate).build()
+    return 0
+
+def parser() -> argparse.ArgumentParser:
+    feed = argparse.ArgumentParser(add_help=False)
+    feed.add_argument('--feed', default=os.path.join('.', 'data'), help='directory holding the GTFS csv files (default ./data)')
+    feed.add_argument('--txc', nargs='+', metavar='XML', help='TransXChange files to load instead of --feed')
+    feed.add_argument('--stops', help='stops csv with settlement and county columns to annotate the TransXChange stops with')
+    feed.add_argument('--cache', default=DEFAULT_CACHE, help=f'cache directory for the parsed feed and corridor builds (default $SLIGHE_CACHE or {DEFAULT_CACHE})')
+    feed.add_argument('--no-cache', action='store_true', help='parse the feed and build everything from scratch')
+    window = argparse.ArgumentParser(add_help=False)
+    window.add_argument('--service-type', type=_list, metavar='MON,SAT', help='service types, ServiceTypes names')
+    window.add_argument('--start', help='window start HH:MM:SS')
+    window.add_argument('--end', help='window end HH:MM:SS')
+
+    p = argparse.ArgumentParser(prog='slighe', description='GTFS corridor timetables, frequencies and journeys')
+    p.add_argument('--profile', metavar='JSON', help='record spans and counters of the run and write them to JSON')
+    p.add_argument('--trace', metavar='JSON', help='write a chrome://tracing file of the run')
+    p.add_argument('-v', '--verbose', action='store_true', help='print LOG lines with the time taken by each step')
+    sub = p.add_subparsers(dest='command', metavar='command')
+    sub.required = True
+
+    s = sub.add_parser('load', parents=[feed], help='parse the feed and cache it')
+    s.set_defaults(fnc=cmd_load)
+
+    s = sub.add_parser('corridors', parents=[feed, window], help='corridor timetables to csv')
+    s.add_argument('routes_corridors', help='routes_corridors.csv with route_id and corridor_id columns')
+    s.add_argument('--corridor', action='append', help='only this corridor_id, repeatable')
+    s.add_argument('--out', default=os.path.join('.', 'output'), help='output directory (default ./output)')
+    s.add_argument('--layout', action='store_true', help='one row per stop in the merged stop order of each direction')
+    s.add_argument('--sort', action='store_true', help='sort trips by time')
+    s.add_argument('--disolve', action='store_true', help='disolve repeated stop rows')
+    s.add_argument('--interpolate', action='store_true', help='fill blank times from the stops either side by distance, implies --layout')
+    s.add_argument('--settlement', type=_list, help='only rows of these settlements')
+    s.add_argument('--county', type=_list, help='only rows of these counties')
+    s.add_argument('--frequency', action='store_true', help='collapse constant headway trips into frequency blocks, see slighe expand, implies --layout')
+    s.set_defaults(fnc=cmd_corridors)
+
+    s = sub.add_parser('expand', help='expand a corridor timetable written with corridors --frequency')
+    s.add_argument('timetable', help='the block timetable, its blocks are read from TIMETABLE_frequencies.csv')
+    s.add_argument('out', help='csv to write, one column per trip')
+    s.set_defaults(fnc=cmd_expand)
+
+    s = sub.add_parser('frequency', parents=[feed, window], help='trips serving a stop in a time window')
+    s.add_argument('stop_id')
+    s.add_argument('--routes', type=_list, required=True, metavar='A,B', help='route_ids to count')
+    s.set_defaults(fnc=cmd_frequency)
+
+    s = sub.add_parser('export', parents=[feed], help='trip timetables to csv')
+    s.add_argument('trip_id', nargs='+')
+    s.add_argument('--out', default=os.path.join('.', 'output'), help='output directory (default ./output)')
+    s.set_defaults(fnc=cmd_export)
+
+    s = sub.add_parser('discover', parents=[feed], help='discover corridors from route stop sets')
+    s.add_argument('--out', default='routes_corridors.csv', help='routes_corridors csv to write')
+    s.add_argument('--threshold', type=float, default=0.5, help='minimum jaccard similarity of the stop sets of two routes (default 0.5)')
+    s.add_argument('--num-perm', type=int, default=64)
+    s.add_argument('--bands', type=int, default=16)
+    s.set_defaults(fnc=cmd_discover)
+
+    planner = argparse.ArgumentParser(add_help=False)
+    planner.add_argument('--date', help='service date YYYY-MM-DD, trips running that day only')
+    planner.add_argument('--service-type', type=_list, metavar='MON,SAT', help='trips of these service types only')
+    planner.add_argument('--max-rounds', type=int, default=6, help='maximum trips per journey (default 6)')
+    planner.add_argument('--max-walk', type=float, default=400.0, help='maximum walking transfer in metres (default 400)')
+
+    s = sub.add_parser('plan', parents=[feed, planner], help='earliest arrival journey between two stops')
+    s.add_argument('origin')
+    s.add_argument('destination')
+    s.add_argument('departure', help='HH:MM:SS')
+    s.set_defaults(fnc=cmd_plan)
+
+    s = sub.add_parser('matrix', parents=[feed, planner], help='settlement to settlement travel time matrix')
+    s.add_argument('out', help='float32 matrix file, the settlement order goes to OUT.json')
+    s.add_argument('start', help='departures from HH:MM:SS')
+    s.add_argument('end', help='departures until HH:MM:SS')
+    s.add_argument('--settlement', type=_list, help='only these settlements')
+    s.add_argument('--processes', type=int)
+    s.add_argument('--restart', action='store_true', help='recompute every row instead of resuming')
+    s.set_defaults(fnc=cmd_matrix)
+
+    s = sub.add_parser('validate', parents=[feed], help='check the feed, exits 1 when a rule fails')
+    s.add_argument('--sample', type=int, default=5, help='offending rows shown per rule (default 5)')
+    s.add_argument('--json', help='also write the report to JSON')
+    s.set_defaults(fnc=cmd_validate)
+
+    s = sub.add_parser('serve', parents=[feed], help='serve the feed over HTTP')
+    s.add_argument('--host', default='127.0.0.1')
+    s.add_argument('--port', type=int, default=8080)
+    s.add_argument('--processes', type=int, help='answer requests in this many worker processes, each with its own copy of the feed')
+    s.set_defaults(fnc=cmd_serve)
+
+    s = sub.add_parser('nta', help='NTA corridor timetables with pandas')
+    s.add_argument('routes_corridors', help='routes_corridors.csv with route_id and corridor_id columns')
+    s.add_argument('settlement_filter', help='settlement_filter.csv')
+    s.add_argument('--feed', default=os.path.join('.', 'data'), help='directory holding the GTFS csv files (default ./data)')
+    s.add_argument('--stops', help='stops csv to use instead of FEED/stops.csv, e.g. stops_filter.csv')
+    s.add_argument('--out', default='output', help='output directory (default output)')
+    s.add_argument('--layout', action='store_true', help='order stops by the merged stop order of each direction instead of stop_sequence')
+    s.add_argument('--corridor', action='append', help='only this corridor_id, repeatable')
+    s.add_argument('--low-memory', action='store_true', help='read only the needed columns with compact dtypes, streaming stop_times in chunks')
+    s.add_argument('--chunksize', type=int, default=250_000, help='stop_times rows per chunk with --low-memory (default 250000)')
+    s.add_argument('--interpolate', action='store_true', help='fill blank arrival times from the stops either side by distance')
+    s.set_defaults(fnc=cmd_nta)
+    return p
+
+def main(argv: list[str] = None) -> int:
+    args = parser().parse_args(argv)
+    from slighe import _context
+    if args.verbose: _context.configure(echo=True)
+    if not (args.profile or args.trace): return args.fnc(args)
+    with _context.profile(json_path=args.profile, trace_path=args.trace): return args.fnc(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,21 +1,24 @@
-from dtypes import Stop, StopTime, Trip, Route, Corridor, TripTimetable, CorridorTimetable
-import dload
-import _context
+from slighe.dtypes import Stop, StopTime, Trip, Route, Corridor, TripTimetable, CorridorTimetable
+from slighe.ops.corridor_ops import merge_stop_order
+from slighe import dload
+from slighe import _context
+
+from collections import defaultdict
 
 class StopBaseConstructor:
     def __init__(self, stop_ids: list[Stop], gtfs_loader: dload.BaseDataLoader) -> None: self.stop_ids, self.gtfs_loader = stop_ids, gtfs_loader
     def __call__(self) -> list[Stop]: return self.build()
-    def build(self) -> list[Stop]: return [Stop(row['stop_id'], row['stop_name'], row['stop_lat'], row['stop_lon'], row['settlement'], row['county']) for row in self.gtfs_loader.load(dload.LoadCSVFiles.STOPS) if row['stop_id'] in self.stop_ids]
+    def build(self) -> list[Stop]: return _context.counted('StopBaseConstructor', [Stop(row['stop_id'], row['stop_name'], row['stop_lat'], row['stop_lon'], row['settlement'], row['county']) for row in self.gtfs_loader.load(dload.LoadCSVFiles.STOPS) if row['stop_id'] in self.stop_ids])
 
 class StopTimeBaseConstructor:
     def __init__(self, trip_id: Trip, gtfs_loader: dload.BaseDataLoader) -> None: self.trip_id, self.gtfs_loader = trip_id, gtfs_loader
     def __call__(self) -> list[StopTime]: return self.build()
-    def build(self) -> list[StopTime]: return [StopTime(row['trip_id'], row['stop_id'], row['stop_sequence'], row['arrival_time'], row['departure_time']) for row in self.gtfs_loader.load(dload.LoadCSVFiles.STOP_TIMES) if row['trip_id'] in self.trip_id]
+    def build(self) -> list[StopTime]: return _context.counted('StopTimeBaseConstructor', [StopTime(row['trip_id'], row['stop_id'], row['stop_sequence'], row['arrival_time'], row['departure_time']) for row in self.gtfs_loader.load(dload.LoadCSVFiles.STOP_TIMES) if row['trip_id'] in self.trip_id])
 
 class StopSequenceConstructor:
     def __init__(self, trip_id: Trip, gtfs_loader: dload.BaseDataLoader) -> None: self.trip_id, self.gtfs_loader = trip_id, gtfs_loader
     def __call__(self) -> dict[Stop: int]: return self.build()
-    def build(self) -> dict[Stop: int]: return {row['stop_id']: row['stop_sequence'] for row in self.gtfs_loader.load(dload.LoadCSVFiles.STOP_TIMES) if row['trip_id'] == self.trip_id}
+    def build(self) -> dict[Stop: int]: return _context.counted('StopSequenceConstructor', {row['stop_id']: row['stop_sequence'] for row in self.gtfs_loader.load(dload.LoadCSVFiles.STOP_TIMES) if row['trip_id'] == self.trip_id})
     # is it appending all stop_seq to the coressponding stop_id? i.e. {'stop_id': (s_seq1, s_seq_2, ...)} or {'stop_id1': s_seq1, 'stop_id1': s_seq_2, ...)} 
 
 class TripBaseConstructor:
@@ -25,7 +28,7 @@ class TripBaseConstructor:
     def _call_trip_ids(self) -> list: return [row['trip_id'] for row in self.gtfs_loader.load(dload.LoadCSVFiles.TRIPS) if row['route_id'] in self.route_ids] 
     def _call_stop_ids(self) -> list: return [row['stop_id'] for row in self.gtfs_loader.load(dload.LoadCSVFiles.STOP_TIMES) if row['trip_id'] in self._trip_ids]
     @_context.timing(f'TripBaseConstructor.build')
-    def build(self) -> list[Trip]: return [Trip(row['trip_id'], row['route_id'], row['direction_id'], int(row['service_id']), StopBaseConstructor(self._stop_ids, self.gtfs_loader).build(), StopTimeBaseConstructor(row['trip_id'], self.gtfs_loader).build(), StopSequenceConstructor(row['trip_id'], self.gtfs_loader).build()) for row in self.gtfs_loader.load(dload.LoadCSVFiles.TRIPS) if row['route_id'] in self.route_ids]
+    def build(self) -> list[Trip]: return _context.counted('TripBaseConstructor', [Trip(row['trip_id'], row['route_id'], row['direction_id'], int(row['service_id']), StopBaseConstructor(self._stop_ids, self.gtfs_loader).build(), StopTimeBaseConstructor(row['trip_id'], self.gtfs_loader).build(), StopSequenceConstructor(row['trip_id'], self.gtfs_loader).build()) for row in self.gtfs_loader.load(dload.LoadCSVFiles.TRIPS) if row['route_id'] in self.route_ids])
                                             # for row in data_trip:
                                             #   if r_rid in intersted_r_id
                                             #       bulid classes stop, stop_time, stop_sequence
@@ -34,7 +37,8 @@ class TripBaseConstructor:
 class RouteConstructor:
     def __init__(self, route_ids: list[Route], gtfs_loader: dload.BaseDataLoader) -> None: self.route_ids, self.gtfs_loader = route_ids, gtfs_loader
     def __call__(self) -> list[Route]: return self.build()
-    def build(self) -> list[Route]: return [Route(row['route_id'], row['agency_id'], row['route_short_name'], row['route_long_name'], row['route_type'], TripBaseConstructor(self.route_ids, self.gtfs_loader).build()) for row in self.gtfs_loader.load(dload.LoadCSVFiles.ROUTES) if row['route_id'] in self.route_ids]
+    @_context.timing(f'RouteConstructor.build')
+    def build(self) -> list[Route]: return _context.counted('RouteConstructor', [Route(row['route_id'], row['agency_id'], row['route_short_name'], row['route_long_name'], row['route_type'], TripBaseConstructor(self.route_ids, self.gtfs_loader).build()) for row in self.gtfs_loader.load(dload.LoadCSVFiles.ROUTES) if row['route_id'] in self.route_ids])
                 #for row in data_route:
                 #   if r_id in interseted_r_id:
                 #       build Trip class
@@ -42,13 +46,14 @@ class RouteConstructor:
 class CorridorConstructor:
     def __init__(self, corridor_id: int, corridor_name: str, route_ids: list[Route], gtfs_loader: dload.BaseDataLoader) -> None: self.corridor_id, self.corridor_name, self.route_ids, self.gtfs_loader = corridor_id, corridor_name, route_ids, gtfs_loader
     def __call__(self) -> Corridor: return self.build() 
+    @_context.timing(f'CorridorConstructor.build')
     def build(self) -> Corridor: return Corridor(self.corridor_id, self.corridor_name, RouteConstructor(self.route_ids, self.gtfs_loader).build()) #Bulid route class using route_id using RouteConstructor
 
 class TripTimetableConstructor:
     def __init__(self, trip: Trip) -> None: self.trip = trip
     def __call__(self) -> TripTimetable: return self.build()
     def build(self) -> TripTimetable:
-        timetable = [dict(zip(self.trip.stops[0].__dict__.keys(), [0 for _ in len(self.trip.stops[0].__dict__.keys())])) for _ in self.trip.stop_times]
+        timetable = [dict(zip(self.trip.stops[0].__dict__.keys(), [0 for _ in range(len(self.trip.stops[0].__dict__.keys()))])) for _ in self.trip.stop_times]
         _idx = 0
         for stop_time in self.trip.stop_times:
             stop = next(filter(lambda x: x.stop_id == stop_time.stop_id, self.trip.stops))
@@ -62,12 +67,20 @@ class TripTimetableConstructor:
                                     'trip_id': stop_time.trip_id,
                                     'stop_time': stop_time.arrival_time})
             _idx += 1  
-        return TripTimetable(self.trip.stops, self.trip, timetable)
+        return TripTimetable(self.trip.stops, self.trip, _context.counted('TripTimetableConstructor', timetable))
 
 class CorrdidorTimetableConstructor:
-    def __init__(self, corridor: Corridor) -> None: self.corridor = corridor
+    """
+    layout: bool = False
+        one row per stop and direction in the merged stop order of the corridor (merge_stop_order) instead
+        of one row per stop time, with a direction_id column after the stop fields. The rows are already
+        in order, sort_by_time and disolve_stops leave them as they are
+    """
+    def __init__(self, corridor: Corridor, layout: bool = False) -> None: self.corridor, self.layout = corridor, layout
     def __call__(self) -> None: return self.build()
+    @_context.timing(f'CorrdidorTimetableConstructor.build')
     def build(self) -> CorridorTimetable:
+        if self.layout: return self._build_layout()
         timetable = [dict(zip(list(self.corridor.routes[0].trips[0].stops[0].__dict__.keys()) + [trip.trip_id for trip in self.corridor.pull_trips()], [0 for _ in range(len(self.corridor.routes[0].trips[0].stops[0].__dict__.keys()) + len(self.corridor.pull_trips()))])) for _ in self.corridor.pull_stop_times()]
         _idx = 0
         for stop_time in set(self.corridor.pull_stop_times()): # for stop_time from trips from rooutes from interested corridor
@@ -85,7 +98,27 @@ class CorrdidorTimetableConstructor:
                                     stop_time.trip_id: stop_time.arrival_time
                                     })
             _idx += 1
-        return CorridorTimetable(self.corridor.pull_stops(), self.corridor.pull_trips(), timetable)
+        return CorridorTimetable(self.corridor.pull_stops(), self.corridor.pull_trips(), _context.counted('CorrdidorTimetableConstructor', timetable))
+
+    def _build_layout(self) -> CorridorTimetable:
+        trips, stops = self.corridor.pull_trips(), {stop.stop_id: stop for stop in self.corridor.pull_stops()}
+        trip_ids, stop_fields = [trip.trip_id for trip in trips], list(Stop.__dataclass_fields__)
+        patterns, trip_stop_times = defaultdict(dict), {}
+        for trip in trips:
+            stop_times = sorted((st for st in trip.stop_times if st.trip_id == trip.trip_id and st.stop_id in stops), key=lambda st: int(st.stop_sequence))
+            patterns[trip.direction_id][tuple(st.stop_id for st in stop_times)] = None
+            trip_stop_times[trip.trip_id] = (trip.direction_id, stop_times)
+        timetable, row_idx = [], {}
+        for direction_id in sorted(patterns, key=str):
+            for node in merge_stop_order(list(patterns[direction_id])):
+                row_idx[(direction_id, node)] = len(timetable)
+                timetable.append({**{f: getattr(stops[node[0]], f) for f in stop_fields}, 'direction_id': direction_id, **dict.fromkeys(trip_ids, 0)})
+        for trip_id, (direction_id, stop_times) in trip_stop_times.items():
+            seen = defaultdict(int)
+            for st in stop_times:
+                timetable[row_idx[(direction_id, (st.stop_id, seen[st.stop_id]))]][trip_id] = st.arrival_time
+                seen[st.stop_id] += 1
+        return CorridorTimetable(list(stops.values()), trips, _context.counted('CorrdidorTimetableConstructor', timetable), t_layout=True)
 
 if __name__ == "__main__":
     loader = dload.GTFSLoadCSV('./data/agency.csv', './data/calendar.csv', './data/calendar_dates.csv', './data/routes.csv', './data/stop_times.csv', './data/stops.csv', './data/trips.csv')
@@ -1,16 +1,42 @@
+from __future__ import annotations
+from slighe.ops.corridor_ops import merge_stop_order
+from slighe.transforms import TimeTransforms
+from slighe import _context
+
 from enum import Enum
 from dataclasses import dataclass, field
 from itertools import chain
-from typing import Union, Generator
+from collections import defaultdict
+from typing import Union, Generator, Optional
 import csv
 import time
-
-import pandas as pd
+import shutil
 import os
-from geographiclib.geodesic import Geodesic
+
+# pandas and geographiclib are imported inside the methods that use them so importing this module stays cheap
 
 @dataclass
 class NTATimeTable:
+    """
+    stop_layout: bool = False
+        opt in to ordering stop rows by the merged stop order of each corridor direction instead of
+        stop_sequence (as CorrdidorTimetableConstructor layout), trips calling at the same stop at the
+        same time are then kept apart rather than merged
+    low_memory: bool = False
+        read only the columns the corridor timetables use, with stop_times ids as categoricals and
+        arrival times as Int32 seconds (TimeTransforms.series_to_seconds), streamed in chunks of chunksize
+        rows. The seconds are used as they are up to the written timetable, no step parses the time text
+    corridor_ids: list = None
+        build only these corridors, in low_memory mode stop_times rows of other corridors' trips are
+        dropped chunk by chunk so memory is bounded by the corridors being built
+    chunksize: int = 250_000
+        stop_times rows per chunk in low_memory mode
+    interpolate: bool = False
+        fill blank arrival times from the timepoints either side of them, weighted by the distance
+        between the stops, instead of leaving the trip out at those stops
+    """
+    STOP_TIMES_COLUMNS = ['trip_id', 'arrival_time', 'stop_id', 'stop_sequence']
+
     stop_times_file_path: str
     trips_file_path: str
     routes_file_path: str
@@ -19,9 +45,14 @@ class NTATimeTable:
     routes_corridors_file_path: str
     settlements_filter_file_path: str
     output_directory: str
+    stop_layout: bool = False
+    low_memory: bool = False
+    corridor_ids: Optional[list] = None
+    chunksize: int = 250_000
+    interpolate: bool = False
 
     def __post_init__(self) -> None:
-        print(f'{os.get_terminal_size().columns * "_"}\nNTA DATA AGGREGATOR')
+        print(f'{shutil.get_terminal_size().columns * "_"}\nNTA DATA AGGREGATOR')
         self._make_out_dir(); self._load_to_pandas(); self._merge_dataframes() 
         
     def _make_out_dir(self) -> None:
@@ -29,6 +60,8 @@ class NTATimeTable:
             os.mkdir(os.path.join(os.getcwd(), self.output_directory))
 
     def _load_to_pandas(self) -> tuple[pd.DataFrame]:
+        import pandas as pd
+        if self.low_memory: return self._load_to_pandas_low_memory()
         print(f'--> LOADING DATA TO PANDAS DATAFRAME')
         self.stop_times_df = pd.read_csv(self.stop_times_file_path, header=0, dtype={'trip_id': str, 'stop_id': str, 'stop_sequence': int, 'arrival_time': str, 'departure_time': str}, encoding='latin_1')
         self.trips_df = pd.read_csv(self.trips_file_path)
@@ -39,6 +72,78 @@ class NTATimeTable:
         self.settlements_filter_df = pd.read_csv(self.settlements_filter_file_path)
         return self.stop_times_df, self.trips_df, self.routes_df, self.stops_df, self.calendar_df, self.routes_corridors_df
 
+    def _load_to_pandas_low_memory(self) -> tuple[pd.DataFrame]:
+        import pandas as pd
+        print(f'--> LOADING DATA TO PANDAS DATAFRAME (LOW MEMORY)')
+        self.trips_df = pd.read_csv(self.trips_file_path, usecols=['route_id', 'service_id', 'trip_id', 'direction_id'], dtype={'route_id': str, 'service_id': str, 'trip_id': str, 'direction_id': 'Int8'})
+        self.routes_df = pd.read_csv(self.routes_file_path, usecols=['route_id', 'route_short_name'], dtype=str)
+        self.stops_df = pd.read_csv(self.stops_file_path, usecols=['stop_id', 'stop_name', 'stop_lat', 'stop_lon', 'settlement', 'county'], dtype={'stop_id': str}, encoding='latin_1')
+        self.calendar_df = pd.read_csv(self.calendar_file_path, usecols=['service_id', 'service_type'], dtype={'service_id': str})
+        self.routes_corridors_df = pd.read_csv(self.routes_corridors_file_path, dtype={'route_id': str})
+        self.settlements_filter_df = pd.read_csv(self.settlements_filter_file_path)
+
+        trip_ids = self._corridor_trip_ids() if self.corridor_ids is not None else None
+        chunks = []
+        for chunk in pd.read_csv(self.stop_times_file_path, usecols=self.STOP_TIMES_COLUMNS, dtype=str, encoding='latin_1', chunksize=self.chunksize):
+            if trip_ids is not None: chunk = chunk[chunk['trip_id'].isin(trip_ids)]
+            chunks.append(pd.DataFrame({'trip_id': chunk['trip_id'].astype('category'),
+                                        'arrival_time': TimeTransforms.series_to_seconds(chunk['arrival_time']),
+                                        'stop_id': chunk['stop_id'].astype('category'),
+                                        'stop_sequence': chunk['stop_sequence'].astype('int32')}))
+        self.stop_times_df = self._concat_chunks(chunks) if chunks else pd.DataFrame(columns=self.STOP_TIMES_COLUMNS)
+        print(f'--> {len(self.stop_times_df)} STOP TIMES, {self.stop_times_df.memory_usage(deep=True).sum() // 2 ** 20} MB, PEAK RSS {(_context.peak_rss() or 0) // 2 ** 20} MB')
+        return self.stop_times_df, self.trips_df, self.routes_df, self.stops_df, self.calendar_df, self.routes_corridors_df
+
+    def _corridor_trip_ids(self) -> set[str]:
+        corridor_ids = {str(c) for c in self.corridor_ids}
+        route_ids = self.routes_corridors_df.loc[self.routes_corridors_df['corridor_id'].astype(str).isin(corridor_ids), 'route_id']
+        return set(self.trips_df.loc[self.trips_df['route_id'].isin(route_ids), 'trip_id'])
+
+    @staticmethod
+    def _concat_chunks(chunks: list[pd.DataFrame]) -> pd.DataFrame:
+        """
+        Concatenates stop_times chunks, categorical columns are unioned so they stay categorical
+        (pd.concat falls back to object when the chunks' categories differ)
+        """
+        import pandas as pd
+        from pandas.api.types import union_categoricals
+        return pd.DataFrame({col: union_categoricals([chunk[col] for chunk in chunks]) if isinstance(chunks[0][col].dtype, pd.CategoricalDtype)
+                             else pd.concat([chunk[col] for chunk in chunks], ignore_index=True) for col in chunks[0].columns})
+
+    @staticmethod
+    def _expand_low_memory(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Turns the low_memory categoricals of one corridor's rows back into object ids, arrival times stay Int32 seconds
+        """
+        import pandas as pd
+        return df.astype({col: object for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)})
+
+    def _interpolate_stop_times(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Fills the blank arrival times of one corridor's rows with TimeTransforms.interpolate_seconds, every trip
+        in one pass over the rows sorted by (trip_id, stop_sequence) with stop coordinates from stops_df.
+        low_memory seconds are filled as seconds, time strings get the filled times as strings
+        """
+        import numpy as np
+        import pandas as pd
+        df = df.sort_values(by=['trip_id', 'stop_sequence'], kind='stable')
+        stops = self.stops_df.drop_duplicates('stop_id')
+        stop_ids = stops['stop_id'].astype(str)
+        latitude = df['stop_id'].astype(str).map(pd.Series(pd.to_numeric(stops['stop_lat'], errors='coerce').to_numpy(), index=stop_ids))
+        longitude = df['stop_id'].astype(str).map(pd.Series(pd.to_numeric(stops['stop_lon'], errors='coerce').to_numpy(), index=stop_ids))
+        text = not pd.api.types.is_numeric_dtype(df['arrival_time'])
+        seconds = (TimeTransforms.series_to_seconds(df['arrival_time']) if text else df['arrival_time']).to_numpy(dtype='float64', na_value=np.nan)
+        filled = TimeTransforms.interpolate_seconds(seconds, latitude.to_numpy(dtype='float64', na_value=np.nan),
+                                                    longitude.to_numpy(dtype='float64', na_value=np.nan), pd.factorize(df['trip_id'])[0])
+        new = np.isnan(seconds) & ~np.isnan(filled)
+        if text:
+            arrival = df['arrival_time'].to_numpy(dtype=object, copy=True)
+            arrival[new] = TimeTransforms.series_from_seconds(pd.Series(filled[new])).to_numpy()
+            df['arrival_time'] = arrival
+        else: df['arrival_time'] = pd.Series(filled, index=df.index).astype('Int32')
+        if new.any(): print(f'INTERPOLATED {int(new.sum())}/{int(np.isnan(seconds).sum())} BLANK ARRIVAL TIMES')
+        return df
+
     def _merge_dataframes(self) -> tuple[pd.DataFrame]:
         """
         Merges the trips dataframe with the calandar and routes dataframe to get service_type and route_short_name
@@ -50,17 +155,46 @@ class NTATimeTable:
         return self.trips_df, self.routes_df
     
 
+    def _layout_stop_sequence(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Replaces stop_sequence with the position of each stop in the merged stop order of its corridor direction
+        (merge_stop_order), computed once per distinct stop pattern, so rows of overlapping and branching routes
+        line up on one row per stop instead of interleaving by their route's own stop_sequence
+        """
+        df = df.sort_values(by=['trip_id', 'stop_sequence'])
+        occurrence = df.groupby(['trip_id', 'stop_id']).cumcount()
+        trip_patterns = df.groupby('trip_id', sort=False).agg(direction_id=('direction_id', 'first'), stops=('stop_id', tuple))
+        patterns = defaultdict(dict)
+        for direction_id, stops in zip(trip_patterns['direction_id'], trip_patterns['stops']): patterns[direction_id][stops] = None
+        rank = {}
+        for direction_id, direction_patterns in patterns.items():
+            rank.update({(direction_id, stop_id, n): i for i, (stop_id, n) in enumerate(merge_stop_order(list(direction_patterns)))})
+        df['stop_sequence'] = [rank[key] for key in zip(df['direction_id'], df['stop_id'], occurrence)]
+        return df
+
     def _convert_to_sortable_datetime(self, time_str) -> pd.DataFrame:
         """
         """
+        import pandas as pd
         if pd.isnull(time_str) or time_str == '0': return pd.NaT  # NaT represents Not-a-Time    
         return pd.to_datetime(time_str, format='%H:%M:%S', errors='coerce')
 
+    @staticmethod
+    def _seconds_to_datetime(seconds: pd.Series) -> pd.Series:
+        """
+        _convert_to_sortable_datetime of low_memory seconds without going through text, times past 24:00
+        are NaT as '%H:%M:%S' cannot parse them
+        """
+        import pandas as pd
+        seconds = pd.to_numeric(seconds).astype('float64')
+        return pd.to_datetime(seconds.where(seconds < 86400), unit='s', origin=pd.Timestamp('1900-01-01'))
+
     def sort_dataframe(self, df) -> pd.DataFrame:
         """
         """
+        import pandas as pd
         for col in df.columns[4:]:
-            df[col] = df[col].apply(self._convert_to_sortable_datetime)
+            df[col] = self._seconds_to_datetime(df[col]) if pd.api.types.is_numeric_dtype(df[col]) else df[col].apply(self._convert_to_sortable_datetime)
 
             def first_valid_value(column):
                 non_nan_values = df[column].dropna()
@@ -78,6 +212,7 @@ class NTATimeTable:
                             css: ...
                             ) -> pd.DataFrame:
         
+        from geographiclib.geodesic import Geodesic
         return Geodesic.Inverse(start_latitude_column,
                                       start_longitude_column,
                                       end_latitude_column,
@@ -87,6 +222,7 @@ class NTATimeTable:
         """
         
         """
+        import pandas as pd
         corridor_routes: pd.DataFrame = self.routes_df[self.routes_df['corridor_id'] == corridor_id]
         corridor_timetable = pd.DataFrame()
 
@@ -107,7 +243,11 @@ class NTATimeTable:
 
             corridor_timetable = pd.concat([corridor_timetable, stop_times_route], ignore_index=True, sort=False)
 
-        corridor_timetable = corridor_timetable.drop_duplicates(subset=['direction_id', 'stop_id', 'stop_sequence', 'arrival_time'])
+        if self.low_memory and not corridor_timetable.empty: corridor_timetable = self._expand_low_memory(corridor_timetable)
+        if self.interpolate and not corridor_timetable.empty: corridor_timetable = self._interpolate_stop_times(corridor_timetable)
+        if self.stop_layout and not corridor_timetable.empty: corridor_timetable = self._layout_stop_sequence(corridor_timetable)
+        corridor_timetable = corridor_timetable.drop_duplicates(subset=['direction_id', 'trip_id', 'stop_id', 'stop_sequence', 'arrival_time'] if self.stop_layout
+                                                                else ['direction_id', 'stop_id', 'stop_sequence', 'arrival_time'])
 
         # Pivot the table to have trip_ids as columns and stop details as rows
         corridor_timetable_pivot = corridor_timetable.pivot_table(
@@ -211,6 +351,7 @@ class NTATimeTable:
 
     def build(self) -> ...:
         corridor_ids = self.routes_corridors_df['corridor_id'].unique()
+        if self.corridor_ids is not None: corridor_ids = [c for c in corridor_ids if str(c) in {str(c) for c in self.corridor_ids}]
         for corridor_id in corridor_ids: self._build_timetable_for_corridor(corridor_id) 
 
 class ServiceTypes(Enum):
@@ -283,6 +424,7 @@ class Corridor:
         return service in self.services
 
     def load_timetable(self, corridor_timetable_path: str) -> ...:
+        import pandas as pd
         self.timetable = pd.read_csv(corridor_timetable_path)
         return self.timetable
 
@@ -328,7 +470,6 @@ class Corridor:
                 else: raise ValueError(f'No corridor_services specified, or services not in corridor')
         return
 
-    def _
 
     def _match_stops(self, corridor_services: list) -> ...:
         for service in self.services: 
@@ -345,13 +486,13 @@ class Corridor:
 
 if __name__ == "__main__":
     nta = NTATimeTable(
-        stop_times_file_path=r"\\londonfile\ProjectData\IE01T23B25_LOT4_NTA_Secondment\data\GTFS NTA\GTFS NTA\stop_times.csv",
-        trips_file_path=r"\\londonfile\ProjectData\IE01T23B25_LOT4_NTA_Secondment\data\GTFS NTA\GTFS NTA\trips.csv",
-        routes_file_path=r"\\londonfile\ProjectData\IE01T23B25_LOT4_NTA_Secondment\data\GTFS NTA\GTFS NTA\routes.csv",
-        stops_file_path=r"\\londonfile\ProjectData\IE01T23B25_LOT4_NTA_Secondment\data\GTFS NTA\GTFS NTA\stops_filter.csv",
-        calendar_file_path=r"\\londonfile\ProjectData\IE01T23B25_LOT4_NTA_Secondment\data\GTFS NTA\GTFS NTA\calendar.csv",
-        routes_corridors_file_path=r"\\londonfile\ProjectData\IE01T23B25_LOT4_NTA_Secondment\data\GTFS NTA\GTFS NTA\routes_corridors.csv",
-        settlements_filter_file_path=r"\\londonfile\ProjectData\IE01T23B25_LOT4_NTA_Secondment\data\GTFS NTA\GTFS NTA\settlement_filter.csv",
+        stop_times_file_path='./data/stop_times.csv',
+        trips_file_path='./data/trips.csv',
+        routes_file_path='./data/routes.csv',
+        stops_file_path='./data/stops_filter.csv',
+        calendar_file_path='./data/calendar.csv',
+        routes_corridors_file_path='./data/routes_corridors.csv',
+        settlements_filter_file_path='./data/settlement_filter.csv',
         output_directory=os.path.join(os.getcwd(), 'output')
     )
     nta.build()
\ No newline at end of file
@@ -0,0 +1,374 @@
+from slighe.dtypes import DayOfWeek, ServiceTypes, SERVICE_DAYS
+from slighe.transforms import TimeTransforms
+from slighe import _context
+
+import os
+import csv
+import hashlib
+import pickle
+import multiprocessing as mp
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from enum import Enum
+from typing import Optional, Union, Callable, overload
+
+class GTFSLoadMethod(Enum):
+    from_csv = 1
+    from_gtfs = 2
+    from_postgres = 3
+    from_sqlite = 4
+    from_transxchange = 5
+
+class LoadCSVFiles(Enum):
+    AGENCY = 1
+    CALENDAR = 2
+    CALENDAR_DATES = 3
+    ROUTES = 4
+    STOP_TIMES = 5
+    STOPS = 6
+    TRIPS = 7
+
+@dataclass
+class BaseDataLoader: 
+    load_method: GTFSLoadMethod
+
+    @overload
+    def load(self, file: LoadCSVFiles) -> dict: ...
+
+    def source_paths(self) -> list[str]: return []
+
+    def fingerprint(self) -> str:
+        """
+        Version of the feed held in memory, a hash of the path, size and mtime of every source file
+        taken the first time it is asked for so it describes the files as they were loaded
+        """
+        if getattr(self, '_fingerprint', None) is None: self._fingerprint = source_fingerprint(self.load_method, self.source_paths())
+        return self._fingerprint
+
+def source_fingerprint(load_method: GTFSLoadMethod, paths: list[str]) -> str:
+    """
+    BaseDataLoader.fingerprint of a feed loaded from paths, taken from the files without reading them
+    """
+    stats = [(os.path.abspath(p), os.stat(p).st_size, os.stat(p).st_mtime_ns) for p in sorted(paths)]
+    return hashlib.sha1(repr((load_method.name, stats)).encode('utf8')).hexdigest()
+
+class GTFSLoadCSV(BaseDataLoader):
+    def __init__(self, agency_path: str, calendar_path: str, calendar_dates_path: str, routes_path: str, stop_times_path: str, stops_path: str, trips_path: str) -> None:
+        self.agency_path, self.calendar_path, self.calendar_dates_path, self.routes_path, self.stop_times_path, self.stops_path, self.trips_path = agency_path, calendar_path, calendar_dates_path, routes_path, stop_times_path, stops_path, trips_path
+        super().__init__(GTFSLoadMethod.from_csv)
+        if not self._validate_paths(): raise FileNotFoundError(f'') 
+        self.paths = {file: path for file, path in zip(LoadCSVFiles, self.__dict__.values()) if str(path).endswith('.csv')}
+        self.csv_files = {file: [] for file in LoadCSVFiles}
+        self._to_memory()
+        self.fingerprint()
+
+    def __call__(self, file: LoadCSVFiles) -> None: self.load(file)
+
+    def source_paths(self) -> list[str]: return list(self.paths.values())
+    
+    def _validate_paths(self) -> bool: return all([os.path.exists(path) for path in self.__dict__.values() if str(path).endswith('.csv')])
+
+    def _mp_get_chunks(self, file_path: str, max_cpu: int = 8) -> list:
+        cpu_count = min(max_cpu, mp.cpu_count())
+        file_size = os.path.getsize(file_path)
+        chunk_size = file_size // cpu_count
+        start_end = []
+        with open(file_path, "r+b") as f:
+
+            def is_new_line(position) -> Optional[Union[bool, str]]:
+                if position == 0: return True
+                else: 
+                    f.seek(position -1)
+                    return f.read(1) == b"\n"
+
+            def next_line(position) -> ...:
+                f.seek(position)
+                f.readline()
+                return f.tell()
+            
+            headers = [i.decode('utf8') for i in f.readline().rstrip(b"\r\n").split(b",")]
+
+            chunk_start = 0
+            while chunk_start < file_size:
+                chunk_end = min(file_size, chunk_start + chunk_size)
+                while not is_new_line(chunk_end): chunk_end -= 1
+                if chunk_start == chunk_end: chunk_end = next_line(chunk_end)
+
+                start_end.append((file_path, chunk_start, chunk_end))
+
+                chunk_start = chunk_end
+    
+        return cpu_count, headers, start_end
+
+    def _mp_file_chunk_read(self, file_path: str, chunk_start: int, chunk_end: int) -> dict:
+        out = []
+        with open(file_path, "rb") as f:
+            f.seek(chunk_start)
+            for line in f:
+                chunk_start += len(line)
+                if chunk_start > chunk_end: break
+                out.append(line.split(b","))
+        return out
+
+    def _mp_file_process(self, file: LoadCSVFiles, cpu_count: int, headers: list[str], start_end: list) -> None:
+        with mp.Pool(cpu_count) as p:
+            chunk_results: list[dict] = p.starmap(self._mp_file_chunk_read, start_end)
+        out = []
+        for chunk_result in chunk_results:
+            for dline in chunk_result[1:]:
+                try: out.append(dict(zip(headers, [d.decode('utf8') for d in dline])))
+                except UnicodeDecodeError as e: print(f'WARNING: decode error in {file} -> {e}')
+        self.csv_files[file] = out
+
+    @_context.timing("CSV load")
+    def _to_memory(self) -> None:
+        for file, path, in self.paths.items():
+            if os.path.getsize(path) > 1e8:
+                print(f"LOG: Loading {path} with multiprocessing")
+                cpu_count, headers, *start_end = self._mp_get_chunks(path)
+                self._mp_file_process(file, cpu_count, headers, start_end[0])
+            else:
+                with open(path, 'r', errors='ignore') as f:
+                    reader = csv.DictReader(f)
+                    self.csv_files[file] = [row for row in reader]
+
+    def load(self, file: LoadCSVFiles) -> csv.DictReader:
+        # TODO: BUILD AN OPTIMISER ALGO FOR THIS -> ITERATING THROUGH THE LIST TAKES TOO LONG -> PERHAPS PASSING A LAMBDA FNC TO LOAD()
+        if _context.enabled(): _context.count(f'rows_scanned.{file.name}', len(self.csv_files[file]))
+        return self.csv_files[file]
+
+class GTFSLoadTXC(BaseDataLoader):
+    """
+    Streams one or more TransXChange files into the same GTFS tables GTFSLoadCSV holds in memory
+
+    Files are read with iterparse and each StopPoint, Service, JourneyPatternSection and VehicleJourney
+    is dropped from the tree as soon as it has been read, so memory is bounded by the output tables and
+    not by the XML DOM.
+
+    *txc_paths: str
+        TransXChange xml files
+    stops_path: str = None
+        optional GTFS stops csv with settlement and county columns to annotate the TXC stops with
+
+    service_id is the ServiceTypes value of the days an OperatingProfile runs on. Day combinations with no
+    ServiceTypes (e.g. Monday and Wednesday) get CUSTOM_SERVICE + a bitmask of their days (Monday = 1) as
+    service_id, with a calendar row of their own, and are reported with a warning.
+    """
+    CUSTOM_SERVICE = 100
+    _DAYS = {'Monday': [DayOfWeek.MON], 'Tuesday': [DayOfWeek.TUE], 'Wednesday': [DayOfWeek.WED], 'Thursday': [DayOfWeek.THU],
+             'Friday': [DayOfWeek.FRI], 'Saturday': [DayOfWeek.SAT], 'Sunday': [DayOfWeek.SUN],
+             'MondayToFriday': list(DayOfWeek)[:5], 'MondayToSaturday': list(DayOfWeek)[:6], 'MondayToSunday': list(DayOfWeek),
+             'Weekend': [DayOfWeek.SAT, DayOfWeek.SUN], 'NotSaturday': [d for d in DayOfWeek if d != DayOfWeek.SAT],
+             'NotSunday': list(DayOfWeek)[:6], 'NotMonday': list(DayOfWeek)[1:]}
+    _SERVICE_TYPES = {days: service_type for service_type, days in SERVICE_DAYS.items()}
+    _ROUTE_TYPES = {'tram': 0, 'underground': 1, 'metro': 1, 'rail': 2, 'bus': 3, 'coach': 3, 'ferry': 4}
+    _GTFS_DAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+    def __init__(self, *txc_paths: str, stops_path: str = None) -> None:
+        self.txc_paths, self.stops_path = list(txc_paths), stops_path
+        super().__init__(GTFSLoadMethod.from_transxchange)
+        if not self._validate_paths(): raise FileNotFoundError(f'{[p for p in self.txc_paths + [self.stops_path] if p and not os.path.exists(p)]}')
+        self.csv_files = {file: [] for file in LoadCSVFiles}
+        self._to_memory()
+        self.fingerprint()
+
+    def __call__(self, file: LoadCSVFiles) -> None: self.load(file)
+
+    def source_paths(self) -> list[str]: return [path for path in self.txc_paths + [self.stops_path] if path]
+
+    def _validate_paths(self) -> bool: return all([os.path.exists(path) for path in self.source_paths()])
+
+    def _stop_annotations(self) -> dict[str, dict]:
+        if not self.stops_path: return {}
+        with open(self.stops_path, 'r', errors='ignore') as f:
+            return {row['stop_id']: row for row in csv.DictReader(f)}
+
+    def _service_id(self, profile: Optional[ET.Element], q) -> str:
+        if profile is None: return str(ServiceTypes.MON_SUN.value)
+        days = set()
+        for day in profile.iterfind(q('RegularDayType/DaysOfWeek/*')):
+            days.update(self._DAYS.get(day.tag.rpartition('}')[2], []))
+        if profile.find(q('RegularDayType/HolidaysOnly')) is not None: days = set()
+        service_type = self._SERVICE_TYPES.get(frozenset(days))
+        return str(service_type.value) if service_type is not None else str(self.CUSTOM_SERVICE + sum(1 << day.value for day in days))
+
+    def _service_days(self, service_id: str) -> frozenset[DayOfWeek]:
+        n = int(service_id)
+        return SERVICE_DAYS[ServiceTypes(n)] if n < self.CUSTOM_SERVICE else frozenset(day for day in DayOfWeek if (n - self.CUSTOM_SERVICE) >> day.value & 1)
+
+    def _stop_row(self, elem: ET.Element, q, annotations: dict) -> dict:
+        stop_id = elem.findtext(q('AtcoCode')) or elem.findtext(q('StopPointRef'))
+        lat, lon = next(elem.iter(q('Latitude')), None), next(elem.iter(q('Longitude')), None)
+        row = {'stop_id': stop_id,
+               'stop_name': elem.findtext(q('Descriptor/CommonName')) or elem.findtext(q('CommonName')) or '',
+               'stop_lat': lat.text if lat is not None else '',
+               'stop_lon': lon.text if lon is not None else '',
+               'settlement': elem.findtext(q('LocalityName')) or elem.findtext(q('Place/NptgLocalityRef')) or '',
+               'county': elem.findtext(q('AdministrativeAreaRef')) or elem.findtext(q('LocalityQualifier')) or ''}
+        if stop_id in annotations: row.update({k: annotations[stop_id][k] for k in ('settlement', 'county') if k in annotations[stop_id]})
+        return row
+
+    def _journey_pattern_sections(self, elem: ET.Element, q) -> list[tuple]:
+        return [(link.get('id'),
+                 link.findtext(q('From/StopPointRef')), TimeTransforms.iso_duration(link.findtext(q('From/WaitTime'))),
+                 link.findtext(q('To/StopPointRef')), TimeTransforms.iso_duration(link.findtext(q('To/WaitTime'))),
+                 TimeTransforms.iso_duration(link.findtext(q('RunTime'))))
+                for link in elem.iterfind(q('JourneyPatternTimingLink'))]
+
+    def _vehicle_journey(self, elem: ET.Element, q) -> tuple:
+        overrides = {}
+        for link in elem.iterfind(q('VehicleJourneyTimingLink')):
+            overrides[link.findtext(q('JourneyPatternTimingLinkRef'))] = (link.findtext(q('From/WaitTime')), link.findtext(q('To/WaitTime')), link.findtext(q('RunTime')))
+        profile = elem.find(q('OperatingProfile'))
+        return (elem.findtext(q('VehicleJourneyCode')), elem.findtext(q('ServiceRef')), elem.findtext(q('LineRef')),
+                elem.findtext(q('JourneyPatternRef')), elem.findtext(q('VehicleJourneyRef')), elem.findtext(q('DepartureTime')),
+                self._service_id(profile, q) if profile is not None else None, overrides)
+
+    def _emit_trip(self, vj: tuple, patterns: dict, sections: dict, services: dict, journeys: dict, skipped: list) -> bool:
+        """
+        Appends the trip and stop_times of a vehicle journey, False while its journey pattern is not read yet.
+        A journey without a usable DepartureTime is left out and its code added to skipped.
+        """
+        code, service_ref, line_ref, jp_ref, vj_ref, departure, service_id, overrides = vj
+        if not jp_ref and vj_ref in journeys: jp_ref = journeys[vj_ref]
+        journeys[code] = jp_ref
+        if jp_ref not in patterns: return False
+        try: t = TimeTransforms.ts_to_seconds(departure)
+        except ValueError: t = None
+        if t is None: skipped.append(code); return True
+        service_code, direction_id, section_refs = patterns[jp_ref]
+        trip_id = f'{service_code}:{code}'
+        route_id = f'{service_code}_{line_ref}' if line_ref else f'{service_code}_{next(iter(services[service_code]["lines"]), "")}'
+        self.csv_files[LoadCSVFiles.TRIPS].append({'route_id': route_id, 'service_id': service_id or services[service_code]['service_id'],
+                                                   'trip_id': trip_id, 'trip_headsign': '', 'direction_id': direction_id})
+        stop_times = self.csv_files[LoadCSVFiles.STOP_TIMES]
+        sequence, arrival = 0, t
+        for link_id, from_stop, from_wait, to_stop, to_wait, run in (link for ref in section_refs for link in sections.get(ref, [])):
+            if link_id in overrides:
+                o_from, o_to, o_run = overrides[link_id]
+                from_wait, to_wait, run = (TimeTransforms.iso_duration(o_from) if o_from else from_wait, TimeTransforms.iso_duration(o_to) if o_to else to_wait, TimeTransforms.iso_duration(o_run) if o_run else run)
+            if sequence == 0: sequence, arrival = 1, t
+            else: t += from_wait
+            stop_times.append({'trip_id': trip_id, 'arrival_time': TimeTransforms.ts_from_seconds(arrival), 'departure_time': TimeTransforms.ts_from_seconds(t),
+                               'stop_id': from_stop, 'stop_sequence': str(sequence)})
+            t += run; arrival = t; t += to_wait; sequence += 1
+            last_stop = to_stop
+        if sequence: stop_times.append({'trip_id': trip_id, 'arrival_time': TimeTransforms.ts_from_seconds(arrival), 'departure_time': TimeTransforms.ts_from_seconds(arrival),
+                                        'stop_id': last_stop, 'stop_sequence': str(sequence)})
+        return True
+
+    def _parse(self, path: str, annotations: dict, patterns: dict, sections: dict, services: dict, journeys: dict, deferred: list, periods: list, skipped: list) -> None:
+        ns, parents = '', []
+        q = lambda path: '/'.join(ns + p if p != '*' else p for p in path.split('/'))
+        for event, elem in ET.iterparse(path, events=('start', 'end')):
+            if event == 'start':
+                if not parents and elem.tag.startswith('{'): ns = elem.tag[:elem.tag.index('}') + 1]
+                parents.append(elem)
+                continue
+            parents.pop()
+            tag = elem.tag[len(ns):]
+            if tag in ('StopPoint', 'AnnotatedStopPointRef') and parents and parents[-1].tag == ns + 'StopPoints':
+                self.csv_files[LoadCSVFiles.STOPS].append(self._stop_row(elem, q, annotations))
+            elif tag in ('Operator', 'LicensedOperator') and parents and parents[-1].tag == ns + 'Operators':
+                self.csv_files[LoadCSVFiles.AGENCY].append({'agency_id': elem.get('id'), 'agency_name': elem.findtext(q('TradingName')) or elem.findtext(q('OperatorShortName')) or '',
+                                                            'agency_url': '', 'agency_timezone': 'Europe/London'})
+            elif tag == 'JourneyPatternSection':
+                sections[elem.get('id')] = self._journey_pattern_sections(elem, q)
+            elif tag == 'Service':
+                service_code = elem.findtext(q('ServiceCode'))
+                service_id = self._service_id(elem.find(q('OperatingProfile')), q)
+                lines = {line.get('id'): line.findtext(q('LineName')) or '' for line in elem.iterfind(q('Lines/Line'))}
+                services[service_code] = {'service_id': service_id, 'lines': lines}
+                periods.append((elem.findtext(q('OperatingPeriod/StartDate')) or '', elem.findtext(q('OperatingPeriod/EndDate')) or ''))
+                for line_id, line_name in lines.items():
+                    self.csv_files[LoadCSVFiles.ROUTES].append({'route_id': f'{service_code}_{line_id}', 'agency_id': elem.findtext(q('RegisteredOperatorRef')) or '',
+                                                                'route_short_name': line_name, 'route_long_name': elem.findtext(q('Description')) or '',
+                                                                'route_type': str(self._ROUTE_TYPES.get((elem.findtext(q('Mode')) or 'bus').lower(), 3))})
+                for pattern in elem.iterfind(q('StandardService/JourneyPattern')):
+                    patterns[pattern.get('id')] = (service_code, '1' if (pattern.findtext(q('Direction')) or '').lower() in ('inbound', 'anticlockwise') else '0',
+                                                   [ref.text for ref in pattern.iterfind(q('JourneyPatternSectionRefs'))])
+            elif tag == 'VehicleJourney':
+                vj = self._vehicle_journey(elem, q)
+                if not self._emit_trip(vj, patterns, sections, services, journeys, skipped): deferred.append(vj)
+            elif tag not in ('RouteSection', 'Route') or not parents or parents[-1].tag not in (ns + 'RouteSections', ns + 'Routes'): continue
+            if parents: parents[-1].remove(elem)
+            elem.clear()
+
+    def _calendar(self, periods: list) -> None:
+        starts, ends = [p[0].replace('-', '') for p in periods if p[0]], [p[1].replace('-', '') for p in periods if p[1]]
+        for service_id in sorted({row['service_id'] for row in self.csv_files[LoadCSVFiles.TRIPS]}, key=int):
+            days = self._service_days(service_id)
+            self.csv_files[LoadCSVFiles.CALENDAR].append({'service_id': service_id, **{d: str(int(DayOfWeek(i) in days)) for i, d in enumerate(self._GTFS_DAYS)},
+                                                          'start_date': min(starts) if starts else '', 'end_date': max(ends) if ends else '',
+                                                          'service_type': service_id})
+
+    @_context.timing("TXC load")
+    def _to_memory(self) -> None:
+        annotations, patterns, sections, services, journeys, deferred, periods, skipped = self._stop_annotations(), {}, {}, {}, {}, [], [], []
+        for path in self.txc_paths:
+            print(f"LOG: Streaming {path}")
+            self._parse(path, annotations, patterns, sections, services, journeys, deferred, periods, skipped)
+        unresolved = [vj for vj in deferred if not self._emit_trip(vj, patterns, sections, services, journeys, skipped)]
+        if unresolved: print(f'WARNING: {len(unresolved)} vehicle journeys reference unknown journey patterns')
+        if skipped: print(f'WARNING: skipped {len(skipped)} vehicle journeys without a valid DepartureTime: {", ".join(skipped[:10])}')
+        custom = sorted({row['service_id'] for row in self.csv_files[LoadCSVFiles.TRIPS] if int(row['service_id']) >= self.CUSTOM_SERVICE}, key=int)
+        for service_id in custom:
+            days = '+'.join(day.name for day in sorted(self._service_days(service_id), key=lambda day: day.value))
+            print(f'WARNING: operating profile {days} has no ServiceTypes, its trips get service_id {service_id}')
+        self.csv_files[LoadCSVFiles.STOPS] = list({row['stop_id']: row for row in self.csv_files[LoadCSVFiles.STOPS]}.values())
+        self.csv_files[LoadCSVFiles.ROUTES] = list({row['route_id']: row for row in self.csv_files[LoadCSVFiles.ROUTES]}.values())
+        self.csv_files[LoadCSVFiles.AGENCY] = list({row['agency_id']: row for row in self.csv_files[LoadCSVFiles.AGENCY]}.values())
+        self._calendar(periods)
+
+    def load(self, file: LoadCSVFiles) -> list[dict]:
+        if _context.enabled(): _context.count(f'rows_scanned.{file.name}', len(self.csv_files[file]))
+        return self.csv_files[file]
+
+class GTFSLoadCached(BaseDataLoader):
+    """
+    Stands in for a loader whose parsed tables are pickled in cache_directory under the feed fingerprint
+
+    The fingerprint comes from the source files alone, so a caller that only needs it (a CorridorCache
+    hit) never touches the feed. The first load() unpickles the cached loader, or builds it with
+    loader_factory and pickles it for the next run. A changed source file changes the fingerprint and
+    the feed is parsed again.
+
+    load_method: GTFSLoadMethod
+        load method of the loader built by loader_factory, part of the fingerprint
+    paths: list[str]
+        source files of the feed, the same ones loader_factory reads
+    loader_factory: Callable[[], BaseDataLoader]
+    cache_directory: str
+    """
+    def __init__(self, load_method: GTFSLoadMethod, paths: list[str], loader_factory: Callable[[], BaseDataLoader], cache_directory: str) -> None:
+        super().__init__(load_method)
+        self.paths, self.loader_factory, self.cache_directory = [path for path in paths if path], loader_factory, cache_directory
+        self._loader: Optional[BaseDataLoader] = None
+        if not all(os.path.exists(path) for path in self.paths): raise FileNotFoundError(f'{[p for p in self.paths if not os.path.exists(p)]}')
+
+    def __call__(self, file: LoadCSVFiles) -> None: self.load(file)
+
+    def source_paths(self) -> list[str]: return self.paths
+
+    @property
+    def cache_path(self) -> str: return os.path.join(self.cache_directory, f'feed-{self.fingerprint()}.pkl')
+
+    @property
+    def cached(self) -> bool: return os.path.exists(self.cache_path)
+
+    def loader(self) -> BaseDataLoader:
+        if self._loader is None:
+            if self.cached:
+                with _context.span('GTFSLoadCached.unpickle'), open(self.cache_path, 'rb') as f: self._loader = pickle.load(f)
+            else:
+                self._loader = self.loader_factory()
+                if not os.path.exists(self.cache_directory): os.makedirs(self.cache_directory)
+                with open(self.cache_path + '.tmp', 'wb') as f: pickle.dump(self._loader, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(self.cache_path + '.tmp', self.cache_path)
+        return self._loader
+
+    def load(self, file: LoadCSVFiles) -> list[dict]: return self.loader().load(file)
+
+if __name__ == "__main__":
+    gtfs_loader = GTFSLoadCSV('./data/agency.csv', './data/calendar.csv', './data/calendar_dates.csv', './data/routes.csv', './data/stop_times.csv', './data/stops.csv', './data/trips.csv')
+    print(gtfs_loader.csv_files[LoadCSVFiles.STOPS])
\ No newline at end of file
@@ -0,0 +1,694 @@
+from slighe.transforms import TimeTransforms
+from slighe import _context
+
+from enum import Enum
+from dataclasses import dataclass, field, replace
+from typing import Optional, Union, Self, Generator, Any
+from itertools import chain, count, takewhile
+from operator import itemgetter
+from datetime import datetime
+from collections import defaultdict
+import bisect
+import csv
+import io
+import os
+import re
+import time
+
+
+class DayOfWeek(Enum):
+    MON = 0
+    TUE = 1
+    WED = 2
+    THU = 3
+    FRI = 4
+    SAT = 5
+    SUN = 6
+
+class ServiceTypes(Enum):
+    NO_SERVICE = 0
+    MON_FRI = 1
+    MON = 2
+    TUE = 3
+    WED = 4
+    THU = 5
+    FRI = 6
+    SAT = 7
+    SUN = 8 
+    MON_THU = 9
+    MON_SAT = 10
+    MON_SUN = 11
+    MON_THU_SAT = 13
+    TUE_THU = 14
+    MON_PLUS_SUN = 15
+    SAT_SUN = 16
+    MON_PLUS_FRI = 17
+    MON_PLUS_FRI_PLUS_SAT = 18
+    FRI_SAT = 19
+    FRI_SUN = 20
+    TUE_PLUS_THU = 21
+    MON_FRI_PLUS_SUN = 25
+    FRI_PLUS_SUN = 27
+    TUE_FRI = 28
+
+_D = DayOfWeek
+SERVICE_DAYS: dict[ServiceTypes, frozenset[DayOfWeek]] = {
+    ServiceTypes.NO_SERVICE: frozenset(),
+    ServiceTypes.MON_FRI: frozenset([_D.MON, _D.TUE, _D.WED, _D.THU, _D.FRI]),
+    ServiceTypes.MON: frozenset([_D.MON]),
+    ServiceTypes.TUE: frozenset([_D.TUE]),
+    ServiceTypes.WED: frozenset([_D.WED]),
+    ServiceTypes.THU: frozenset([_D.THU]),
+    ServiceTypes.FRI: frozenset([_D.FRI]),
+    ServiceTypes.SAT: frozenset([_D.SAT]),
+    ServiceTypes.SUN: frozenset([_D.SUN]),
+    ServiceTypes.MON_THU: frozenset([_D.MON, _D.TUE, _D.WED, _D.THU]),
+    ServiceTypes.MON_SAT: frozenset([_D.MON, _D.TUE, _D.WED, _D.THU, _D.FRI, _D.SAT]),
+    ServiceTypes.MON_SUN: frozenset(_D),
+    ServiceTypes.MON_THU_SAT: frozenset([_D.MON, _D.TUE, _D.WED, _D.THU, _D.SAT]),
+    ServiceTypes.TUE_THU: frozenset([_D.TUE, _D.WED, _D.THU]),
+    ServiceTypes.MON_PLUS_SUN: frozenset([_D.MON, _D.SUN]),
+    ServiceTypes.SAT_SUN: frozenset([_D.SAT, _D.SUN]),
+    ServiceTypes.MON_PLUS_FRI: frozenset([_D.MON, _D.FRI]),
+    ServiceTypes.MON_PLUS_FRI_PLUS_SAT: frozenset([_D.MON, _D.FRI, _D.SAT]),
+    ServiceTypes.FRI_SAT: frozenset([_D.FRI, _D.SAT]),
+    ServiceTypes.FRI_SUN: frozenset([_D.FRI, _D.SAT, _D.SUN]),
+    ServiceTypes.TUE_PLUS_THU: frozenset([_D.TUE, _D.THU]),
+    ServiceTypes.MON_FRI_PLUS_SUN: frozenset([_D.MON, _D.TUE, _D.WED, _D.THU, _D.FRI, _D.SUN]),
+    ServiceTypes.FRI_PLUS_SUN: frozenset([_D.FRI, _D.SUN]),
+    ServiceTypes.TUE_FRI: frozenset([_D.TUE, _D.WED, _D.THU, _D.FRI]),
+}
+# days of the week each service type runs on, service_id in the NTA feed is the ServiceTypes value
+
+@dataclass(frozen=True)
+class Stop:
+    stop_id: str
+    stop_name: str
+    stop_latitude: float
+    stop_longitude: float
+    settlement: str
+    county: str
+
+    def __str__(self) -> str: return f'{self.stop_id}: {self.stop_name.upper()} IN {self.settlement.upper()}'
+    
+@dataclass(frozen=True)
+class StopTime: 
+    trip_id: str
+    stop_id: str
+    stop_sequence: int
+    arrival_time: Optional[Union[str, float]]
+    departure_time: Optional[Union[str, float]]
+
+    def __str__(self) -> str: return f'ARRIVAL TIME: {self.arrival_time}\nDEPARTURE TIME: {self.departure_time}' #TODO: THIS WONT WORK FOR STR AND DATETIME TYPES
+    def __lt__(self, other: Self) -> bool: return TimeTransforms.ts_val(self.arrival_time) < TimeTransforms.ts_val(other.arrival_time)
+    def __gt__(self, other: Self) -> bool: return TimeTransforms.ts_val(self.arrival_time) > TimeTransforms.ts_val(other.arrival_time)
+    def __eq__(self, other: Self) -> bool: return TimeTransforms.ts_val(self.arrival_time) == TimeTransforms.ts_val(other.arrival_time)
+    def __le__(self, other: Self) -> bool: return TimeTransforms.ts_val(self.arrival_time) <= TimeTransforms.ts_val(other.arrival_time)
+    def __ge__(self, other: Self) -> bool: return TimeTransforms.ts_val(self.arrival_time) >= TimeTransforms.ts_val(other.arrival_time)
+    def timestring_to_float(self) -> None: self.arrival_time, self.departure_time = TimeTransforms.ts_to_float(self.arrival_time, "%H:%M:%S"), TimeTransforms.ts_to_float(self.departure_time, "%H:%M:%S")
+        
+@dataclass(frozen=True)
+class Trip:
+    trip_id: str
+    route_id: str
+    direction_id: int
+    service_id: int
+    stops: list[Stop]
+    stop_times: list[StopTime]
+    stop_sequence: dict[Stop: int]
+
+@dataclass(frozen=True)
+class Route:
+    route_id: str
+    agency_id: str
+    route_short_name: str
+    route_long_name: str
+    route_type: int
+    trips: list[Trip]
+
+@dataclass(frozen=True)
+class Corridor:
+    corridor_id: int
+    corridor_name: str
+    routes: list[Route]
+
+    def pull_stops(self) -> list[Stop]: return list(chain.from_iterable(list(chain.from_iterable([[[trip.stops[i] for i in range(len(trip.stops))] for trip in route.trips] for route in self.routes]))))
+    # chain.from_iterable - return individual element into a single sequence that is in a list type
+    # [[[s1_t1_r1, ...], [s1_t2_r1, ...], ...], [[s1_t1_r2, ...], ...], ...]
+    # v list(chain.from_iterable([[[]]])) would this not output the same as input?
+    # [[s1_t1_r1, ...], [s1_t2_r1, ...], ...], [[s1_t1_r2, ...], [s1_t2_r2, ...], ...], ...
+    # [s1_t1_r1, ...], [s1_t2_r1, ...], ..., [s1_t1_r2, ...], [s1_t1_r2, ...], ..., ...
+    def pull_stop_times(self) -> list[StopTime]: return list(chain.from_iterable(list(chain.from_iterable([[[trip.stop_times[i] for i in range(len(trip.stop_times))] for trip in route.trips] for route in self.routes]))))
+    def pull_trips(self) -> list[Trip]: return list(chain.from_iterable([route.trips for route in self.routes]))
+
+@dataclass(frozen=True, repr=False)
+class TimetableIndex:
+    """
+    Inverted indexes over a timetable, built once and reused by every filter_by call
+
+    settlement, county: row ids of the rows at each settlement/county
+    service_type: trip columns (trip_ids) for each service_id
+    times: sorted seconds past midnight, time_keys holds the row id or trip column each time belongs to
+    """
+    settlement: dict[str, tuple[int, ...]]
+    county: dict[str, tuple[int, ...]]
+    service_type: dict[int, tuple[str, ...]]
+    times: list[int]
+    time_keys: list
+
+    @staticmethod
+    def _seconds(value: Optional[Union[str, float]]) -> Optional[int]:
+        try: return TimeTransforms.ts_to_seconds(value)
+        except (ValueError, AttributeError): return None
+
+    @staticmethod
+    def window(time: tuple[Optional[Union[str, float]]]) -> tuple[float, float]:
+        """
+        (start, end) in seconds past midnight, a bound is a GTFS time string or a number of seconds past
+        midnight (TimeTransforms.ts_to_seconds) and None leaves that side open.
+        The strptime timestamps of TimeTransforms.ts_val fall on 1900-01-01 and are negative, they are
+        rejected rather than read as seconds
+        """
+        start, end = (TimeTransforms.ts_to_seconds(t) if isinstance(t, str) else t for t in time)
+        for t in (start, end):
+            if t is not None and t < 0: raise ValueError(f'time window bound {t} is not seconds past midnight, convert with TimeTransforms.ts_to_seconds')
+        return start if start is not None else float('-inf'), end if end is not None else float('inf')
+
+    def in_window(self, time: tuple[Optional[Union[str, float]]]) -> list:
+        start, end = self.window(time)
+        return self.time_keys[bisect.bisect_left(self.times, start):bisect.bisect_right(self.times, end)]
+
+    def rows_at(self, settlement: list[str] = None, county: list[str] = None) -> Optional[set[int]]:
+        rows = None
+        if settlement is not None: rows = set(chain.from_iterable(self.settlement.get(s, ()) for s in settlement))
+        if county is not None:
+            at_county = set(chain.from_iterable(self.county.get(c, ()) for c in county))
+            rows = at_county if rows is None else rows & at_county
+        return rows
+
+@dataclass(frozen=True, repr=False)
+class TimetableView:
+    """
+    Rows and columns of a timetable selected by filter_by, the rows are not copied
+    """
+    data: list[dict]
+    rows: tuple[int, ...]
+    columns: tuple[str, ...]
+
+    def __len__(self) -> int: return len(self.rows)
+    def __getitem__(self, idx: int) -> dict: return {col: self.data[self.rows[idx]].get(col, 0) for col in self.columns}
+    def __iter__(self) -> Generator[dict, None, None]: return (self[i] for i in range(len(self.rows)))
+
+    def to_csv(self, file_path: str) -> ...:
+        with open(file_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(self.columns), extrasaction='ignore')
+            writer.writeheader()
+            for row_idx in self.rows:
+                writer.writerow(self.data[row_idx])
+
+@dataclass(frozen=True)
+class FrequencyBlock:
+    """
+    Trip columns of a corridor timetable of one route and service that share one stop pattern and run at
+    a constant headway, the times of trip k are the times of the first trip shifted by k * headway seconds
+
+    columns: positions of the trips among the trip columns of CorridorTimetable.to_csv
+    start: first time of the first trip, None when the block's trip has no times
+    headway: seconds between consecutive trips, 0 for a block of one trip
+    """
+    block_id: str
+    route_id: str
+    service_id: int
+    trip_ids: tuple[str, ...]
+    columns: tuple[int, ...]
+    start: Optional[int]
+    headway: int
+
+    @property
+    def end(self) -> Optional[int]: return None if self.start is None else self.start + self.headway * (len(self.trip_ids) - 1)
+
+    def __str__(self) -> str:
+        if self.start is None or len(self.trip_ids) == 1: return f'{self.block_id}: {self.trip_ids[0]}'
+        return (f'{self.block_id}: every {self.headway // 60} min from {TimeTransforms.ts_from_seconds(self.start)} '
+                f'to {TimeTransforms.ts_from_seconds(self.end)} ({len(self.trip_ids)} trips)')
+
+LAYOUT_FIELDS = list(Stop.__dataclass_fields__) + ['direction_id']
+FREQUENCY_FIELDS = ['block_id', 'route_id', 'service_id', 'start_time', 'end_time', 'headway_secs', 'trip_ids', 'columns']
+CANONICAL_TIME = re.compile(r'([0-9]{2}|[1-9][0-9]{2,}):([0-5][0-9]):([0-5][0-9])')
+# the strings TimeTransforms.ts_from_seconds writes, the only cells a FrequencyBlock shifts
+
+def _rows_by(data: list[dict], key: str) -> dict[str, tuple[int, ...]]:
+    rows = defaultdict(list)
+    for idx, row in enumerate(data): rows[row[key]].append(idx)
+    return {k: tuple(v) for k, v in rows.items()}
+
+def _join_csv(values: list[str]) -> str:
+    f = io.StringIO()
+    csv.writer(f, lineterminator='').writerow(values)
+    return f.getvalue()
+
+def _split_csv(value: str) -> list[str]: return next(csv.reader([value]))
+
+def _to_runs(positions: tuple[int, ...]) -> str:
+    """
+    positions as space separated runs, first:last:step for three or more with a constant step, else the position
+    """
+    runs, n = [], 0
+    while n < len(positions):
+        m = n + 1
+        if m < len(positions) and positions[m] != positions[n]:
+            step = positions[m] - positions[n]
+            while m + 1 < len(positions) and positions[m + 1] - positions[m] == step: m += 1
+            if m - n >= 2: runs.append(f'{positions[n]}:{positions[m]}:{step}'); n = m + 1; continue
+        runs.append(str(positions[n])); n += 1
+    return ' '.join(runs)
+
+def _from_runs(value: str) -> list[int]:
+    positions = []
+    for run in value.split():
+        first, _, rest = run.partition(':')
+        if not rest: positions.append(int(first)); continue
+        last, step = map(int, rest.split(':'))
+        positions.extend(range(int(first), last + (1 if step > 0 else -1), step))
+    return positions
+
+@dataclass(repr=False)
+class TripTimetable:
+    stops: list[Stop]
+    trip: Trip
+    data: list[dict]       
+    _index: Optional[TimetableIndex] = field(default=None, init=False, compare=False)
+
+    def filter_by(self, 
+                  time: tuple[Optional[Union[str, float]]] = None,
+                  service_type: list[ServiceTypes] = None,
+                  settlement: list[str] = None,
+                  county: list[str] = None
+                  ) -> ...:
+        """
+        Filter the timetable by time, settlement, service type and county
+
+        time: tuple[Optional[Union[str, float]]] = None
+            start and end times as GTFS time strings or seconds past midnight, None for an open end
+        settlement: list[str] = None
+            settlements to filter by
+        county: list[str] = None
+            counties to filter by
+
+        Returns a TimetableView of the rows with a stop time in the window, at the settlements and counties
+        given, and every row or none depending on whether the trip runs on one of the service types
+        """
+        index, rows = self.index, None
+        if service_type is not None and self.trip.service_id not in {st.value for st in service_type}: rows = set()
+        if time is not None: rows = set(index.in_window(time)) if rows is None else rows & set(index.in_window(time))
+        at = index.rows_at(settlement, county)
+        if at is not None: rows = at if rows is None else rows & at
+        return TimetableView(self.data, tuple(range(len(self.data))) if rows is None else tuple(sorted(rows)), tuple(self.data[0].keys()) if self.data else ())
+
+    @property
+    def index(self) -> TimetableIndex:
+        if self._index is None:
+            timed = sorted((t, idx) for idx, t in enumerate(TimetableIndex._seconds(row['stop_time']) for row in self.data) if t is not None)
+            self._index = TimetableIndex(_rows_by(self.data, 'settlement'), _rows_by(self.data, 'county'),
+                                         {self.trip.service_id: (self.trip.trip_id,)}, [t for t, _ in timed], [idx for _, idx in timed])
+        return self._index
+
+    def sort_by_time(self, ascending: bool = True) -> ...:
+        self._index = None
+        if ascending: self.data.sort(key=lambda x: TimeTransforms.ts_val(x['stop_time']))
+        else: self.data.sort(key=lambda x: TimeTransforms.ts_val(x['stop_time']), reverse=True)
+
+    def to_csv(self, file_path: str) -> ...:
+        with open(file_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(self.data[0].keys()))
+            writer.writeheader()
+            for row_data in self.data:
+                writer.writerow(row_data)
+
+@dataclass(repr=False)
+class CorridorTimetable:
+    stops: list[Stop]
+    trips: list[Trip]
+    timetable: list[dict]
+    t_sort: bool = False
+    t_layout: bool = False
+    _index: Optional[TimetableIndex] = field(default=None, init=False, compare=False)
+    _times: Any = field(default=None, init=False, compare=False)
+
+    def __getstate__(self) -> dict:
+        """
+        Pickles (the CorridorCache disk tier) keep the trips without their stops and stop_times, the rows
+        already hold their times, and a trip repeated in self.trips is written once. The index is built
+        first and pickled with them, so a reloaded timetable does not rebuild it from the rows
+        """
+        slim, index = {}, self.index
+        for trip in self.trips:
+            key = (trip.trip_id, trip.route_id, trip.direction_id, trip.service_id)
+            if key not in slim: slim[key] = replace(trip, stops=[], stop_times=[], stop_sequence={})
+        return {**self.__dict__, '_index': index, 'trips': [slim[(trip.trip_id, trip.route_id, trip.direction_id, trip.service_id)] for trip in self.trips]}
+
+    def filter_by(self,
+                time: tuple[Optional[Union[str, float]]] = None,
+                service_type: list[ServiceTypes] = None,
+                settlement: list[str] = None,
+                county: list[str] = None
+                ) -> ...:
+        """
+        Filter the timetable by time, settlement, service type and county
+
+        time: tuple[Optional[Union[str, float]]] = None
+            start and end times as GTFS time strings or seconds past midnight, None for an open end
+        settlement: list[str] = None
+            settlements to filter by
+        county: list[str] = None
+            counties to filter by
+
+        Returns a TimetableView with the trip columns that depart (first stop time) inside the time window
+        and run on one of the service types, over the rows at the settlements and counties given
+        """
+        index, trip_ids = self.index, None
+        if service_type is not None: trip_ids = set(chain.from_iterable(index.service_type.get(st.value, ()) for st in service_type))
+        if time is not None: trip_ids = set(index.in_window(time)) if trip_ids is None else trip_ids & set(index.in_window(time))
+        rows = index.rows_at(settlement, county)
+        stop_fields = tuple(self._stop_fields()) if self.timetable else ()
+        return TimetableView(self.timetable,
+                             tuple(range(len(self.timetable))) if rows is None else tuple(sorted(rows)),
+                             stop_fields + tuple(trip.trip_id for trip in self.trips if trip_ids is None or trip.trip_id in trip_ids))
+
+    @property
+    def index(self) -> TimetableIndex:
+        if self._index is None:
+            service_type = defaultdict(list)
+            for trip in self.trips: service_type[trip.service_id].append(trip.trip_id)
+            if self._times is not None:
+                first_times = {trip_id: t for trip_id, t in zip(self._trip_ids(), self._earliest(axis=0).tolist()) if t >= 0}
+            else: first_times = self._first_times()
+            timed = sorted((t, trip_id) for trip_id, t in first_times.items())
+            self._index = TimetableIndex(_rows_by(self.timetable, 'settlement'), _rows_by(self.timetable, 'county'),
+                                         {k: tuple(v) for k, v in service_type.items()}, [t for t, _ in timed], [trip_id for _, trip_id in timed])
+        return self._index
+
+    def _first_times(self) -> dict[str, int]:
+        """
+        first time of each trip column, read from the stop_times of the trips in one pass. Trips pickled
+        without their stop_times (see __getstate__) are read from their timetable column instead
+        """
+        first_times, columns, done = {}, set(self._trip_ids()), set()
+        for trip in self.trips:
+            if trip.trip_id in done: continue
+            done.add(trip.trip_id)
+            for st in trip.stop_times:
+                if st.trip_id not in columns or st.arrival_time in ('', '0', 0, None): continue
+                t = TimetableIndex._seconds(st.arrival_time)
+                if t is not None and t < first_times.get(st.trip_id, float('inf')): first_times[st.trip_id] = t
+        unread = list(dict.fromkeys(trip.trip_id for trip in self.trips if not trip.stop_times and trip.trip_id not in first_times))
+        for row in self.timetable if unread else ():
+            for trip_id in unread:
+                value = row.get(trip_id)
+                if value in ('', '0', 0, None): continue
+                t = TimetableIndex._seconds(value)
+                if t is not None and t < first_times.get(trip_id, float('inf')): first_times[trip_id] = t
+        return first_times
+
+    @_context.timing(f'Stop Disolve')
+    def disolve_stops(self) -> Self:
+        if self.t_layout: return # one row per stop already
+        self._index = None
+        if not self.t_sort: self.sort_by_time()
+        # fieldnames = list(set([str(row.keys()) for row in self.timetable])) # Headers - list with one member of dict_keys
+        fieldnames = list(self.timetable[0].keys()) # Headers
+
+        def stop_lookahead(row: dict) -> tuple[int, int]:
+            start_row_idx = self.timetable.index(row)
+            stop_id = row['stop_id']
+            is_duplicate = True
+            row_idx, duplicate_stops = start_row_idx, 0
+            while is_duplicate and duplicate_stops < len(self.timetable):
+                if self.timetable[row_idx + 1]['stop_id'] == stop_id: 
+                    # row_idx += 1 # Added in to go into next row
+                    duplicate_stops += 1
+                else:
+                    is_duplicate = False
+                row_idx += 1
+            return start_row_idx, duplicate_stops #row_idx changes if duplcate presents, can return start_row_idx or use the last duplicate_exist row_idx for merging
+
+        def get_consolidated_data(start_idx: int, duplicates: int) -> dict: # Trying to merge duplicate_exist time inot the same row
+            consolidated = dict(zip(fieldnames, [0 for x in range(len(fieldnames))])) # create dict with headers as key, [0] as item. Instead this is creating {fieldnames: [0]}
+            for row in self.timetable[start_idx: start_idx + duplicates + 1]:
+                for key, value in row.items(): # ? Question: would it be better if skip the non-trip items? As this will update non-trip items each time, i.e. stop_id...
+                    # if value != '0': # ? Question: Trip time value is int(0) not str(0). Should this change to str(0)? Default value is int(0)
+                    if value != 0: 
+                        consolidated.update({key: value})
+                        continue
+            return consolidated
+
+        def delete_dupliucate(strat_row, end_row):
+            for index in sorted([x for x in range(strat_row+1, end_row)], reverse=True): # Delete duplicate_exist rows
+                del self.timetable[index]
+
+        to_del = []
+        # for row in self.timetable: # row is a dictinary of a row in self.timetable (self.timetable is a list)
+        #     row_idx, duplicate_stops = stop_lookahead(row)
+        #     if duplicate_stops > 0: 
+        #         row.update(get_consolidated_data(row_idx, duplicate_stops)) # replace the first row of replicate to the merged row
+        #         to_del.append([x for x in range(row_idx+1, duplicate_stops)]) # append dulicated row index to te_del list
+        #     else: to_del.append(row_idx)
+        duplicate_exist, idx = True, 0
+        while duplicate_exist:
+            if idx > len(self.timetable): break
+            if self.timetable[idx]['stop_id'] == 0: break #! Added in to stop when get to rows with all zores
+            row_idx, duplicate_stops = stop_lookahead(self.timetable[idx])
+            if duplicate_stops > 0: 
+                self.timetable[idx] = get_consolidated_data(row_idx, duplicate_stops) # replace the first row of replicate to the merged row
+                del self.timetable[row_idx+1:row_idx+duplicate_stops+1]
+            else: pass #to_del.append(row_idx)
+            idx += 1
+
+        # for index in sorted(to_del, reverse=True): # Delete duplicate_exist rows
+        #     del self.timetable[index]
+                
+    def sort_by_time(self, ascending: bool = True) -> Self:
+        if self.t_layout: return # rows are in the merged stop order, sorting them by time would break it
+        trips_ids = [trip.trip_id for trip in self.trips]
+    
+        def parse_time(value):
+            try: return datetime.strptime(value, '%H:%M:%S') if value and value != '0' else None
+            #   value and value?
+            except ValueError: return None
+            # Do some timevalue none?
+
+        def get_earliest_time(row):
+            times = [parse_time(row[col]) for col in row if col in trips_ids and row[col] != '0']
+            times = [time for time in times if time is not None] # Remove None values
+            return min(times) if times else datetime.max # return min time if times is not empty, else return latest time.
+
+        self.timetable, self.t_sort, self._index = sorted(self.timetable, key=get_earliest_time), True, None
+
+    def to_csv(self, file_path: str) -> ...:
+        with open(file_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=self._stop_fields() + [trip.trip_id for trip in self.trips], extrasaction='ignore')
+            writer.writeheader()
+            for row_data in self.timetable:
+                writer.writerow(row_data)
+
+    def _stop_fields(self) -> list[str]:
+        """
+        the stop columns in front of the trip columns, the layout rows also carry direction_id
+        """
+        return list(takewhile(LAYOUT_FIELDS.__contains__, self.timetable[0])) if self.t_layout else list(self.timetable[0].keys())[:6]
+
+    def _trip_ids(self) -> list[str]: return list(dict.fromkeys(trip.trip_id for trip in self.trips))
+
+    def _earliest(self, axis: int) -> 'np.ndarray':
+        """
+        earliest time of each trip column (axis=0) or row (axis=1) of the interpolated times, -1 where there is none
+        """
+        import numpy as np
+        if not self._times.size: return np.full(self._times.shape[1 - axis], -1, dtype=np.int32)
+        earliest = np.where(self._times >= 0, self._times, np.iinfo(np.int32).max).min(axis=axis)
+        return np.where(earliest == np.iinfo(np.int32).max, -1, earliest)
+
+    def _cells(self, trip_ids: list[str], missing: Any) -> tuple[list, 'np.ndarray']:
+        """
+        the distinct cells of the trip columns and a rows x trip columns matrix of their positions in that
+        list, so each distinct cell is parsed once, missing is the cell of a row without the trip's key
+        """
+        import numpy as np
+        getter = itemgetter(*trip_ids) if len(trip_ids) > 1 else lambda row: (row[trip_ids[0]],)
+        try: cells = [getter(row) for row in self.timetable]
+        except KeyError: cells = [tuple(row.get(t, missing) for t in trip_ids) for row in self.timetable]
+        codes = defaultdict(count().__next__)
+        matrix = np.fromiter(map(codes.__getitem__, chain.from_iterable(cells)), dtype=np.intp, count=len(cells) * len(trip_ids))
+        return list(codes), matrix.reshape(len(cells), len(trip_ids))
+
+    @_context.timing('CorridorTimetable.interpolate_times')
+    def interpolate_times(self) -> Self:
+        """
+        Fills the blank times of every trip from the timepoints either side of them, weighted by the distance
+        between the stops (TimeTransforms.interpolate_seconds), the whole timetable in one NumPy pass
+
+        Cells of 0 are stops the trip does not serve and stay 0, blank or unparseable cells are missing times;
+        blanks before the first or after the last timepoint of a trip stay blank. Needs the layout timetable,
+        where the rows a trip serves are its stops in order.
+
+        Keeps the times as a dense int32 matrix (rows x trip columns, -1 where there is no time), which
+        _clean_rows and index then use instead of parsing the cells again
+        """
+        if not self.t_layout: raise ValueError('interpolate_times needs stops in trip order, build with CorrdidorTimetableConstructor(corridor, layout=True)')
+        import numpy as np
+        trip_ids = self._trip_ids()
+        values, cells = self._cells(trip_ids, 0)
+        seconds = [TimetableIndex._seconds(value) if value != 0 and value != '0' else -2 for value in values]
+        times = np.array([-1 if t is None else t for t in seconds], dtype=np.int32)[cells]
+
+        def coordinate(value: Any) -> float:
+            try: return float(value)
+            except (TypeError, ValueError): return float('nan')
+        latitude = np.array([coordinate(row.get('stop_latitude')) for row in self.timetable], dtype='float64')
+        longitude = np.array([coordinate(row.get('stop_longitude')) for row in self.timetable], dtype='float64')
+
+        columns, rows = np.nonzero(times.T != -2)
+        served = times[rows, columns]
+        filled = TimeTransforms.interpolate_seconds(np.where(served >= 0, served, np.nan), latitude[rows], longitude[rows], columns)
+        new = (served < 0) & ~np.isnan(filled)
+        for r, c, t in zip(rows[new].tolist(), columns[new].tolist(), filled[new].astype(np.int64).tolist()):
+            self.timetable[r][trip_ids[c]] = TimeTransforms.ts_from_seconds(t)
+        times[:] = -1
+        times[rows, columns] = np.where(np.isnan(filled), -1, filled)
+        self._times, self._index = times, None
+        _context.count('interpolate.filled', int(new.sum()))
+        return self
+
+    def frequency_blocks(self, min_trips: int = 2) -> list[FrequencyBlock]:
+        """
+        Splits the trip columns into FrequencyBlocks
+
+        Columns are grouped by route, service_id, stop pattern (the cells that are not times, 0 or '') and
+        the offsets of their times from their first time, so a group only differs by a constant shift.
+        Columns of a group starting at the same time (the same trip repeated, or parallel trips) are dealt
+        into layers, the n-th column at each start time goes to layer n. Each layer is ordered by start
+        and cut into runs of constant headway, runs shorter than min_trips become blocks of one trip.
+        Only canonical HH:MM:SS cells are shifted, any other text is part of the pattern, so expanding the
+        blocks gives back every cell exactly. Needs the layout timetable, where a column's rows are its
+        trip's stops in order.
+
+        The cells are read once into a rows x trip columns matrix, seconds for the times and a negative
+        code per distinct literal, and each column's pattern and offsets are compared as one key
+        """
+        if not self.t_layout: raise ValueError('frequency_blocks needs stops in trip order, build with CorrdidorTimetableConstructor(corridor, layout=True)')
+        import numpy as np
+        trip_ids = [trip.trip_id for trip in self.trips]
+        if not trip_ids or not self.timetable: return []
+        values, cells = self._cells(trip_ids, '')
+        matches = [CANONICAL_TIME.fullmatch(value) if isinstance(value, str) else None for value in values]
+        codes = np.array([int(m[1]) * 3600 + int(m[2]) * 60 + int(m[3]) if m else -2 - n for n, m in enumerate(matches)], dtype=np.int64)[cells]
+        timed = codes >= 0
+        first = codes[timed.argmax(axis=0), np.arange(len(trip_ids))]
+        keys = np.ascontiguousarray(np.concatenate([np.where(timed, -1, codes), np.where(timed, codes - first, 0)]).T)
+
+        groups = defaultdict(list)
+        for position, (trip, has_times, start, key) in enumerate(zip(self.trips, timed.any(axis=0).tolist(), first.tolist(), keys)):
+            if not has_times: groups[(position,)].append((None, position)); continue
+            groups[(trip.route_id, trip.service_id, key.tobytes())].append((start, position))
+
+        runs = []
+        for members in groups.values():
+            layers, seen = defaultdict(list), defaultdict(int)
+            for member in sorted(members, key=lambda m: (m[0] is None, m[0] or 0, m[1])):
+                layers[seen[member[0]]].append(member)
+                seen[member[0]] += 1
+            for layer in layers.values():
+                run = [layer[0]]
+                for member in layer[1:]:
+                    headway = run[1][0] - run[0][0] if len(run) > 1 else member[0] - run[0][0]
+                    if headway > 0 and member[0] - run[-1][0] == headway: run.append(member)
+                    else: runs.append(run); run = [member]
+                runs.append(run)
+        runs = list(chain.from_iterable([run] if len(run) >= min_trips else [[m] for m in run] for run in runs))
+        runs.sort(key=lambda run: run[0][1])
+        return [FrequencyBlock(f'block_{n}', self.trips[run[0][1]].route_id, self.trips[run[0][1]].service_id, tuple(trip_ids[p] for _, p in run),
+                               tuple(p for _, p in run), run[0][0], run[1][0] - run[0][0] if len(run) > 1 else 0) for n, run in enumerate(runs)]
+
+    @staticmethod
+    def _frequencies_path(file_path: str) -> str: return f'{os.path.splitext(file_path)[0]}_frequencies.csv'
+
+    @_context.timing('CorridorTimetable.to_frequency_csv')
+    def to_frequency_csv(self, file_path: str, min_trips: int = 2) -> list[FrequencyBlock]:
+        """
+        Writes the timetable with one column per FrequencyBlock, holding the times of its first trip, and
+        the blocks to <file_path stem>_frequencies.csv, in the manner of GTFS frequencies.txt, one row per
+        block: block_id, route_id, service_id, start_time, end_time, headway_secs, trip_ids (one csv line)
+        and columns (their positions among the to_csv trip columns, as first:last:step runs).
+        expand_frequency_csv turns the pair back into the to_csv file byte for byte.
+        """
+        blocks = self.frequency_blocks(min_trips)
+        stop_fields = self._stop_fields()
+        with open(file_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(stop_fields + [block.block_id for block in blocks])
+            templates = [block.trip_ids[0] for block in blocks]
+            for row in self.timetable: writer.writerow([row.get(k, '') for k in stop_fields] + [row.get(t, '') for t in templates])
+        with open(self._frequencies_path(file_path), 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(FREQUENCY_FIELDS)
+            writer.writerows([block.block_id, block.route_id, block.service_id, '' if block.start is None else TimeTransforms.ts_from_seconds(block.start),
+                              '' if block.end is None else TimeTransforms.ts_from_seconds(block.end), block.headway, _join_csv(block.trip_ids), _to_runs(block.columns)]
+                             for block in blocks)
+        return blocks
+
+    @staticmethod
+    def expand_frequency_csv(file_path: str, output_path: str) -> None:
+        """
+        Writes the to_csv file of a timetable written with to_frequency_csv, the k-th trip of a block is its
+        column shifted by k * headway_secs. Raises ValueError when the frequencies file is not the one
+        written with file_path
+        """
+        frequencies_path = CorridorTimetable._frequencies_path(file_path)
+        with open(frequencies_path, newline='') as f:
+            reader = csv.DictReader(f)
+            if reader.fieldnames != FREQUENCY_FIELDS: raise ValueError(f'{frequencies_path} is not a frequencies file of to_frequency_csv, its fields are {reader.fieldnames}')
+            blocks = list(reader)
+        with open(file_path, newline='') as f: header, *rows = list(csv.reader(f))
+        mismatch = f'{frequencies_path} does not match {file_path}, write both again with to_frequency_csv'
+        n_stop_fields = len(header) - len(blocks)
+        if n_stop_fields < 0 or header[n_stop_fields:] != [block['block_id'] for block in blocks]: raise ValueError(f'{mismatch}: the block columns differ')
+        trips = []
+        for b, block in enumerate(blocks, n_stop_fields):
+            try: trip_ids, columns, headway = _split_csv(block['trip_ids']), _from_runs(block['columns']), int(block['headway_secs'])
+            except (ValueError, StopIteration): raise ValueError(f'{mismatch}: {block["block_id"]} is malformed') from None
+            if len(trip_ids) != len(columns): raise ValueError(f'{mismatch}: {block["block_id"]} has {len(trip_ids)} trip_ids and {len(columns)} columns')
+            trips.extend((column, trip_id, b, k * headway) for k, (trip_id, column) in enumerate(zip(trip_ids, columns)))
+        trips.sort()
+        if [column for column, *_ in trips] != list(range(len(trips))): raise ValueError(f'{mismatch}: the block columns are not a permutation of the trip columns')
+        if any(len(row) != len(header) for row in rows): raise ValueError(f'{mismatch}: a row does not have {len(header)} cells')
+
+        seconds = {}
+        def cell(value: str, shift: int) -> str:
+            if not shift: return value
+            if value not in seconds:
+                m = CANONICAL_TIME.fullmatch(value)
+                seconds[value] = int(m[1]) * 3600 + int(m[2]) * 60 + int(m[3]) if m else None
+            return value if seconds[value] is None else TimeTransforms.ts_from_seconds(seconds[value] + shift)
+
+        sources = [(b, shift) for _, _, b, shift in trips]
+        with open(output_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(header[:n_stop_fields] + [trip_id for _, trip_id, _, _ in trips])
+            for row in rows: writer.writerow(row[:n_stop_fields] + [cell(row[b], shift) for b, shift in sources])
+
+    def _clean_rows(self) -> None:
+        _removed, _len = 0, len(self.timetable)
+        if self._times is not None:
+            keep = (self._times >= 0).any(axis=1)
+            self.timetable, self._times, self._index = [row for row, k in zip(self.timetable, keep.tolist()) if k], self._times[keep], None
+            print(f'REMOVED {_len - len(self.timetable)}/{_len} ROWS')
+            return
+        rm = []
+        for row in self.timetable: 
+            if not abs(sum([TimeTransforms.ts_to_float(v, "%H:%M:%S") for v in row.values() if TimeTransforms._is_t(v)])) > 0: 
+                rm.append(row)
+                _removed += 1
+        for row in rm:
+            self.timetable.remove(row)
+        self._index = None
+        print(f'REMOVED {_removed}/{_len} ROWS')
\ No newline at end of file
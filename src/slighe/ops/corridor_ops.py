@@ -0,0 +1,144 @@
+from slighe.dtypes import Stop, StopTime, Corridor, ServiceTypes, TripTimetable
+from slighe import dload
+from slighe import _context
+
+from dataclasses import dataclass
+from typing import Optional, Union
+from itertools import chain, combinations
+from collections import defaultdict
+import functools
+import heapq
+import random
+import zlib
+import csv
+
+@dataclass(repr=False)
+class CorridorOps:
+    corridor: Corridor
+
+    #TODO:
+    #       - Add a filter for the settlement    
+    #       - A Timetable should just be for a single trip_id
+    #       - Add stop_sequence to the timetable
+
+
+_MERSENNE = (1 << 61) - 1
+
+def merge_stop_order(patterns: list[tuple[str, ...]]) -> list[tuple[str, int]]:
+    """
+    Merge the stop patterns of a corridor direction into one stop order consistent with every pattern
+
+    Nodes are (stop_id, occurrence) so a loop that calls at a stop twice gets two rows. Consecutive stops
+    of each distinct pattern become edges of a DAG which is ordered topologically (Kahn), ties broken by
+    first appearance with the longest pattern read first, so the trunk keeps its order and branches slot in
+    where they join. Contradicting patterns (A before B and B before A) form a cycle, it is broken at the
+    earliest node left. Work is per distinct pattern, not per trip.
+    """
+    rank, successors, indegree = {}, defaultdict(set), defaultdict(int)
+    for pattern in sorted(set(patterns), key=lambda p: (-len(p), p)):
+        seen, previous = defaultdict(int), None
+        for stop_id in pattern:
+            node = (stop_id, seen[stop_id]); seen[stop_id] += 1
+            if node not in rank: rank[node] = len(rank); indegree[node] += 0
+            if previous is not None and node not in successors[previous]:
+                successors[previous].add(node); indegree[node] += 1
+            previous = node
+    heap = [(r, node) for node, r in rank.items() if indegree[node] == 0]
+    heapq.heapify(heap)
+    order, done = [], set()
+    while len(order) < len(rank):
+        if not heap:
+            node = min((n for n in rank if n not in done), key=rank.get)
+            heapq.heappush(heap, (rank[node], node))
+        _, node = heapq.heappop(heap)
+        if node in done: continue
+        done.add(node); order.append(node)
+        for successor in successors[node]:
+            indegree[successor] -= 1
+            if indegree[successor] == 0: heapq.heappush(heap, (rank[successor], successor))
+    return order
+
+def route_stop_sets(gtfs_loader: dload.BaseDataLoader) -> dict[str, frozenset[str]]:
+    """
+    Every stop served by any trip of each route, from one pass over stop_times
+    """
+    trip_routes = {row['trip_id']: row['route_id'] for row in gtfs_loader.load(dload.LoadCSVFiles.TRIPS)}
+    stops = defaultdict(set)
+    for row in gtfs_loader.load(dload.LoadCSVFiles.STOP_TIMES):
+        if row['trip_id'] in trip_routes: stops[trip_routes[row['trip_id']]].add(row['stop_id'])
+    return {route_id: frozenset(s) for route_id, s in stops.items()}
+
+def minhash_signatures(stop_sets: dict[str, frozenset[str]], num_perm: int = 64, seed: int = 1) -> dict[str, tuple[int, ...]]:
+    """
+    MinHash signature of each stop set, num_perm universal hashes (a * x + b) mod 2^61 - 1 over crc32 of the stop_id
+    two signatures agree in a position with probability equal to the Jaccard similarity of the sets
+    """
+    rng = random.Random(seed)
+    perms = [(rng.randrange(1, _MERSENNE), rng.randrange(0, _MERSENNE)) for _ in range(num_perm)]
+    hashed = {stop_id: zlib.crc32(stop_id.encode('utf8')) for stop_id in set(chain.from_iterable(stop_sets.values()))}
+    return {route_id: tuple(min((a * hashed[s] + b) % _MERSENNE for s in stops) for a, b in perms)
+            for route_id, stops in stop_sets.items() if stops}
+
+def lsh_candidates(signatures: dict[str, tuple[int, ...]], bands: int = 16) -> set[tuple[str, str]]:
+    """
+    Route pairs sharing at least one band of their signatures, pairs with Jaccard similarity s are
+    candidates with probability 1 - (1 - s^r)^bands where r = num_perm / bands
+    """
+    rows = len(next(iter(signatures.values()))) // bands if signatures else 0
+    candidates = set()
+    for band in range(bands):
+        buckets = defaultdict(list)
+        for route_id, signature in signatures.items(): buckets[signature[band * rows:(band + 1) * rows]].append(route_id)
+        for members in buckets.values():
+            if len(members) > 1: candidates.update(combinations(sorted(members), 2))
+    return candidates
+
+@_context.timing('discover_corridors')
+def discover_corridors(gtfs_loader: dload.BaseDataLoader,
+                       threshold: float = 0.5,
+                       num_perm: int = 64,
+                       bands: int = 16,
+                       seed: int = 1
+                       ) -> dict[str, list[str]]:
+    """
+    Group routes into corridors by the similarity of the stops they serve
+
+    Candidate pairs come from MinHash LSH rather than comparing every pair of routes, each candidate is
+    checked on its exact Jaccard similarity and pairs at or above threshold are joined (union find).
+    The defaults (64 hashes in 16 bands of 4) put the LSH S-curve midpoint near 0.5, raise the rows per
+    band (fewer bands) together with the threshold.
+
+    Returns {corridor_id: [route_id, ...]} with corridors numbered from 1 by size, routes that join no
+    other route are corridors of their own
+    """
+    stop_sets = route_stop_sets(gtfs_loader)
+    signatures = minhash_signatures(stop_sets, num_perm, seed)
+    parent = {route_id: route_id for route_id in stop_sets}
+
+    def find(x: str) -> str:
+        while parent[x] != x: parent[x] = parent[parent[x]]; x = parent[x]
+        return x
+
+    candidates, joined = lsh_candidates(signatures, bands), 0
+    for a, b in candidates:
+        if len(stop_sets[a] & stop_sets[b]) / len(stop_sets[a] | stop_sets[b]) >= threshold:
+            parent[find(a)] = find(b); joined += 1
+    clusters = defaultdict(list)
+    for route_id in stop_sets: clusters[find(route_id)].append(route_id)
+    print(f'LOG: {len(stop_sets)} ROUTES {len(candidates)} CANDIDATE PAIRS {joined} JOINED {len(clusters)} CORRIDORS')
+    ordered = sorted(clusters.values(), key=lambda routes: (-len(routes), min(routes)))
+    return {str(i): sorted(routes) for i, routes in enumerate(ordered, 1)}
+
+def to_routes_corridors_csv(corridors: dict[str, list[str]], file_path: str) -> None:
+    """
+    routes_corridors.csv layout (route_id, corridor_id) read by NTATimeTable and timetable_from_csv._get_corridors
+    """
+    with open(file_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['route_id', 'corridor_id'])
+        for corridor_id, route_ids in corridors.items():
+            for route_id in route_ids: writer.writerow([route_id, corridor_id])
+
+if __name__ == "__main__":
+    loader = dload.GTFSLoadCSV('./data/agency.csv', './data/calendar.csv', './data/calendar_dates.csv', './data/routes.csv', './data/stop_times.csv', './data/stops.csv', './data/trips.csv')
+    to_routes_corridors_csv(discover_corridors(loader), './data/routes_corridors_discovered.csv')
\ No newline at end of file
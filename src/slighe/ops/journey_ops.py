@@ -0,0 +1,275 @@
+from slighe import dtypes
+from slighe import dload
+from slighe import transforms
+from slighe import _context
+
+from dataclasses import dataclass, field
+from typing import Optional, Union
+from collections import defaultdict
+from datetime import date, datetime
+from array import array
+import bisect
+import math
+
+INF = 2 ** 31 - 1
+
+@dataclass(frozen=True)
+class Leg:
+    kind: str # 'trip' or 'walk'
+    from_stop: str
+    to_stop: str
+    departure_time: int
+    arrival_time: int
+    trip_id: Optional[str] = None
+    route_id: Optional[str] = None
+
+    def __str__(self) -> str:
+        via = f'{self.route_id} {self.trip_id}' if self.kind == 'trip' else 'WALK'
+        return f'{transforms.TimeTransforms.ts_from_seconds(self.departure_time)} {self.from_stop} -> {transforms.TimeTransforms.ts_from_seconds(self.arrival_time)} {self.to_stop} ({via})'
+
+@dataclass(frozen=True)
+class Journey:
+    origin: str
+    destination: str
+    departure_time: int
+    arrival_time: int
+    legs: list[Leg]
+
+    @property
+    def transfers(self) -> int: return max(0, len([leg for leg in self.legs if leg.kind == 'trip']) - 1)
+
+    def __str__(self) -> str: return '\n'.join(str(leg) for leg in self.legs)
+
+def active_service_ids(gtfs_loader: dload.BaseDataLoader, service_date: date) -> set[str]:
+    """
+    service_ids running on service_date from calendar, with calendar_dates additions (1) and removals (2) applied
+    """
+    day, ymd = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday'][service_date.weekday()], service_date.strftime('%Y%m%d')
+    active = {row['service_id'] for row in gtfs_loader.load(dload.LoadCSVFiles.CALENDAR)
+              if row.get(day) == '1' and row.get('start_date', '') <= ymd <= (row.get('end_date') or '99999999')}
+    for row in gtfs_loader.load(dload.LoadCSVFiles.CALENDAR_DATES):
+        if row.get('date') != ymd: continue
+        if row.get('exception_type') == '1': active.add(row['service_id'])
+        elif row.get('exception_type') == '2': active.discard(row['service_id'])
+    return active
+
+@dataclass(repr=False)
+class RaptorPlanner:
+    """
+    Round based (RAPTOR) earliest arrival planner over one service day of a loaded feed
+
+    Trips are grouped into patterns (route, direction and stop sequence) and split further so trips in a
+    pattern never overtake. Per pattern the stops are an int array and the times are column major int
+    arrays, one per stop position, sorted so the earliest trip departing after a time is a bisect.
+    Round k scans only the patterns serving stops improved in round k-1, then relaxes walking transfers.
+
+    Build with RaptorPlanner.from_loader, times are seconds past midnight of the service day
+    """
+    stop_ids: list[str]
+    stop_index: dict[str, int]
+    pattern_stops: list[array]
+    pattern_arrivals: list[list[array]]
+    pattern_departures: list[list[array]]
+    pattern_trips: list[list[str]]
+    pattern_routes: list[str]
+    stop_patterns: list[list[tuple[int, int]]]
+    transfers: list[list[tuple[int, int]]]
+    settlements: dict[str, list[int]] = field(default_factory=dict)
+
+    @classmethod
+    @_context.timing('RaptorPlanner.from_loader')
+    def from_loader(cls,
+                    gtfs_loader: dload.BaseDataLoader,
+                    service_date: date = None,
+                    service_types: list[dtypes.ServiceTypes] = None,
+                    max_walk: float = 400.0,
+                    walk_speed: float = 1.33
+                    ) -> 'RaptorPlanner':
+        """
+        service_date: date = None
+            only trips whose service runs on this date (calendar and calendar_dates)
+        service_types: list[dtypes.ServiceTypes] = None
+            only trips whose service_id is one of these service types, the NTA feed convention
+        max_walk: float = 400.0
+            longest walking transfer between stops in meters, straight line from the stop coordinates
+        walk_speed: float = 1.33
+            meters per second
+        """
+        services = active_service_ids(gtfs_loader, service_date) if service_date is not None else None
+        if service_types is not None:
+            by_type = {str(st.value) for st in service_types}
+            services = by_type if services is None else services & by_type
+        trip_routes = {row['trip_id']: (row['route_id'], row.get('direction_id', '')) for row in gtfs_loader.load(dload.LoadCSVFiles.TRIPS)
+                       if services is None or row['service_id'] in services}
+
+        stop_rows = gtfs_loader.load(dload.LoadCSVFiles.STOPS)
+        stop_ids = [row['stop_id'] for row in stop_rows]
+        stop_index = {stop_id: i for i, stop_id in enumerate(stop_ids)}
+        settlements = defaultdict(list)
+        for i, row in enumerate(stop_rows):
+            if row.get('settlement'): settlements[row['settlement']].append(i)
+
+        trips = defaultdict(list)
+        for row in gtfs_loader.load(dload.LoadCSVFiles.STOP_TIMES):
+            if row['trip_id'] in trip_routes and row['stop_id'] in stop_index:
+                trips[row['trip_id']].append((int(row['stop_sequence']), stop_index[row['stop_id']], row['arrival_time'], row['departure_time']))
+
+        patterns = defaultdict(list)
+        for trip_id, stop_times in trips.items():
+            stop_times.sort()
+            try: seconds = cls._fill_times([(transforms.TimeTransforms.ts_to_seconds(arrival.strip() or None), transforms.TimeTransforms.ts_to_seconds(departure.strip() or None))
+                                            for _, _, arrival, departure in stop_times])
+            except ValueError as e: print(f'WARNING: skipping trip {trip_id} -> {e}'); continue
+            if seconds is None or len(seconds) < 2: continue
+            patterns[(trip_routes[trip_id], tuple(s for _, s, _, _ in stop_times))].append((seconds, trip_id))
+
+        planner = cls(stop_ids, stop_index, [], [], [], [], [], [[] for _ in stop_ids], [[] for _ in stop_ids], dict(settlements))
+        for ((route_id, _), stops), pattern_trips in patterns.items():
+            pattern_trips.sort()
+            for group in cls._split_overtaking(pattern_trips): planner._add_pattern(route_id, stops, group)
+        planner._add_transfers(stop_rows, max_walk, walk_speed)
+        print(f'LOG: RAPTOR {len(planner.pattern_stops)} PATTERNS {sum(len(t) for t in planner.pattern_trips)} TRIPS {len(stop_ids)} STOPS')
+        return planner
+
+    @staticmethod
+    def _fill_times(times: list[tuple[Optional[int], Optional[int]]]) -> Optional[list[tuple[int, int]]]:
+        """
+        Fill blank (non-timepoint) times linearly by stop position between the timepoints either side
+        None when the first or last stop has no time
+        """
+        times = [(a if a is not None else d, d if d is not None else a) for a, d in times]
+        known = [i for i, (a, _) in enumerate(times) if a is not None]
+        if not known or known[0] != 0 or known[-1] != len(times) - 1: return None
+        for lo, hi in zip(known, known[1:]):
+            for i in range(lo + 1, hi):
+                t = times[lo][1] + (times[hi][0] - times[lo][1]) * (i - lo) // (hi - lo)
+                times[i] = (t, t)
+        return times
+
+    @staticmethod
+    def _split_overtaking(pattern_trips: list[tuple[list, str]]) -> list[list[tuple[list, str]]]:
+        groups = []
+        for times, trip_id in pattern_trips:
+            for group in groups:
+                if all(a >= pa and d >= pd for (a, d), (pa, pd) in zip(times, group[-1][0])):
+                    group.append((times, trip_id)); break
+            else: groups.append([(times, trip_id)])
+        return groups
+
+    def _add_pattern(self, route_id: str, stops: tuple[int], trips: list[tuple[list, str]]) -> None:
+        p = len(self.pattern_stops)
+        self.pattern_stops.append(array('i', stops))
+        self.pattern_arrivals.append([array('i', [times[i][0] for times, _ in trips]) for i in range(len(stops))])
+        self.pattern_departures.append([array('i', [times[i][1] for times, _ in trips]) for i in range(len(stops))])
+        self.pattern_trips.append([trip_id for _, trip_id in trips])
+        self.pattern_routes.append(route_id)
+        for pos, stop in enumerate(stops): self.stop_patterns[stop].append((p, pos))
+
+    def _add_transfers(self, stop_rows: list[dict], max_walk: float, walk_speed: float) -> None:
+        if max_walk <= 0: return
+        cell, grid, coords = max_walk / 111320.0, defaultdict(list), {}
+        for i, row in enumerate(stop_rows):
+            try: lat, lon = float(row['stop_lat']), float(row['stop_lon'])
+            except (KeyError, ValueError, TypeError): continue
+            coords[i] = (lat, lon)
+            grid[(int(lat // cell), int(lon * math.cos(math.radians(lat)) // cell))].append(i)
+        for (gy, gx), members in grid.items():
+            neighbours = [j for dy in (-1, 0, 1) for dx in (-1, 0, 1) for j in grid.get((gy + dy, gx + dx), ())]
+            for i in members:
+                for j in neighbours:
+                    if i == j: continue
+                    d = transforms.GeoTransforms.distance(*coords[i], *coords[j])
+                    if d <= max_walk: self.transfers[i].append((j, int(math.ceil(d / walk_speed))))
+
+    def _earliest_trip(self, p: int, pos: int, t: int) -> Optional[int]:
+        departures = self.pattern_departures[p][pos]
+        trip = bisect.bisect_left(departures, t)
+        return trip if trip < len(departures) else None
+
+    def run(self, sources: dict[int, int], max_rounds: int = 6, target: int = None, best: list[int] = None) -> tuple[list[int], list[dict]]:
+        """
+        Earliest arrival at every stop from the source stop indexes and their departure times
+
+        best: list[int] = None
+            upper bounds to start from, e.g. the result of a later departure in a profile search, stops
+            that are not improved on keep these values and are not rescanned
+        returns the best arrival per stop and the per round labels {stop: (arrival, parent)}
+        """
+        best = list(best) if best is not None else [INF] * len(self.stop_ids)
+        labels, marked = [{}], set()
+        for s, t in sources.items():
+            if t < best[s]: best[s], labels[0][s] = t, (t, ('origin',)); marked.add(s)
+        self._relax_transfers(best, labels[0], marked, target)
+        for k in range(1, max_rounds + 1):
+            if not marked: break
+            previous, round_labels, improved = best[:], {}, set()
+            queue = {}
+            for s in marked:
+                for p, pos in self.stop_patterns[s]:
+                    if pos < queue.get(p, INF): queue[p] = pos
+            for p, start in queue.items():
+                stops, arrivals, departures = self.pattern_stops[p], self.pattern_arrivals[p], self.pattern_departures[p]
+                trip, board = None, None
+                for pos in range(start, len(stops)):
+                    s = stops[pos]
+                    if trip is not None:
+                        a = arrivals[pos][trip]
+                        if a < best[s] and (target is None or a < best[target]):
+                            best[s], round_labels[s] = a, (a, ('trip', p, trip, board, pos))
+                            improved.add(s)
+                    if previous[s] < INF and (trip is None or previous[s] <= departures[pos][trip]):
+                        earlier = self._earliest_trip(p, pos, previous[s])
+                        if earlier is not None and (trip is None or earlier < trip): trip, board = earlier, pos
+            self._relax_transfers(best, round_labels, improved, target)
+            labels.append(round_labels)
+            marked = improved
+        return best, labels
+
+    def _relax_transfers(self, best: list[int], round_labels: dict, marked: set, target: Optional[int]) -> None:
+        for s in list(marked):
+            t = round_labels[s][0]
+            for s2, walk in self.transfers[s]:
+                a = t + walk
+                if a < best[s2] and (target is None or a < best[target]):
+                    best[s2], round_labels[s2] = a, (a, ('walk', s))
+                    marked.add(s2)
+
+    def _journey(self, labels: list[dict], origin: str, destination: str, departure_time: int, target: int) -> Optional[Journey]:
+        rounds = [k for k in range(len(labels)) if target in labels[k]]
+        if not rounds: return None
+        k, s, legs = rounds[-1], target, []
+        while True:
+            arrival, parent = labels[k][s]
+            if parent[0] == 'origin': break
+            if parent[0] == 'walk':
+                legs.append(Leg('walk', self.stop_ids[parent[1]], self.stop_ids[s], labels[k][parent[1]][0], arrival))
+                s = parent[1]
+                continue
+            _, p, trip, board, alight = parent
+            s = self.pattern_stops[p][board]
+            legs.append(Leg('trip', self.stop_ids[s], self.stop_ids[self.pattern_stops[p][alight]], self.pattern_departures[p][board][trip], arrival,
+                            self.pattern_trips[p][trip], self.pattern_routes[p]))
+            k = max(j for j in range(k) if s in labels[j])
+        return Journey(origin, destination, departure_time, labels[rounds[-1]][target][0], legs[::-1])
+
+    @_context.timing('RaptorPlanner.earliest_arrival')
+    def earliest_arrival(self,
+                         origin: str,
+                         destination: str,
+                         departure_time: Union[str, int],
+                         max_rounds: int = 6
+                         ) -> Optional[Journey]:
+        """
+        Earliest arrival journey from origin stop_id to destination stop_id leaving at or after departure_time
+        None when the destination cannot be reached within max_rounds trips
+        """
+        if isinstance(departure_time, str): departure_time = transforms.TimeTransforms.ts_to_seconds(departure_time)
+        if origin not in self.stop_index or destination not in self.stop_index: raise KeyError(f'unknown stop {origin if origin not in self.stop_index else destination}')
+        target = self.stop_index[destination]
+        _, labels = self.run({self.stop_index[origin]: departure_time}, max_rounds, target)
+        return self._journey(labels, origin, destination, departure_time, target)
+
+if __name__ == "__main__":
+    loader = dload.GTFSLoadCSV('./data/agency.csv', './data/calendar.csv', './data/calendar_dates.csv', './data/routes.csv', './data/stop_times.csv', './data/stops.csv', './data/trips.csv')
+    planner = RaptorPlanner.from_loader(loader, service_date=datetime.today().date())
+    print(planner.earliest_arrival('852000011', '8220DB000002', '08:00:00'))
\ No newline at end of file
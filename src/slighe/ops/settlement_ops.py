@@ -0,0 +1,132 @@
+from slighe import dtypes
+from slighe import dload
+from slighe import transforms
+from slighe import _context
+from slighe.ops.journey_ops import RaptorPlanner, INF
+
+from typing import Optional, Union
+from datetime import date
+from array import array
+import multiprocessing as mp
+import json
+import math
+import os
+
+_PLANNER: Optional[RaptorPlanner] = None
+
+def _init_worker(planner: RaptorPlanner) -> None:
+    global _PLANNER
+    _PLANNER = planner
+
+def settlement_departures(planner: RaptorPlanner, stops: list[int], start: int, end: int) -> list[int]:
+    """
+    Distinct departure times of every trip leaving one of the stops inside [start, end], latest first
+    """
+    times = set()
+    for s in stops:
+        for p, pos in planner.stop_patterns[s]:
+            if pos == len(planner.pattern_stops[p]) - 1: continue
+            times.update(t for t in planner.pattern_departures[p][pos] if start <= t <= end)
+    return sorted(times, reverse=True)
+
+def profile_travel_times(planner: RaptorPlanner, stops: list[int], start: int, end: int, max_rounds: int = 6) -> dict[int, int]:
+    """
+    Minimum scheduled travel time in seconds from any of the stops to every reachable stop, departing in [start, end]
+
+    Range (rRAPTOR) profile: departures are run latest first and each run starts from the arrivals of the
+    one before, an earlier departure can always wait for the later journey so those stay valid bounds and
+    only the stops it arrives at strictly earlier are rescanned and can lower the travel time
+    """
+    best, travel = None, {s: 0 for s in stops}
+    for departure in settlement_departures(planner, stops, start, end):
+        best, labels = planner.run({s: departure for s in stops}, max_rounds, best=best)
+        for round_labels in labels:
+            for s in round_labels:
+                if best[s] - departure < travel.get(s, INF): travel[s] = best[s] - departure
+    return travel
+
+def _origin_row(args: tuple) -> tuple[int, bytes]:
+    row, origin, settlements, start, end, max_rounds = args
+    travel = profile_travel_times(_PLANNER, _PLANNER.settlements[origin], start, end, max_rounds)
+    values = array('f', [min((travel.get(s, INF) for s in _PLANNER.settlements[name]), default=INF) for name in settlements])
+    for i, v in enumerate(values):
+        if v >= INF: values[i] = math.inf
+    values[row] = 0.0
+    return row, values.tobytes()
+
+def _done_rows(output_path: str, n: int) -> set[int]:
+    done, item = set(), array('f').itemsize
+    with open(output_path, 'rb') as f:
+        for row in range(n):
+            f.seek((row * n + row) * item)
+            value = array('f'); value.frombytes(f.read(item))
+            if not math.isnan(value[0]): done.add(row)
+    return done
+
+@_context.timing('settlement_matrix')
+def settlement_matrix(gtfs_loader: dload.BaseDataLoader,
+                      output_path: str,
+                      start: Union[str, int],
+                      end: Union[str, int],
+                      service_date: date = None,
+                      service_types: list[dtypes.ServiceTypes] = None,
+                      settlements: list[str] = None,
+                      processes: int = None,
+                      max_rounds: int = 6,
+                      max_walk: float = 400.0,
+                      resume: bool = True,
+                      planner: RaptorPlanner = None
+                      ) -> list[str]:
+    """
+    Settlement to settlement matrix of minimum scheduled travel time (seconds) for departures in [start, end]
+
+    Every settlement is mapped to the stops carrying it in stops.csv. One profile search per origin runs on
+    a process pool, the planner is sent to each worker once, and each finished row is written straight into
+    output_path, a row major float32 file (inf where unreachable). output_path.json lists the settlement
+    order and the query. With resume a rerun only computes rows whose diagonal has not been written yet, so
+    an interrupted overnight run picks up where it stopped. Use one output per service day or service type.
+
+    Returns the settlement order of the rows and columns
+    """
+    if isinstance(start, str): start = transforms.TimeTransforms.ts_to_seconds(start)
+    if isinstance(end, str): end = transforms.TimeTransforms.ts_to_seconds(end)
+    planner = planner or RaptorPlanner.from_loader(gtfs_loader, service_date, service_types, max_walk)
+    names = sorted(planner.settlements) if settlements is None else [s for s in settlements if s in planner.settlements]
+    n, item = len(names), array('f').itemsize
+    meta = {'settlements': names, 'start': start, 'end': end, 'service_date': str(service_date) if service_date else None,
+            'service_types': [st.name for st in service_types] if service_types else None, 'max_rounds': max_rounds, 'max_walk': max_walk,
+            'feed': gtfs_loader.fingerprint() if gtfs_loader is not None else None, 'dtype': 'float32', 'shape': [n, n]}
+
+    done = set()
+    if resume and os.path.exists(output_path) and os.path.exists(output_path + '.json') and os.path.getsize(output_path) == n * n * item:
+        with open(output_path + '.json') as f:
+            if json.load(f) == meta: done = _done_rows(output_path, n)
+    if not done:
+        with open(output_path, 'wb') as f:
+            nan_row = array('f', [math.nan] * n).tobytes()
+            for _ in range(n): f.write(nan_row)
+        with open(output_path + '.json', 'w') as f: json.dump(meta, f, indent=1)
+    print(f'LOG: {n} SETTLEMENTS, {len(done)} ROWS ALREADY DONE')
+
+    todo = [(row, name, names, start, end, max_rounds) for row, name in enumerate(names) if row not in done]
+    with open(output_path, 'r+b') as f, mp.Pool(processes or mp.cpu_count(), initializer=_init_worker, initargs=(planner,)) as p:
+        for written, (row, values) in enumerate(p.imap_unordered(_origin_row, todo), 1):
+            f.seek(row * n * item)
+            f.write(values)
+            if written % 100 == 0: f.flush(); print(f'LOG: {written}/{len(todo)} ORIGINS')
+    return names
+
+def read_matrix(output_path: str) -> tuple[list[str], list[array]]:
+    """
+    Settlement names and matrix rows written by settlement_matrix, numpy.fromfile(output_path, 'float32') reads it too
+    """
+    with open(output_path + '.json') as f: names = json.load(f)['settlements']
+    rows = []
+    with open(output_path, 'rb') as f:
+        for _ in names:
+            row = array('f'); row.frombytes(f.read(len(names) * row.itemsize)); rows.append(row)
+    return names, rows
+
+if __name__ == "__main__":
+    loader = dload.GTFSLoadCSV('./data/agency.csv', './data/calendar.csv', './data/calendar_dates.csv', './data/routes.csv', './data/stop_times.csv', './data/stops.csv', './data/trips.csv')
+    settlement_matrix(loader, './tests/settlement_matrix_mon_fri.f32', '07:00:00', '09:00:00', service_types=[dtypes.ServiceTypes.MON_FRI])
\ No newline at end of file
@@ -1,5 +1,5 @@
-import dtypes
-import transforms
+from slighe import dtypes
+from slighe import transforms
 
 from typing import Optional, Union
 from itertools import chain
@@ -16,10 +16,10 @@ def _frequency(stop_times: list[dtypes.StopTime],
                start: Optional[Union[str, float]],
                end: Optional[Union[str, float]]
                ) -> int:
-    if isinstance(start, str): start = transforms.ts_to_float(start, "%H:%M:%S")
-    if isinstance(end, str): end = transforms.ts_to_float(end, "%H:%M:%S")
-    [stop_time.timestring_to_float() for stop_time in stop_times if isinstance(stop_time.arrival_time, str) or isinstance(stop_time.departure_time, str)]
-    return len([stop_time for stop_time in stop_times if stop_time.arrival_time > start and stop_time.arrival_time < end])
+    if isinstance(start, str): start = transforms.TimeTransforms.ts_to_seconds(start)
+    if isinstance(end, str): end = transforms.TimeTransforms.ts_to_seconds(end)
+    arrivals = [transforms.TimeTransforms.ts_to_seconds(stop_time.arrival_time) for stop_time in stop_times]
+    return len([t for t in arrivals if t is not None and t > start and t < end])
 
 def frequency(stop: dtypes.Stop,
               service_type: list[dtypes.ServiceTypes],
@@ -32,7 +32,7 @@ def frequency(stop: dtypes.Stop,
     return _frequency(_get_stop_times(stop, service_type, routes), start, end)
 
 if __name__ == "__main__":
-    import constructors, dload
+    from slighe import constructors, dload
     loader = dload.GTFSLoadCSV('./data/agency.csv', './data/calendar.csv', './data/calendar_dates.csv', './data/routes.csv', './data/stop_times.csv', './data/stops.csv', './data/trips.csv')
     corridor = constructors.RouteConstructor(['2991_37732', '2990_40267', '3038_40330'], loader).build()
     stop = dtypes.Stop(stop_id='852000011', stop_name='Post Office', stop_latitude='54.19213076', stop_longitude='-7.704834099', settlement='Swanlinbar', county='County_Cavan')
@@ -0,0 +1,199 @@
+from slighe.dload import LoadCSVFiles
+from slighe.transforms import TimeTransforms
+from slighe import dload
+from slighe import _context
+
+from dataclasses import dataclass, field
+from typing import Optional, Union
+import numpy as np
+import pandas as pd
+import json
+import os
+
+ERROR, WARNING = 'ERROR', 'WARNING'
+
+COLUMNS = {LoadCSVFiles.ROUTES: ['route_id'],
+           LoadCSVFiles.TRIPS: ['route_id', 'service_id', 'trip_id'],
+           LoadCSVFiles.STOPS: ['stop_id'],
+           LoadCSVFiles.STOP_TIMES: ['trip_id', 'arrival_time', 'departure_time', 'stop_id', 'stop_sequence'],
+           LoadCSVFiles.CALENDAR: ['service_id'],
+           LoadCSVFiles.CALENDAR_DATES: ['service_id', 'date']}
+
+KEYS = {LoadCSVFiles.ROUTES: ['route_id'],
+        LoadCSVFiles.TRIPS: ['trip_id'],
+        LoadCSVFiles.STOPS: ['stop_id'],
+        LoadCSVFiles.STOP_TIMES: ['trip_id', 'stop_sequence'],
+        LoadCSVFiles.CALENDAR: ['service_id'],
+        LoadCSVFiles.CALENDAR_DATES: ['service_id', 'date']}
+
+@dataclass
+class RuleResult:
+    rule: str
+    table: str
+    severity: str
+    count: int
+    sample: list[dict] = field(default_factory=list)
+
+    def __str__(self) -> str:
+        rows = '\n'.join(f'        {row}' for row in self.sample)
+        return f'{self.severity}: {self.rule} ({self.table}) {self.count} ROWS' + (f'\n{rows}' if rows else '')
+
+@dataclass
+class ValidationReport:
+    """
+    Results of validate_tables, one RuleResult per rule that found offending rows
+
+    Sample rows carry a row field, the line of the row in its csv file when the tables were read with
+    read_tables (header on line 1), otherwise its position in the loaded table
+    """
+    results: list[RuleResult] = field(default_factory=list)
+    rows: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def errors(self) -> list[RuleResult]: return [r for r in self.results if r.severity == ERROR]
+
+    @property
+    def ok(self) -> bool: return not self.errors
+
+    def __str__(self) -> str:
+        scanned = ', '.join(f'{table}: {n}' for table, n in self.rows.items())
+        return '\n'.join([f'{"PASSED" if self.ok else "FAILED"} {len(self.errors)} ERRORS, {len(self.results) - len(self.errors)} WARNINGS ({scanned})']
+                         + [str(r) for r in self.results])
+
+    def to_json(self, file_path: str) -> None:
+        with open(file_path, 'w') as f:
+            json.dump({'ok': self.ok, 'rows': self.rows, 'results': [vars(r) for r in self.results]}, f, indent=1, default=str)
+
+def read_tables(feed_directory: str) -> dict[LoadCSVFiles, pd.DataFrame]:
+    """
+    Reads the columns the rules need from the GTFS csv files of feed_directory, ids as categoricals and every
+    value as text so nothing is coerced before it is checked. Missing files read as empty tables.
+    """
+    tables = {}
+    for file, columns in COLUMNS.items():
+        path = os.path.join(feed_directory, f'{file.name.lower()}.csv')
+        if not os.path.exists(path): tables[file] = pd.DataFrame(columns=columns); continue
+        with _context.span('validate.read', file=file.name):
+            df = pd.read_csv(path, usecols=lambda c: c in columns, dtype=str, keep_default_na=False, encoding='latin_1', encoding_errors='replace')
+        df = df.astype({c: 'category' for c in df.columns if c.endswith('_id')})
+        df.index = df.index + 2
+        tables[file] = df
+    return tables
+
+def tables_from_loader(gtfs_loader: dload.BaseDataLoader) -> dict[LoadCSVFiles, pd.DataFrame]:
+    """
+    The tables of a loaded feed (GTFSLoadCSV, GTFSLoadTXC, ...) in the layout read_tables returns
+    """
+    tables = {}
+    for file, columns in COLUMNS.items():
+        df = pd.DataFrame(gtfs_loader.load(file))
+        df = df[[c for c in columns if c in df.columns]].astype(str) if not df.empty else pd.DataFrame(columns=columns)
+        tables[file] = df.astype({c: 'category' for c in df.columns if c.endswith('_id')})
+    return tables
+
+def _sample(df: pd.DataFrame, mask: Union[np.ndarray, pd.Series], n: int) -> list[dict]:
+    rows = df[np.asarray(mask)].head(n)
+    return [{'row': i, **{k: v for k, v in row.items()}} for i, row in zip(rows.index, rows.to_dict('records'))]
+
+def _result(results: list[RuleResult], rule: str, file: LoadCSVFiles, severity: str, df: pd.DataFrame, mask: Union[np.ndarray, pd.Series], n: int) -> None:
+    count = int(np.count_nonzero(np.asarray(mask)))
+    if count: results.append(RuleResult(rule, file.name.lower(), severity, count, _sample(df, mask, n)))
+
+def _missing_columns(tables: dict[LoadCSVFiles, pd.DataFrame], results: list[RuleResult]) -> set[LoadCSVFiles]:
+    missing = set()
+    for file, columns in COLUMNS.items():
+        absent = [c for c in columns if c not in tables[file].columns]
+        if absent and not (file == LoadCSVFiles.CALENDAR_DATES and tables[file].empty):
+            results.append(RuleResult('missing_column', file.name.lower(), ERROR, len(absent), [{'column': c} for c in absent]))
+            missing.add(file)
+    return missing
+
+def _references(tables: dict[LoadCSVFiles, pd.DataFrame], results: list[RuleResult], n: int) -> None:
+    trips, stop_times, calendar, calendar_dates = tables[LoadCSVFiles.TRIPS], tables[LoadCSVFiles.STOP_TIMES], tables[LoadCSVFiles.CALENDAR], tables[LoadCSVFiles.CALENDAR_DATES]
+    service_ids = pd.concat([calendar['service_id'].astype(str), calendar_dates['service_id'].astype(str) if 'service_id' in calendar_dates else pd.Series(dtype=str)])
+    _result(results, 'trip_route', LoadCSVFiles.TRIPS, ERROR, trips, ~trips['route_id'].isin(tables[LoadCSVFiles.ROUTES]['route_id']), n)
+    _result(results, 'trip_service', LoadCSVFiles.TRIPS, ERROR, trips, ~trips['service_id'].astype(str).isin(service_ids), n)
+    _result(results, 'stop_time_trip', LoadCSVFiles.STOP_TIMES, ERROR, stop_times, ~stop_times['trip_id'].isin(trips['trip_id']), n)
+    _result(results, 'stop_time_stop', LoadCSVFiles.STOP_TIMES, ERROR, stop_times, ~stop_times['stop_id'].isin(tables[LoadCSVFiles.STOPS]['stop_id']), n)
+    _result(results, 'trip_without_stop_times', LoadCSVFiles.TRIPS, WARNING, trips, ~trips['trip_id'].isin(stop_times['trip_id']), n)
+
+def _duplicates(tables: dict[LoadCSVFiles, pd.DataFrame], results: list[RuleResult], n: int) -> None:
+    for file, keys in KEYS.items():
+        if all(k in tables[file].columns for k in keys):
+            _result(results, 'duplicate_key', file, ERROR, tables[file], tables[file].duplicated(subset=keys, keep='first'), n)
+
+def _stop_times(stop_times: pd.DataFrame, results: list[RuleResult], n: int) -> None:
+    """
+    Time and order rules over stop_times in one sort: rows are ordered by (trip_id, stop_sequence) with
+    np.lexsort, blank times are carried forward inside each trip and every row is compared with the
+    previous row of its trip
+    """
+    table = LoadCSVFiles.STOP_TIMES
+    arrival_text, departure_text = stop_times['arrival_time'].astype(str), stop_times['departure_time'].astype(str)
+    arrival, departure = TimeTransforms.series_to_seconds(arrival_text), TimeTransforms.series_to_seconds(departure_text)
+    _result(results, 'unparseable_time', table, ERROR, stop_times, ((arrival_text != '') & arrival.isna()) | ((departure_text != '') & departure.isna()), n)
+
+    try: sequence = stop_times['stop_sequence'].astype('int64')
+    except (TypeError, ValueError): sequence = pd.to_numeric(stop_times['stop_sequence'], errors='coerce')
+    bad_sequence = sequence.isna() | (sequence < 0) | (sequence % 1 != 0)
+    _result(results, 'unparseable_stop_sequence', table, ERROR, stop_times, bad_sequence, n)
+
+    trips = stop_times['trip_id'].cat.codes.to_numpy() if isinstance(stop_times['trip_id'].dtype, pd.CategoricalDtype) else pd.factorize(stop_times['trip_id'])[0]
+    order = np.lexsort((sequence.to_numpy(dtype='float64', na_value=np.inf), trips))
+    trips = trips[order]
+    arrival = arrival.to_numpy(dtype='float64', na_value=np.nan)[order]
+    departure = departure.to_numpy(dtype='float64', na_value=np.nan)[order]
+    arrival, departure = np.where(np.isnan(arrival), departure, arrival), np.where(np.isnan(departure), arrival, departure)
+
+    first = np.ones(len(trips), dtype=bool)
+    first[1:] = trips[1:] != trips[:-1]
+    last = np.ones(len(trips), dtype=bool)
+    last[:-1] = first[1:]
+    known = pd.Series(departure).groupby(trips).ffill().to_numpy()
+    previous = np.full(len(trips), np.nan)
+    previous[1:] = known[:-1]
+    previous[first] = np.nan
+
+    def at(mask: np.ndarray) -> np.ndarray:
+        rows = np.zeros(len(stop_times), dtype=bool)
+        rows[order[mask]] = True
+        return rows
+    _result(results, 'time_travel', table, ERROR, stop_times, at(arrival < previous), n)
+    _result(results, 'departure_before_arrival', table, ERROR, stop_times, at(departure < arrival), n)
+    _result(results, 'missing_endpoint_time', table, ERROR, stop_times, at((first | last) & np.isnan(arrival)), n)
+
+@_context.timing('validate_tables')
+def validate_tables(tables: dict[LoadCSVFiles, pd.DataFrame], sample: int = 5) -> ValidationReport:
+    """
+    Runs every rule over the feed tables (read_tables or tables_from_loader), each as whole column operations
+
+    references         trip_route, trip_service, stop_time_trip, stop_time_stop, trip_without_stop_times (warning)
+    duplicate_key      routes.route_id, trips.trip_id, stops.stop_id, calendar.service_id,
+                       stop_times (trip_id, stop_sequence), calendar_dates (service_id, date)
+    stop_times         unparseable_time, unparseable_stop_sequence, time_travel (a time earlier than the
+                       previous stop of the trip in stop_sequence order), departure_before_arrival,
+                       missing_endpoint_time (first or last stop of a trip without a time)
+
+    Times past 24:00:00 are valid. Rules over a table missing one of its columns are skipped and
+    reported as missing_column.
+    """
+    results, report = [], ValidationReport()
+    missing = _missing_columns(tables, results)
+    report.rows = {file.name.lower(): len(tables[file]) for file in COLUMNS}
+    with _context.span('validate.references'):
+        if not missing & {LoadCSVFiles.ROUTES, LoadCSVFiles.TRIPS, LoadCSVFiles.STOPS, LoadCSVFiles.STOP_TIMES, LoadCSVFiles.CALENDAR}: _references(tables, results, sample)
+    with _context.span('validate.duplicates'): _duplicates(tables, results, sample)
+    with _context.span('validate.stop_times'):
+        if LoadCSVFiles.STOP_TIMES not in missing: _stop_times(tables[LoadCSVFiles.STOP_TIMES], results, sample)
+    report.results = results
+    return report
+
+def validate_feed(feed: Union[str, dload.BaseDataLoader], sample: int = 5) -> ValidationReport:
+    """
+    validate_tables over a GTFS csv directory or a loaded feed
+    """
+    return validate_tables(read_tables(feed) if isinstance(feed, str) else tables_from_loader(feed), sample)
+
+if __name__ == "__main__":
+    report = validate_feed('./data')
+    print(report)
@@ -0,0 +1,234 @@
+from slighe.dtypes import ServiceTypes, CorridorTimetable, TimetableView, TimetableIndex
+from slighe.constructors import StopBaseConstructor, TripTimetableConstructor
+from slighe.cache import CorridorCache
+from slighe.ops import stop_ops
+from slighe import dload
+from slighe import _context
+
+from dataclasses import dataclass, field
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Optional, Callable, Any
+from urllib.parse import urlsplit, parse_qs
+import asyncio
+import json
+import csv
+import io
+
+class RequestError(Exception):
+    def __init__(self, status: int, message: str) -> None: super().__init__(message); self.status = status
+    def __reduce__(self) -> tuple: return RequestError, (self.status, str(self))
+
+@dataclass
+class FeedState:
+    """
+    A loaded feed and the lookups built over it, replaced as a whole on a hot swap
+    """
+    gtfs_loader: dload.BaseDataLoader
+    trip_routes: dict[str, str] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        self.trip_routes = {row['trip_id']: row['route_id'] for row in self.gtfs_loader.load(dload.LoadCSVFiles.TRIPS)}
+
+    @property
+    def version(self) -> str: return self.gtfs_loader.fingerprint()
+
+_LOADER_FACTORY: Optional[Callable[[], dload.BaseDataLoader]] = None
+_STATE: Optional[FeedState] = None
+_CACHE: Optional[CorridorCache] = None
+
+def _init_worker(loader_factory: Callable[[], dload.BaseDataLoader], maxsize: int, directory: Optional[str]) -> None:
+    global _LOADER_FACTORY, _CACHE
+    _LOADER_FACTORY, _CACHE = loader_factory, CorridorCache(maxsize, directory)
+
+def _worker_answer(version: str, path: str, query: dict) -> tuple[str, bytes]:
+    """
+    Answers a request in a process pool worker, loading the feed on first use and again once the service reloaded
+    """
+    global _STATE
+    if _STATE is None or _STATE.version != version: _STATE = FeedState(_LOADER_FACTORY())
+    return FeedService.answer(_CACHE, _STATE, path, query)
+
+class FeedService:
+    """
+    Local HTTP service answering timetable and frequency queries from a feed loaded once
+
+    GET /corridor?corridor_id=&routes=a,b[&layout=1&sort=1&disolve=1&interpolate=1&start=&end=&service_type=MON,SAT&settlement=&county=&format=csv]
+    GET /frequency?stop_id=&routes=a,b&service_type=MON&start=07:00:00&end=23:00:00
+    GET /trip?trip_id=[&format=csv]
+    GET /health
+    POST /reload      reload the feed with loader_factory and swap it in once loaded
+
+    Builds run on the executor so the event loop keeps answering while they run. Identical queries
+    arriving while one is in flight share its result. A reload keeps serving the old feed until the new
+    one is fully loaded, then swaps it in with one assignment; requests already running finish on the
+    feed they started on.
+
+    Builds are CPU bound pure python and a thread pool runs them one at a time under the GIL. With
+    processes every request is answered in a process pool instead: each worker loads its own copy of the
+    feed with loader_factory (so it has to pickle, e.g. a functools.partial of a module level function),
+    reloads it when the service version moves on, and keeps its own CorridorCache over the same directory.
+
+    loader_factory: Callable[[], dload.BaseDataLoader]
+        loads the feed, called once at start and again on every reload
+    executor: Executor = None
+        runs the builds in this process, a ThreadPoolExecutor by default, ignored with processes
+    processes: int = None
+        answer requests in a pool of this many worker processes
+    """
+    def __init__(self, loader_factory: Callable[[], dload.BaseDataLoader], host: str = '127.0.0.1', port: int = 8080,
+                 cache: CorridorCache = None, executor: Executor = None, processes: int = None) -> None:
+        self.loader_factory, self.host, self.port, self.processes = loader_factory, host, port, processes
+        self.cache = cache or CorridorCache()
+        if processes: self.executor = ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(loader_factory, self.cache.maxsize, self.cache.directory))
+        else: self.executor = executor or ThreadPoolExecutor()
+        self.state: Optional[FeedState] = None
+        self._inflight: dict[tuple, asyncio.Future] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def _run(self, fnc: Callable, *args, local: bool = False) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(None if local else self.executor, fnc, *args)
+
+    async def coalesce(self, key: tuple, fnc: Callable, *args, local: bool = False) -> Any:
+        """
+        Run fnc on the executor unless an identical key is already in flight, in which case await that
+        local runs it on the event loop's default thread pool, for work that has to stay in this process
+        """
+        if key in self._inflight:
+            _context.count('service.coalesced')
+            return await asyncio.shield(self._inflight[key])
+        future = asyncio.ensure_future(self._run(fnc, *args, local=local))
+        self._inflight[key] = future
+        future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def reload(self) -> str:
+        state = await self.coalesce(('reload',), lambda: FeedState(self.loader_factory()), local=True)
+        self.state = state
+        return state.version
+
+    async def start(self) -> None:
+        if self.state is None: await self.reload()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        print(f'LOG: SERVING {self.state.version} ON http://{self.host}:{self.port}')
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        async with self._server: await self._server.serve_forever()
+
+    def run(self) -> None: asyncio.run(self.serve_forever())
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self.executor.shutdown(wait=False)
+
+    @staticmethod
+    def _param(query: dict, name: str, default: Any = None, required: bool = False) -> Any:
+        if name in query: return query[name][0]
+        if required: raise RequestError(400, f'missing parameter {name}')
+        return default
+
+    @staticmethod
+    def _list(query: dict, name: str) -> Optional[list[str]]:
+        return [v for value in query[name] for v in value.split(',') if v] if name in query else None
+
+    @staticmethod
+    def _service_types(query: dict) -> Optional[list[ServiceTypes]]:
+        names = FeedService._list(query, 'service_type')
+        try: return [ServiceTypes[name.upper()] for name in names] if names is not None else None
+        except KeyError as e: raise RequestError(400, f'unknown service_type {e}')
+
+    @staticmethod
+    def _window(query: dict, start: str = None, end: str = None) -> tuple[Optional[str], Optional[str]]:
+        """
+        start and end of the query, or the defaults given, checked the way filter_by reads them (TimetableIndex.window)
+        """
+        start, end = FeedService._param(query, 'start') or start, FeedService._param(query, 'end') or end
+        try: TimetableIndex.window((start, end))
+        except ValueError: raise RequestError(400, f'start and end must be GTFS times (HH:MM:SS), got {start!r} and {end!r}')
+        return start, end
+
+    @staticmethod
+    def _corridor(cache: CorridorCache, state: FeedState, query: dict) -> TimetableView:
+        _param, _list = FeedService._param, FeedService._list
+        corridor_id, routes, interpolate = _param(query, 'corridor_id', required=True), _list(query, 'routes'), _param(query, 'interpolate') == '1'
+        if not routes: raise RequestError(400, 'missing parameter routes')
+        start, end = FeedService._window(query)
+        corridor_timetable: CorridorTimetable = cache.corridor_timetable(
+            corridor_id, _param(query, 'corridor_name', ''), routes, state.gtfs_loader, sort=_param(query, 'sort') == '1',
+            disolve=_param(query, 'disolve') == '1', layout=_param(query, 'layout') == '1' or interpolate, interpolate=interpolate)
+        return corridor_timetable.filter_by(time=(start, end) if start or end else None, service_type=FeedService._service_types(query),
+                                            settlement=_list(query, 'settlement'), county=_list(query, 'county'))
+
+    @staticmethod
+    def _frequency(cache: CorridorCache, state: FeedState, query: dict) -> dict:
+        _param = FeedService._param
+        stop_id, routes = _param(query, 'stop_id', required=True), FeedService._list(query, 'routes') or []
+        start, end = FeedService._window(query, '00:00:00', '48:00:00')
+        stops = StopBaseConstructor([stop_id], state.gtfs_loader).build()
+        if not stops: raise RequestError(404, f'unknown stop {stop_id}')
+        corridor = cache.corridor(f'routes:{",".join(sorted(routes))}', '', routes, state.gtfs_loader)
+        service_types = FeedService._service_types(query) or list(ServiceTypes)
+        return {'stop_id': stop_id, 'routes': routes, 'service_type': [st.name for st in service_types], 'start': start, 'end': end,
+                'frequency': stop_ops.frequency(stops[0], service_types, corridor.routes, start, end)}
+
+    @staticmethod
+    def _trip(cache: CorridorCache, state: FeedState, query: dict) -> list[dict]:
+        trip_id = FeedService._param(query, 'trip_id', required=True)
+        if trip_id not in state.trip_routes: raise RequestError(404, f'unknown trip {trip_id}')
+        route_id = state.trip_routes[trip_id]
+        corridor = cache.corridor(f'routes:{route_id}', '', [route_id], state.gtfs_loader)
+        trip = next(trip for route in corridor.routes for trip in route.trips if trip.trip_id == trip_id)
+        return TripTimetableConstructor(trip).build().data
+
+    @staticmethod
+    def _encode(result: Any, form: str) -> tuple[str, bytes]:
+        if form == 'csv' and isinstance(result, (TimetableView, list)):
+            rows, columns = (list(result), list(result.columns)) if isinstance(result, TimetableView) else (result, list(result[0].keys()) if result else [])
+            buffer = io.StringIO(newline='')
+            writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction='ignore')
+            writer.writeheader(); writer.writerows(rows)
+            return 'text/csv', buffer.getvalue().encode('utf8')
+        if isinstance(result, TimetableView): result = list(result)
+        return 'application/json', json.dumps(result, default=str).encode('utf8')
+
+    @staticmethod
+    def answer(cache: CorridorCache, state: FeedState, path: str, query: dict) -> tuple[str, bytes]:
+        """
+        content type and body for a GET on one of the build paths, encoded where it was built
+        """
+        handlers = {'/corridor': FeedService._corridor, '/frequency': FeedService._frequency, '/trip': FeedService._trip}
+        return FeedService._encode(handlers[path](cache, state, query), FeedService._param(query, 'format', 'json'))
+
+    async def dispatch(self, method: str, target: str) -> tuple[int, str, bytes]:
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        state = self.state
+        if method == 'POST' and url.path == '/reload':
+            return 200, *self._encode({'version': await self.reload()}, 'json')
+        if method != 'GET': raise RequestError(405, f'{method} not allowed')
+        if url.path == '/health':
+            return 200, *self._encode({'version': state.version, 'cache': vars(self.cache.stats), 'inflight': len(self._inflight)}, 'json')
+        if url.path not in ('/corridor', '/frequency', '/trip'): raise RequestError(404, f'unknown path {url.path}')
+        key = (state.version, url.path, tuple(sorted((k, tuple(v)) for k, v in query.items())))
+        with _context.span(f'service{url.path}'):
+            if self.processes: return 200, *await self.coalesce(key, _worker_answer, state.version, url.path, query)
+            return 200, *await self.coalesce(key, self.answer, self.cache, state, url.path, query)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = (await reader.readline()).decode('latin_1').split()
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''): pass
+            if len(request_line) < 2: raise RequestError(400, 'bad request line')
+            status, content_type, body = await self.dispatch(request_line[0].upper(), request_line[1])
+        except RequestError as e: status, content_type, body = e.status, 'application/json', json.dumps({'error': str(e)}).encode('utf8')
+        except Exception as e:
+            print(f'WARNING: request failed -> {e!r}')
+            status, content_type, body = 500, 'application/json', json.dumps({'error': repr(e)}).encode('utf8')
+        writer.write(f'HTTP/1.1 {status} {"OK" if status == 200 else "ERROR"}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n'.encode('latin_1') + body)
+        try: await writer.drain()
+        finally: writer.close()
+
+if __name__ == "__main__":
+    FeedService(lambda: dload.GTFSLoadCSV('./data/agency.csv', './data/calendar.csv', './data/calendar_dates.csv', './data/routes.csv', './data/stop_times.csv', './data/stops.csv', './data/trips.csv')).run()
\ No newline at end of file
@@ -0,0 +1,160 @@
+from enum import Enum
+from typing import Optional, Union
+
+import datetime
+import time
+import math
+import re
+
+BASE_DAY = datetime.datetime.min
+ISO_DURATION = re.compile(r'^P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+(?:\.\d+)?)S)?)?$')
+TIME_WIDTH = 16
+
+class CRS(Enum):
+    OSGB36 = 1
+
+class GeoTransforms:
+    EARTH_RADIUS = 6371008.8
+
+    @staticmethod
+    def d2m(self, lat1: float, lon1: float) -> float:
+        """
+        degrees to meters
+        """
+
+    @staticmethod
+    def distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+        """
+        great circle (haversine) distance in meters between two WGS84 points
+        """
+        p1, p2, dp, dl = math.radians(lat1), math.radians(lat2), math.radians(lat2 - lat1), math.radians(lon2 - lon1)
+        a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+        return 2 * GeoTransforms.EARTH_RADIUS * math.asin(math.sqrt(a))
+
+    @staticmethod
+    def distances(lat1: 'np.ndarray', lon1: 'np.ndarray', lat2: 'np.ndarray', lon2: 'np.ndarray') -> 'np.ndarray':
+        """
+        distance over NumPy arrays of points, element by element
+        """
+        import numpy as np
+        p1, p2, l1, l2 = (np.radians(np.asarray(v, dtype='float64')) for v in (lat1, lat2, lon1, lon2))
+        a = np.sin((p2 - p1) / 2) ** 2 + np.cos(p1) * np.cos(p2) * np.sin((l2 - l1) / 2) ** 2
+        return 2 * GeoTransforms.EARTH_RADIUS * np.arcsin(np.sqrt(a))
+
+class TimeTransforms:
+    @staticmethod
+    def ts_val(time: Optional[Union[str, float]]) -> float:
+        if isinstance(time, (float, int)): return time
+        elif isinstance(time, str): return TimeTransforms.ts_to_float(time, "%H:%M:%S")
+    @staticmethod
+    def ts_to_float(time: str, form: str) -> float:
+        return datetime.datetime.strptime(time, form).replace(tzinfo=datetime.timezone.utc).timestamp()
+    
+    @staticmethod
+    def ts_to_seconds(time: Optional[Union[str, float]]) -> Optional[int]:
+        """
+        GTFS time string to seconds past midnight, unlike ts_to_float hours past 24 are allowed
+        blank and '0' cells read as None
+        """
+        if time is None or time == '' or time == '0' or time == 0: return None
+        if isinstance(time, (float, int)): return int(time)
+        h, m, s = time.strip().split(':')
+        return int(h) * 3600 + int(m) * 60 + int(s)
+
+    @staticmethod
+    def ts_from_seconds(seconds: int) -> str:
+        """
+        seconds past midnight to a GTFS time string, hours can run past 24
+        """
+        return f'{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}'
+
+    @staticmethod
+    def series_to_seconds(series: 'pd.Series') -> 'pd.Series':
+        """
+        ts_to_seconds over a whole pandas Series in one NumPy pass, nullable Int32 with <NA> where a cell is
+        blank or is not H:MM:SS (one to three hour digits, minutes and seconds below 60)
+
+        Cells are right justified into fixed width code points and read column by column, no cell is split or parsed on its own
+        """
+        import numpy as np
+        import pandas as pd
+        if not len(series): return pd.Series(pd.array([], dtype='Int32'), index=series.index)
+        text = np.char.strip(np.asarray(series, dtype=object).astype(f'U{TIME_WIDTH}'))
+        length = np.char.str_len(text)
+        chars = np.char.rjust(text.astype('U9'), 9).view(np.uint32).reshape(len(text), 9).astype(np.int32) - 48
+        h100, h10, h1, colon2, m10, m1, colon1, s10, s1 = chars.T
+        digit, blank = (chars >= 0) & (chars <= 9), chars == ord(' ') - 48
+        valid = (length >= 7) & (length <= 9) & (colon1 == 10) & (colon2 == 10) & (s10 <= 5) & (m10 <= 5) & digit[:, [2, 4, 5, 7, 8]].all(axis=1)
+        valid &= (digit[:, 1] | (blank[:, 1] & blank[:, 0])) & (digit[:, 0] | blank[:, 0])
+        hours = np.maximum(h100, 0) * 100 + np.maximum(h10, 0) * 10 + h1
+        seconds = np.where(valid, hours * 3600 + m10 * 600 + m1 * 60 + s10 * 10 + s1, 0).astype(np.int32)
+        return pd.Series(pd.arrays.IntegerArray(seconds, ~valid), index=series.index)
+
+    @staticmethod
+    def series_from_seconds(series: 'pd.Series') -> 'pd.Series':
+        """
+        ts_from_seconds over a whole pandas Series of seconds, None where a value is missing
+        """
+        import numpy as np
+        import pandas as pd
+        values = series.to_numpy(dtype='float64', na_value=np.nan)
+        missing = np.isnan(values)
+        seconds = np.where(missing, 0, values).astype(np.int64)
+        h, m, s = seconds // 3600, seconds % 3600 // 60, seconds % 60
+        chars = np.stack([h // 10 % 10, h % 10, np.full_like(h, 10), m // 10, m % 10, np.full_like(h, 10), s // 10, s % 10], axis=1) + 48
+        times = chars.astype(np.uint8).view('S8').ravel().astype('U8').astype(object)
+        wide = ~missing & (h >= 100)
+        if wide.any(): times[wide] = [TimeTransforms.ts_from_seconds(int(v)) for v in seconds[wide]]
+        times[missing] = None
+        return pd.Series(times, index=series.index, dtype=object)
+
+    @staticmethod
+    def interpolate_seconds(seconds: 'np.ndarray', latitude: 'np.ndarray', longitude: 'np.ndarray', trips: 'np.ndarray') -> 'np.ndarray':
+        """
+        Fills missing (NaN) stop times from the timepoints either side, weighted by distance travelled
+
+        The arrays hold the stops of every trip back to back in stop order, trips labels each row with
+        its trip. Distance is the haversine distance between consecutive stops of a trip, summed along
+        it; where the timepoints either side are at the same place the weight falls back to stop
+        position. Stops before the first or after the last timepoint of their trip stay NaN. Everything
+        is whole array operations, a corridor is one call.
+
+        Returns the times as float64 seconds, the known ones unchanged and the filled ones rounded
+        """
+        import numpy as np
+        seconds, trips, n = np.asarray(seconds, dtype='float64'), np.asarray(trips), len(seconds)
+        if not n: return seconds.copy()
+        step = np.zeros(n)
+        step[1:] = GeoTransforms.distances(latitude[:-1], longitude[:-1], latitude[1:], longitude[1:])
+        step[np.isnan(step)] = 0
+        step[np.r_[True, trips[1:] != trips[:-1]]] = 0
+        travelled, position = np.cumsum(step), np.arange(n)
+
+        known = ~np.isnan(seconds)
+        before = np.maximum.accumulate(np.where(known, position, -1))
+        after = np.minimum.accumulate(np.where(known, position, n)[::-1])[::-1]
+        b, a = np.maximum(before, 0), np.minimum(after, n - 1)
+        fill = ~known & (before >= 0) & (after < n) & (trips[b] == trips) & (trips[a] == trips)
+
+        span = travelled[a] - travelled[b]
+        weight = np.where(span > 0, (travelled - travelled[b]) / np.where(span > 0, span, 1), (position - b) / np.maximum(a - b, 1))
+        filled = seconds.copy()
+        filled[fill] = np.round(seconds[b] + weight * (seconds[a] - seconds[b]))[fill]
+        return filled
+
+    @staticmethod
+    def iso_duration(value: Optional[str]) -> int:
+        """
+        ISO 8601 duration (TransXChange RunTime/WaitTime, e.g. PT1H5M) to seconds
+        """
+        if not value: return 0
+        match = ISO_DURATION.match(value.strip())
+        if not match: raise ValueError(f'{value} is not an ISO 8601 duration')
+        d, h, m, s = (float(g) if g else 0 for g in match.groups())
+        return int(d * 86400 + h * 3600 + m * 60 + s)
+
+    @staticmethod
+    def _is_t(value: str) -> bool:
+        try: time.strptime(value, '%H:%M:%S')
+        except: return False
+        else: return True
\ No newline at end of file
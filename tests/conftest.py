@@ -0,0 +1,66 @@
+from slighe import dload
+
+from typing import Callable
+import csv
+import os
+
+import pytest
+
+FEED_FILES = ['agency', 'calendar', 'calendar_dates', 'routes', 'stop_times', 'stops', 'trips']
+HEADERS = {'agency': ['agency_id', 'agency_name', 'agency_url', 'agency_timezone'],
+           'calendar': ['service_id', 'monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday', 'start_date', 'end_date', 'service_type'],
+           'calendar_dates': ['service_id', 'date', 'exception_type'],
+           'routes': ['route_id', 'agency_id', 'route_short_name', 'route_long_name', 'route_type'],
+           'stop_times': ['trip_id', 'arrival_time', 'departure_time', 'stop_id', 'stop_sequence'],
+           'stops': ['stop_id', 'stop_name', 'stop_lat', 'stop_lon', 'settlement', 'county'],
+           'trips': ['route_id', 'service_id', 'trip_id', 'direction_id']}
+AGENCY = [{'agency_id': 'A', 'agency_name': 'agency', 'agency_url': '', 'agency_timezone': 'Europe/Dublin'}]
+CALENDAR = [{'service_id': '1', 'monday': '1', 'tuesday': '1', 'wednesday': '1', 'thursday': '1', 'friday': '1', 'saturday': '0', 'sunday': '0',
+             'start_date': '20260101', 'end_date': '20261231', 'service_type': '1'},
+            {'service_id': '7', 'monday': '0', 'tuesday': '0', 'wednesday': '0', 'thursday': '0', 'friday': '0', 'saturday': '1', 'sunday': '0',
+             'start_date': '20260101', 'end_date': '20261231', 'service_type': '7'}]
+
+def stop(stop_id: str, lat: float, lon: float = -6.0, settlement: str = '', county: str = 'County') -> dict:
+    return {'stop_id': stop_id, 'stop_name': f'Stop {stop_id}', 'stop_lat': str(lat), 'stop_lon': str(lon), 'settlement': settlement, 'county': county}
+
+def trip(route_id: str, trip_id: str, stops: list[str], times: list[str], service_id: str = '1', direction_id: str = '0') -> tuple[dict, list[dict]]:
+    """
+    trips.csv row and stop_times.csv rows of one trip, arrival and departure at the same time
+    """
+    return ({'route_id': route_id, 'service_id': service_id, 'trip_id': trip_id, 'direction_id': direction_id},
+            [{'trip_id': trip_id, 'arrival_time': t, 'departure_time': t, 'stop_id': s, 'stop_sequence': str(n)} for n, (s, t) in enumerate(zip(stops, times), 1)])
+
+def write_feed(directory: str, stops: list[dict], trips: list[tuple[dict, list[dict]]], **tables: list[dict]) -> dload.GTFSLoadCSV:
+    """
+    Writes a GTFS feed of the stops and trips (see trip) to directory and loads it, routes default to one per route_id of the trips
+    """
+    routes = [{'route_id': r, 'agency_id': 'A', 'route_short_name': r, 'route_long_name': r, 'route_type': '3'} for r in dict.fromkeys(t['route_id'] for t, _ in trips)]
+    rows = {'agency': AGENCY, 'calendar': CALENDAR, 'calendar_dates': [], 'routes': routes, 'stops': stops,
+            'trips': [t for t, _ in trips], 'stop_times': [st for _, stop_times in trips for st in stop_times], **tables}
+    for name in FEED_FILES:
+        with open(os.path.join(directory, f'{name}.csv'), 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=HEADERS[name])
+            writer.writeheader()
+            writer.writerows(rows[name])
+    return dload.GTFSLoadCSV(*[os.path.join(directory, f'{name}.csv') for name in FEED_FILES])
+
+@pytest.fixture
+def feed(tmp_path) -> Callable[..., dload.GTFSLoadCSV]:
+    return lambda stops, trips, **tables: write_feed(str(tmp_path), stops, trips, **tables)
+
+@pytest.fixture
+def network(feed) -> dload.GTFSLoadCSV:
+    """
+    A -R1-> B -R1-> C, walk 100 m to C2 -R2-> D, or the slower direct A -R3-> D, E is served by no trip
+
+    Town A: A, Town C: C and C2, Town D: D, Town E: E
+    """
+    stops = [stop('A', 53.00, settlement='Town A'), stop('B', 53.01), stop('C', 53.02, settlement='Town C'),
+             stop('C2', 53.0209, settlement='Town C'), stop('D', 53.04, settlement='Town D'), stop('E', 53.10, settlement='Town E')]
+    trips = [trip('R1', 'R1_0800', ['A', 'B', 'C'], ['08:00:00', '08:10:00', '08:20:00']),
+             trip('R1', 'R1_0900', ['A', 'B', 'C'], ['09:00:00', '09:10:00', '09:20:00']),
+             trip('R2', 'R2_0825', ['C2', 'D'], ['08:25:00', '08:40:00']),
+             trip('R2', 'R2_0925', ['C2', 'D'], ['09:25:00', '09:40:00']),
+             trip('R3', 'R3_0805', ['A', 'D'], ['08:05:00', '09:00:00']),
+             trip('R3', 'R3_SAT', ['A', 'D'], ['07:00:00', '07:30:00'], service_id='7')]
+    return feed(stops, trips)
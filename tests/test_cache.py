@@ -0,0 +1,68 @@
+from slighe.cache import CorridorCache
+from slighe.dtypes import CorridorTimetable
+
+from conftest import stop, trip, write_feed
+
+import os
+import pickle
+import time
+
+import pytest
+
+STOPS = [stop('A', 53.00, settlement='Town A'), stop('B', 53.01), stop('C', 53.02)]
+
+def _trips(start: str = '08') -> list[tuple]:
+    return [trip('R1', 'T1', ['A', 'B', 'C'], [f'{start}:00:00', f'{start}:10:00', f'{start}:20:00']),
+            trip('R2', 'T2', ['A', 'C'], [f'{start}:30:00', f'{start}:50:00'])]
+
+@pytest.fixture
+def loader(tmp_path):
+    return write_feed(str(tmp_path), STOPS, _trips())
+
+def test_lru_evicts_the_least_recently_used(loader):
+    cache = CorridorCache(maxsize=2)
+    first = cache.corridor(1, 'one', ['R1'], loader)
+    cache.corridor(2, 'two', ['R2'], loader)
+    assert cache.corridor(1, 'one', ['R1'], loader) is first
+    cache.corridor(3, 'both', ['R1', 'R2'], loader)
+    assert len(cache) == 2 and cache.stats.evictions == 1
+    assert cache.key(loader, 'corridor', 2, ['R2']) not in cache
+    assert cache.corridor(1, 'one', ['R1'], loader) is first
+    assert (cache.stats.hits, cache.stats.misses) == (2, 3)
+
+def test_key_ignores_route_order_and_keeps_options_apart(loader):
+    cache = CorridorCache()
+    assert cache.corridor(1, '', ['R1', 'R2'], loader) is cache.corridor(1, '', ['R2', 'R1'], loader)
+    assert cache.corridor_timetable(1, '', ['R1'], loader) is not cache.corridor_timetable(1, '', ['R1'], loader, layout=True)
+
+def test_changed_feed_is_not_served_stale(tmp_path, loader):
+    cache = CorridorCache()
+    before = cache.corridor_timetable(1, '', ['R1'], loader, layout=True)
+    time.sleep(0.01)
+    changed = write_feed(str(tmp_path), STOPS, _trips('09'))
+    assert changed.fingerprint() != loader.fingerprint()
+    after = cache.corridor_timetable(1, '', ['R1'], changed, layout=True)
+    assert after is not before and cache.stats.hits == 0
+    assert [row['T1'] for row in after.timetable] == ['09:00:00', '09:10:00', '09:20:00']
+    assert cache.corridor_timetable(1, '', ['R1'], loader, layout=True) is before
+
+def test_disk_tier_survives_a_new_instance(tmp_path, loader):
+    directory = os.path.join(tmp_path, 'corridors')
+    built = CorridorCache(directory=directory).corridor_timetable(1, '', ['R1', 'R2'], loader, layout=True)
+    cache = CorridorCache(directory=directory)
+    reloaded = cache.corridor_timetable(1, '', ['R1', 'R2'], loader, layout=True)
+    assert (cache.stats.disk_hits, cache.stats.misses) == (1, 0)
+    assert reloaded.timetable == built.timetable
+    cache.clear(disk=True)
+    assert not os.listdir(directory)
+
+def test_pickled_timetable_keeps_its_rows_and_index(loader):
+    corridor_timetable = CorridorCache().corridor_timetable(1, '', ['R1', 'R2'], loader)
+    unpickled: CorridorTimetable = pickle.loads(pickle.dumps(corridor_timetable))
+    assert unpickled.timetable == corridor_timetable.timetable
+    assert [(t.trip_id, t.route_id, t.service_id) for t in unpickled.trips] == [(t.trip_id, t.route_id, t.service_id) for t in corridor_timetable.trips]
+    assert all(not t.stops and not t.stop_times for t in unpickled.trips)
+    assert unpickled._index is not None and unpickled.index.time_keys == corridor_timetable.index.time_keys
+    assert list(unpickled.filter_by(time=('08:25:00', None)).columns)[-1:] == ['T2']
+    # the original still has its trips' stops and stop_times
+    assert all(t.stop_times for t in corridor_timetable.trips)
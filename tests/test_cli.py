@@ -0,0 +1,136 @@
+from slighe.cli import main, FEED_FILES
+from slighe import dload
+
+import csv
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+@pytest.fixture
+def run(network, tmp_path, capsys):
+    """
+    main() with --feed and --cache pointing at the network feed, returns the exit code and stdout
+    """
+    feed = ['--feed', str(tmp_path), '--cache', os.path.join(tmp_path, 'cache')]
+    def run(command: str, *args: str, feed_args: bool = True) -> tuple[int, str]:
+        capsys.readouterr()
+        code = main([command, *(feed if feed_args else []), *args])
+        return code, capsys.readouterr().out
+    return run
+
+@pytest.fixture
+def routes_corridors(tmp_path) -> str:
+    file_path = os.path.join(tmp_path, 'routes_corridors.csv')
+    with open(file_path, 'w') as f: f.write('route_id,corridor_id\nR1,1\nR3,1\nR2,2\n')
+    return file_path
+
+def test_importing_the_cli_is_cheap():
+    code = 'import sys, slighe.cli; slighe.cli.parser(); print(sorted(m for m in ("pandas", "numpy", "slighe.dload", "slighe.dtypes") if m in sys.modules))'
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True, env={**os.environ, 'PYTHONPATH': os.pathsep.join(sys.path)})
+    assert result.stdout.strip() == '[]'
+
+def test_load_caches_the_feed(run, tmp_path):
+    code, out = run('load')
+    assert code == 0 and 'stop_times: 14 rows' in out and 'CACHED' in out
+    assert any(name.startswith('feed-') for name in os.listdir(os.path.join(tmp_path, 'cache')))
+
+def test_corridors(run, routes_corridors, tmp_path):
+    out_dir = os.path.join(tmp_path, 'out')
+    code, out = run('corridors', routes_corridors, '--out', out_dir, '--layout')
+    assert code == 0 and 'MISSES: 4' in out
+    with open(os.path.join(out_dir, '1_timetable.csv'), newline='') as f: rows = list(csv.DictReader(f))
+    assert [row['stop_id'] for row in rows] == ['A', 'B', 'C', 'D']
+    assert run('corridors', routes_corridors, '--out', out_dir, '--layout', '--corridor', '2', '--start', '09:00:00')[1].startswith('2: ')
+
+def test_corridors_frequency_and_expand(run, routes_corridors, tmp_path):
+    out_dir = os.path.join(tmp_path, 'out')
+    code, out = run('corridors', routes_corridors, '--out', out_dir, '--frequency', '--corridor', '2')
+    assert code == 0 and 'BLOCKS' in out
+    timetable = os.path.join(out_dir, '2_timetable.csv')
+    assert os.path.exists(os.path.join(out_dir, '2_timetable_frequencies.csv'))
+    expanded = os.path.join(tmp_path, 'expanded.csv')
+    assert run('expand', timetable, expanded, feed_args=False) == (0, f'{expanded}\n')
+    with open(expanded, newline='') as f: header = next(csv.reader(f))
+    assert {'R2_0825', 'R2_0925'} <= set(header)
+    with open(os.path.join(out_dir, '2_timetable_frequencies.csv'), 'w') as f: f.write('block_id,trip_id,column\nblock_0,R2_0825,0\n')
+    with pytest.raises(SystemExit, match='not a frequencies file'): run('expand', timetable, expanded, feed_args=False)
+
+def test_frequency(run):
+    assert run('frequency', 'A', '--routes', 'R3', '--service-type', 'MON_FRI') == (0, '1\n')
+    assert run('frequency', 'A', '--routes', 'R1', '--start', '08:30:00')[1] == '1\n'
+    with pytest.raises(SystemExit): run('frequency', 'Z', '--routes', 'R1')
+
+def test_export(run, tmp_path):
+    out_dir = os.path.join(tmp_path, 'out')
+    code, out = run('export', 'R1_0800', 'T9', '--out', out_dir)
+    assert code == 0 and 'WARNING: unknown trip T9' in out
+    with open(os.path.join(out_dir, 'R1_0800.csv'), newline='') as f: assert len(list(csv.DictReader(f))) == 3
+
+def test_discover(run, tmp_path):
+    file_path = os.path.join(tmp_path, 'discovered.csv')
+    code, out = run('discover', '--out', file_path)
+    assert code == 0 and out.endswith(f'CORRIDORS: {file_path}\n')
+    with open(file_path, newline='') as f: assert {row['route_id'] for row in csv.DictReader(f)} == {'R1', 'R2', 'R3'}
+
+def test_plan(run):
+    code, out = run('plan', 'A', 'D', '08:00:00', '--service-type', 'MON_FRI')
+    assert code == 0 and 'R1_0800' in out and 'R2_0825' in out
+    assert run('plan', 'A', 'E', '08:00:00')[0] == 1
+
+def test_matrix(run, tmp_path):
+    file_path = os.path.join(tmp_path, 'matrix.f32')
+    code, out = run('matrix', file_path, '08:00:00', '09:30:00', '--service-type', 'MON_FRI', '--processes', '1')
+    assert (code, out.splitlines()[-1]) == (0, f'4 SETTLEMENTS: {file_path}')
+
+def test_validate(run, tmp_path):
+    code, out = run('validate', '--json', os.path.join(tmp_path, 'report.json'))
+    assert code == 0 and os.path.exists(os.path.join(tmp_path, 'report.json'))
+
+def test_serve_starts_and_stops(run, monkeypatch):
+    import asyncio
+    from slighe.service import FeedService
+    served = []
+    async def start_and_close(service: FeedService) -> None:
+        await service.start()
+        served.append((service.port, service.processes, len(service.state.trip_routes)))
+        await service.close()
+    monkeypatch.setattr(FeedService, 'run', lambda self: asyncio.run(start_and_close(self)))
+    assert run('serve', '--port', '0')[0] == 0
+    assert served == [(0, None, 6)]
+
+def test_nta(run, routes_corridors, tmp_path):
+    pytest.importorskip('pandas')
+    settlement_filter = os.path.join(tmp_path, 'settlement_filter.csv')
+    with open(settlement_filter, 'w') as f: f.write('Corridor,settlement\n1,Town A\n1,Town C\n1,Town D\n')
+    out_dir = os.path.join(tmp_path, 'nta')
+    assert run('nta', routes_corridors, settlement_filter, '--feed', str(tmp_path), '--out', out_dir, '--corridor', '1', feed_args=False)[0] == 0
+    assert os.listdir(out_dir) == ['corridor_timetable_1.csv']
+
+def test_profile_flag_writes_json(run, tmp_path):
+    file_path = os.path.join(tmp_path, 'profile.json')
+    code = main(['--profile', file_path, 'load', '--feed', str(tmp_path), '--no-cache'])
+    assert code == 0 and os.path.getsize(file_path) > 0
+
+def _cached(tmp_path, built: list) -> dload.GTFSLoadCached:
+    paths = [os.path.join(tmp_path, f'{name}.csv') for name in FEED_FILES]
+    def factory() -> dload.GTFSLoadCSV:
+        built.append(1)
+        return dload.GTFSLoadCSV(*paths)
+    return dload.GTFSLoadCached(dload.GTFSLoadMethod.from_csv, paths, factory, os.path.join(tmp_path, 'cache'))
+
+def test_gtfs_load_cached(network, tmp_path):
+    built = []
+    first = _cached(tmp_path, built)
+    assert first.fingerprint() == network.fingerprint() and not first.cached and not built
+    assert len(first.load(dload.LoadCSVFiles.TRIPS)) == 6 and first.cached and built == [1]
+    second = _cached(tmp_path, built)
+    assert second.load(dload.LoadCSVFiles.STOPS) == network.load(dload.LoadCSVFiles.STOPS) and built == [1]
+    time.sleep(0.01)
+    with open(os.path.join(tmp_path, 'trips.csv'), 'a') as f: f.write('R1,1,R1_1000,0\n')
+    changed = _cached(tmp_path, built)
+    assert changed.fingerprint() != first.fingerprint() and not changed.cached
+    assert len(changed.load(dload.LoadCSVFiles.TRIPS)) == 7 and built == [1, 1]
+    with pytest.raises(FileNotFoundError): dload.GTFSLoadCached(dload.GTFSLoadMethod.from_csv, [os.path.join(tmp_path, 'missing.csv')], lambda: None, str(tmp_path))
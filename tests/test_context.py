@@ -0,0 +1,96 @@
+from slighe import _context
+
+import json
+import os
+import threading
+
+import pytest
+
+@pytest.fixture(autouse=True)
+def recorder():
+    _context.reset()
+    yield
+    _context.reset()
+
+def test_nothing_is_recorded_while_disabled():
+    with _context.span('outer') as s: _context.count('rows')
+    assert s is None and not _context.spans() and not _context.counters()
+
+def _span_in_thread() -> None:
+    with _context.span('thread'): pass
+
+def test_spans_nest_per_thread():
+    _context.enable()
+    with _context.span('outer', corridor=1) as outer:
+        with _context.span('inner') as inner: pass
+        thread = threading.Thread(target=_span_in_thread)
+        thread.start(); thread.join()
+    by_name = {s.name: s for s in _context.spans()}
+    assert inner.parent_id == outer.span_id and outer.parent_id is None
+    assert by_name['thread'].parent_id is None and by_name['thread'].thread_id != outer.thread_id
+    assert outer.end >= inner.end >= inner.start >= outer.start
+    assert outer.attrs == {'corridor': 1}
+
+def test_count_and_counted_add_to_the_innermost_span():
+    _context.enable()
+    with _context.span('outer') as outer:
+        _context.count('rows', 2)
+        with _context.span('inner') as inner:
+            assert _context.counted('Constructor', [1, 2, 3], scanned=10) == [1, 2, 3]
+            _context.count('rows')
+    assert _context.counters() == {'rows': 3, 'rows_matched.Constructor': 3, 'rows_scanned.Constructor': 10}
+    assert dict(outer.counters) == {'rows': 2}
+    assert dict(inner.counters) == {'rows_matched.Constructor': 3, 'rows_scanned.Constructor': 10, 'rows': 1}
+
+def test_tracemalloc_hook_counts_objects_allocated():
+    _context.enable(tracemalloc=True)
+    with _context.span('build') as s:
+        objects = _context.counted('Constructor', [object() for _ in range(10000)])
+    _context.disable()
+    assert s.traced_memory is not None and s.traced_memory[1] > 0
+    assert s.counters['objects_allocated'] >= 10000
+    assert _context.counters()['objects_allocated.Constructor'] >= 10000
+    assert len(objects) == 10000
+
+def test_timing_records_without_enable(capsys):
+    with _context.timing('block'): pass
+    with _context.timing('block'): pass
+    assert _context.timings()['block']['calls'] == 2
+    assert not _context.spans() and capsys.readouterr().out == ''
+
+def _run() -> None:
+    with _context.span('outer', corridor=1):
+        _context.count('rows', 4)
+        with _context.timing('inner'): pass
+
+def test_export_json(tmp_path):
+    file_path = os.path.join(tmp_path, 'profile.json')
+    with _context.profile(json_path=file_path): _run()
+    with open(file_path) as f: exported = json.load(f)
+    spans = {s['name']: s for s in exported['spans']}
+    assert list(spans) == ['profile', 'outer', 'inner']
+    assert spans['inner']['parent_id'] == spans['outer']['span_id'] and spans['outer']['parent_id'] == spans['profile']['span_id']
+    assert spans['outer']['counters'] == {'rows': 4} and spans['outer']['attrs'] == {'corridor': '1'}
+    assert exported['counters'] == {'rows': 4} and exported['timings']['inner']['calls'] == 1
+
+def test_export_chrome_trace(tmp_path):
+    file_path = os.path.join(tmp_path, 'profile.trace.json')
+    with _context.profile(trace_path=file_path): _run()
+    with open(file_path) as f: trace = json.load(f)
+    complete = [e for e in trace['traceEvents'] if e['ph'] == 'X']
+    assert [e['name'] for e in complete] == ['profile', 'outer', 'inner']
+    for event in complete:
+        assert {'name', 'ph', 'pid', 'tid', 'ts', 'dur', 'args'} <= set(event)
+        assert event['pid'] == os.getpid() and event['dur'] >= 0
+    profile, outer, inner = complete
+    assert profile['ts'] <= outer['ts'] <= inner['ts'] and inner['ts'] + inner['dur'] <= outer['ts'] + outer['dur'] + 1
+    assert outer['args']['rows'] == 4 and outer['args']['corridor'] == '1'
+    assert all(e['ph'] == 'C' and 'bytes' in e['args'] for e in trace['traceEvents'] if e['ph'] != 'X')
+    assert trace['otherData']['counters'] == {'rows': 4}
+
+def test_export_pstats_after_disable(tmp_path):
+    file_path = os.path.join(tmp_path, 'profile.pstats')
+    with _context.profile(pstats_path=file_path): _run()
+    assert os.path.getsize(file_path) > 0
+    _context.reset()
+    with pytest.raises(RuntimeError): _context.export_pstats(file_path)
@@ -0,0 +1,84 @@
+from slighe.ops.corridor_ops import discover_corridors, minhash_signatures, lsh_candidates, route_stop_sets, to_routes_corridors_csv, merge_stop_order
+from slighe.constructors import CorridorConstructor, CorrdidorTimetableConstructor
+from slighe.dtypes import LAYOUT_FIELDS
+
+from conftest import stop, trip
+
+import csv
+import os
+
+import pytest
+
+def _times(n: int) -> list[str]: return [f'08:{m:02d}:00' for m in range(n)]
+
+@pytest.fixture
+def routes(feed):
+    """
+    R1, R2 and R3 run along the S line (R2 one stop short, R3 the other way), R4 and R5 serve the same
+    T stops, R6 crosses the S line at two stops
+    """
+    s, t = [f'S{i}' for i in range(10)], [f'T{i}' for i in range(10)]
+    u = ['S2', 'U0', 'U1', 'U2', 'U3', 'U4', 'U5', 'U6', 'S7']
+    stops = [stop(stop_id, 53 + n / 100) for n, stop_id in enumerate(s + t + u[1:-1])]
+    trips = [trip('R1', 'R1_0', s, _times(10)), trip('R2', 'R2_0', s[:-1], _times(9)), trip('R3', 'R3_0', s[::-1], _times(10), direction_id='1'),
+             trip('R4', 'R4_0', t, _times(10)), trip('R5', 'R5_0', t[::-1], _times(10)), trip('R6', 'R6_0', u, _times(9))]
+    return feed(stops, trips)
+
+def test_route_stop_sets(routes):
+    stop_sets = route_stop_sets(routes)
+    assert stop_sets['R1'] == stop_sets['R3'] == frozenset(f'S{i}' for i in range(10))
+    assert len(stop_sets['R2']) == 9
+
+def test_minhash_agreement_follows_jaccard_similarity(routes):
+    signatures = minhash_signatures(route_stop_sets(routes), num_perm=128)
+    agree = lambda a, b: sum(x == y for x, y in zip(signatures[a], signatures[b])) / 128
+    assert signatures['R1'] == signatures['R3']
+    assert agree('R1', 'R2') > 0.7
+    assert agree('R1', 'R4') == 0
+    assert ('R1', 'R3') in lsh_candidates(signatures, bands=32)
+    assert not any({'R1', 'R4'} == set(pair) for pair in lsh_candidates(signatures, bands=32))
+
+def test_discover_corridors_groups_routes_by_shared_stops(routes):
+    assert discover_corridors(routes) == {'1': ['R1', 'R2', 'R3'], '2': ['R4', 'R5'], '3': ['R6']}
+
+def test_discover_corridors_threshold(routes):
+    # R2 has a Jaccard similarity of 0.9 with R1 and R3
+    assert discover_corridors(routes, threshold=0.95) == {'1': ['R1', 'R3'], '2': ['R4', 'R5'], '3': ['R2'], '4': ['R6']}
+
+def test_to_routes_corridors_csv(tmp_path):
+    file_path = os.path.join(tmp_path, 'routes_corridors.csv')
+    to_routes_corridors_csv({'1': ['R1', 'R2'], '2': ['R4']}, file_path)
+    with open(file_path, newline='') as f: rows = list(csv.DictReader(f))
+    assert rows == [{'route_id': 'R1', 'corridor_id': '1'}, {'route_id': 'R2', 'corridor_id': '1'}, {'route_id': 'R4', 'corridor_id': '2'}]
+
+def test_merge_stop_order_slots_branches_into_the_trunk():
+    order = merge_stop_order([('A', 'B', 'C', 'D'), ('A', 'B', 'X', 'D'), ('B', 'D')])
+    assert [stop_id for stop_id, _ in order] == ['A', 'B', 'C', 'X', 'D']
+
+def test_merge_stop_order_keeps_every_pattern_in_order():
+    patterns = [('S1', 'S2', 'S4', 'S5'), ('S0', 'S1', 'S3', 'S4'), ('S2', 'S3')]
+    position = {stop_id: n for n, (stop_id, _) in enumerate(merge_stop_order(patterns))}
+    assert len(position) == 6
+    for pattern in patterns: assert [position[s] for s in pattern] == sorted(position[s] for s in pattern)
+
+def test_merge_stop_order_loops_and_contradictions():
+    assert merge_stop_order([('A', 'B', 'C', 'B', 'D')]) == [('A', 0), ('B', 0), ('C', 0), ('B', 1), ('D', 0)]
+    assert sorted(merge_stop_order([('A', 'B'), ('B', 'A')])) == [('A', 0), ('B', 0)]
+
+def test_layout_keeps_the_two_directions_apart(feed, tmp_path):
+    stops = [stop(stop_id, 53 + n / 100) for n, stop_id in enumerate(['A', 'B', 'C', 'D'])]
+    trips = [trip('R1', 'OUT_0', ['A', 'B', 'C', 'D'], ['08:00:00', '08:05:00', '08:10:00', '08:15:00']),
+             trip('R1', 'OUT_1', ['A', 'C', 'D'], ['09:00:00', '09:10:00', '09:15:00']),
+             trip('R1', 'IN_0', ['D', 'C', 'B', 'A'], ['07:00:00', '07:05:00', '07:10:00', '07:15:00'], direction_id='1')]
+    corridor = CorridorConstructor(1, 'test', ['R1'], feed(stops, trips)).build()
+    corridor_timetable = CorrdidorTimetableConstructor(corridor, layout=True).build()
+    rows = [(row['direction_id'], row['stop_id'], row['OUT_0'], row['OUT_1'], row['IN_0']) for row in corridor_timetable.timetable]
+    assert rows == [('0', 'A', '08:00:00', '09:00:00', 0), ('0', 'B', '08:05:00', 0, 0), ('0', 'C', '08:10:00', '09:10:00', 0), ('0', 'D', '08:15:00', '09:15:00', 0),
+                    ('1', 'D', 0, 0, '07:00:00'), ('1', 'C', 0, 0, '07:05:00'), ('1', 'B', 0, 0, '07:10:00'), ('1', 'A', 0, 0, '07:15:00')]
+
+    corridor_timetable.sort_by_time()
+    assert [(row['direction_id'], row['stop_id']) for row in corridor_timetable.timetable] == [r[:2] for r in rows]
+    file_path = os.path.join(tmp_path, 'timetable.csv')
+    corridor_timetable.to_csv(file_path)
+    with open(file_path, newline='') as f: header = next(csv.reader(f))
+    assert header == LAYOUT_FIELDS + [trip.trip_id for trip in corridor_timetable.trips]
@@ -0,0 +1,70 @@
+import pytest
+
+pytest.importorskip('pandas')
+
+from slighe.data_aggregator import NTATimeTable
+
+from conftest import FEED_FILES, stop, trip, write_feed
+
+import csv
+import os
+
+STOPS = [stop(f'S{i}', 53 + i / 100, settlement=f'Town {i}') for i in range(5)]
+
+def _trips() -> list[tuple]:
+    return [trip('R1', 'A1', ['S0', 'S1', 'S2', 'S3'], ['07:00:00', '07:05:00', '07:10:00', '07:15:00']),
+            trip('R1', 'X1', ['S0', 'S1', 'S2', 'S3'], ['07:00:00', '07:05:00', '07:10:00', '07:15:00']),
+            trip('R1', 'A2', ['S0', 'S1', 'S2', 'S3'], ['08:00:00', '08:05:00', '', '08:15:00']),
+            trip('R2', 'B1', ['S1', 'S2', 'S4'], ['07:05:00', '07:10:00', '07:30:00']),
+            trip('R2', 'B2', ['S1', 'S2', 'S4'], ['09:05:00', '09:10:00', '09:30:00'], service_id='7'),
+            trip('R3', 'C1', ['S3', 'S2', 'S1'], ['10:00:00', '10:05:00', '10:10:00'], direction_id='1')]
+
+def _nta(tmp_path, trips: list[tuple], out: str = 'out', **options) -> list[list[str]]:
+    directory = str(tmp_path)
+    write_feed(directory, STOPS, trips)
+    path = lambda name: os.path.join(directory, name)
+    with open(path('routes_corridors.csv'), 'w') as f: f.write('route_id,corridor_id\nR1,1\nR2,1\nR3,1\n')
+    with open(path('settlement_filter.csv'), 'w') as f: f.write('Corridor,settlement\n' + ''.join(f'1,Town {i}\n' for i in range(5)))
+    NTATimeTable(*[path(f'{name}.csv') for name in ('stop_times', 'trips', 'routes', 'stops', 'calendar', 'routes_corridors', 'settlement_filter')],
+                 output_directory=path(out), **options).build()
+    with open(os.path.join(path(out), 'corridor_timetable_1.csv'), newline='') as f: return list(csv.reader(f))
+
+def _column(rows: list[list[str]], name: str) -> list[str]: return [row[rows[0].index(name)] for row in rows[1:]]
+
+def test_default_keeps_stop_sequence_and_merges_same_time_rows(tmp_path):
+    rows = _nta(tmp_path, _trips())
+    assert rows[0][:6] == ['direction_id', 'stop_id', 'stop_sequence', 'stop_name', 'county', 'settlement']
+    assert list(zip(_column(rows, 'direction_id'), _column(rows, 'stop_id'), _column(rows, 'stop_sequence'))) == [
+        ('0', 'S0', '1'), ('0', 'S1', '1'), ('0', 'S1', '2'), ('0', 'S2', '2'), ('0', 'S2', '3'), ('0', 'S4', '3'), ('0', 'S3', '4'),
+        ('1', 'S3', '1'), ('1', 'S2', '2'), ('1', 'S1', '3')]
+    # X1 calls at every stop at the same time as A1, the dedupe keeps one of the two
+    assert rows[0][6:-2] == ['1_R1_1', '1_R2_1', '1_R1_2', '7_R2_1', '1_R3_1']
+
+def test_stop_layout_is_opt_in_and_keeps_same_time_trips(tmp_path):
+    rows = _nta(tmp_path, _trips(), stop_layout=True)
+    assert list(zip(_column(rows, 'stop_id'), _column(rows, 'stop_sequence'))) == [
+        ('S0', '0'), ('S1', '1'), ('S2', '2'), ('S3', '3'), ('S4', '4'), ('S3', '0'), ('S2', '1'), ('S1', '2')]
+    assert rows[0][6:-2] == ['1_R1_1', '1_R1_3', '1_R2_1', '1_R1_2', '7_R2_1', '1_R3_1']
+    assert _column(rows, '1_R1_1')[:4] == _column(rows, '1_R1_3')[:4] == ['07:00:00', '07:05:00', '07:10:00', '07:15:00']
+
+def _low_memory_trips() -> list[tuple]:
+    return _trips() + [trip('R1', 'A3', ['S0', 'S1', 'S2', 'S3'], ['7:20:00', '7:25:00', '7:30:00', '7:35:00']),
+                       trip('R2', 'B3', ['S1', 'S2', 'S4'], ['23:50:00', '23:55:00', '24:10:00'])]
+
+@pytest.mark.parametrize('options', [{}, {'interpolate': True}, {'stop_layout': True}], ids=['default', 'interpolate', 'stop_layout'])
+def test_low_memory_output_matches_the_default(tmp_path, options):
+    default = _nta(tmp_path, _low_memory_trips(), 'default', **options)
+    assert _nta(tmp_path, _low_memory_trips(), 'low', low_memory=True, **options) == default
+    # chunks of 4 rows, the chunks of other corridors' trips come out empty
+    assert _nta(tmp_path, _low_memory_trips(), 'chunked', low_memory=True, chunksize=4, corridor_ids=[1], **options) == default
+
+def test_low_memory_reads_arrival_times_as_seconds(tmp_path):
+    write_feed(str(tmp_path), STOPS, _low_memory_trips())
+    with open(os.path.join(tmp_path, 'routes_corridors.csv'), 'w') as f: f.write('route_id,corridor_id\nR1,1\nR2,2\nR3,1\n')
+    with open(os.path.join(tmp_path, 'settlement_filter.csv'), 'w') as f: f.write('Corridor,settlement\n')
+    path = lambda name: os.path.join(tmp_path, name)
+    nta = NTATimeTable(*[path(f'{name}.csv') for name in ('stop_times', 'trips', 'routes', 'stops', 'calendar', 'routes_corridors', 'settlement_filter')],
+                       output_directory=path('out'), low_memory=True, chunksize=4, corridor_ids=['2'])
+    assert str(nta.stop_times_df['arrival_time'].dtype) == 'Int32'
+    assert set(nta.stop_times_df['trip_id']) == {'B1', 'B2', 'B3'}
+    assert nta.stop_times_df.loc[nta.stop_times_df['trip_id'] == 'B3', 'arrival_time'].tolist() == [85800, 86100, 87000]
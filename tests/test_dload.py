@@ -0,0 +1,93 @@
+from slighe.dload import GTFSLoadTXC, LoadCSVFiles
+
+import os
+
+import pytest
+
+TXC = """<?xml version="1.0" encoding="UTF-8"?>
+<TransXChange xmlns="http://www.transxchange.org.uk/">
+  <StopPoints>
+    <AnnotatedStopPointRef><StopPointRef>S1</StopPointRef><CommonName>First</CommonName></AnnotatedStopPointRef>
+    <AnnotatedStopPointRef><StopPointRef>S2</StopPointRef><CommonName>Second</CommonName></AnnotatedStopPointRef>
+    <AnnotatedStopPointRef><StopPointRef>S3</StopPointRef><CommonName>Third</CommonName></AnnotatedStopPointRef>
+  </StopPoints>
+  <JourneyPatternSections>
+    <JourneyPatternSection id="JPS1">
+      <JourneyPatternTimingLink id="L1">
+        <From><StopPointRef>S1</StopPointRef></From><To><StopPointRef>S2</StopPointRef><WaitTime>PT1M</WaitTime></To><RunTime>PT10M</RunTime>
+      </JourneyPatternTimingLink>
+      <JourneyPatternTimingLink id="L2">
+        <From><StopPointRef>S2</StopPointRef></From><To><StopPointRef>S3</StopPointRef></To><RunTime>PT5M</RunTime>
+      </JourneyPatternTimingLink>
+    </JourneyPatternSection>
+  </JourneyPatternSections>
+  <Operators><Operator id="O1"><OperatorShortName>Operator</OperatorShortName></Operator></Operators>
+  <Services>
+    <Service>
+      <ServiceCode>SVC</ServiceCode>
+      <Lines><Line id="L"><LineName>1</LineName></Line></Lines>
+      <OperatingPeriod><StartDate>2026-01-01</StartDate><EndDate>2026-12-31</EndDate></OperatingPeriod>
+      <OperatingProfile><RegularDayType><DaysOfWeek><MondayToFriday/></DaysOfWeek></RegularDayType></OperatingProfile>
+      <RegisteredOperatorRef>O1</RegisteredOperatorRef>
+      <StandardService>
+        <JourneyPattern id="JP1"><Direction>outbound</Direction><JourneyPatternSectionRefs>JPS1</JourneyPatternSectionRefs></JourneyPattern>
+      </StandardService>
+    </Service>
+  </Services>
+  <VehicleJourneys>
+    <VehicleJourney>
+      <VehicleJourneyCode>VJ_LATE</VehicleJourneyCode><ServiceRef>SVC</ServiceRef><LineRef>L</LineRef>
+      <VehicleJourneyRef>VJ_BASE</VehicleJourneyRef><DepartureTime>23:50:00</DepartureTime>
+    </VehicleJourney>
+    <VehicleJourney>
+      <VehicleJourneyCode>VJ_BASE</VehicleJourneyCode><ServiceRef>SVC</ServiceRef><LineRef>L</LineRef>
+      <JourneyPatternRef>JP1</JourneyPatternRef><DepartureTime>08:00:00</DepartureTime>
+    </VehicleJourney>
+    <VehicleJourney>
+      <VehicleJourneyCode>VJ_SLOW</VehicleJourneyCode><ServiceRef>SVC</ServiceRef><LineRef>L</LineRef>
+      <JourneyPatternRef>JP1</JourneyPatternRef><DepartureTime>09:00:00</DepartureTime>
+      <OperatingProfile><RegularDayType><DaysOfWeek><Monday/><Wednesday/></DaysOfWeek></RegularDayType></OperatingProfile>
+      <VehicleJourneyTimingLink><JourneyPatternTimingLinkRef>L1</JourneyPatternTimingLinkRef><RunTime>PT20M</RunTime></VehicleJourneyTimingLink>
+    </VehicleJourney>
+    <VehicleJourney>
+      <VehicleJourneyCode>VJ_NO_TIME</VehicleJourneyCode><ServiceRef>SVC</ServiceRef><LineRef>L</LineRef>
+      <JourneyPatternRef>JP1</JourneyPatternRef>
+    </VehicleJourney>
+  </VehicleJourneys>
+</TransXChange>
+"""
+
+@pytest.fixture
+def txc(tmp_path) -> GTFSLoadTXC:
+    file_path = os.path.join(tmp_path, 'service.xml')
+    with open(file_path, 'w') as f: f.write(TXC)
+    return GTFSLoadTXC(file_path)
+
+def _stop_times(txc: GTFSLoadTXC, trip_id: str) -> list[tuple]:
+    return [(row['stop_id'], row['arrival_time'], row['departure_time']) for row in txc.load(LoadCSVFiles.STOP_TIMES) if row['trip_id'] == trip_id]
+
+def test_journey_pattern_times(txc):
+    assert _stop_times(txc, 'SVC:VJ_BASE') == [('S1', '08:00:00', '08:00:00'), ('S2', '08:10:00', '08:11:00'), ('S3', '08:16:00', '08:16:00')]
+    assert [row['stop_id'] for row in txc.load(LoadCSVFiles.STOPS)] == ['S1', 'S2', 'S3']
+    assert [row['route_id'] for row in txc.load(LoadCSVFiles.ROUTES)] == ['SVC_L']
+
+def test_vehicle_journey_ref_defined_after_its_use_and_times_past_midnight(txc):
+    assert _stop_times(txc, 'SVC:VJ_LATE') == [('S1', '23:50:00', '23:50:00'), ('S2', '24:00:00', '24:01:00'), ('S3', '24:06:00', '24:06:00')]
+
+def test_timing_link_run_time_override(txc):
+    assert _stop_times(txc, 'SVC:VJ_SLOW') == [('S1', '09:00:00', '09:00:00'), ('S2', '09:20:00', '09:21:00'), ('S3', '09:26:00', '09:26:00')]
+
+def test_custom_day_mask_gets_its_own_service_id(txc):
+    service_ids = {row['trip_id']: row['service_id'] for row in txc.load(LoadCSVFiles.TRIPS)}
+    assert service_ids == {'SVC:VJ_BASE': '1', 'SVC:VJ_SLOW': '105', 'SVC:VJ_LATE': '1'}
+    calendar = {row['service_id']: [row[day] for day in ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')]
+                for row in txc.load(LoadCSVFiles.CALENDAR)}
+    assert calendar == {'1': ['1', '1', '1', '1', '1', '0', '0'], '105': ['1', '0', '1', '0', '0', '0', '0']}
+
+def test_journeys_without_departure_time_are_skipped(tmp_path, capsys):
+    file_path = os.path.join(tmp_path, 'service.xml')
+    with open(file_path, 'w') as f: f.write(TXC)
+    txc = GTFSLoadTXC(file_path)
+    out = capsys.readouterr().out
+    assert 'SVC:VJ_NO_TIME' not in {row['trip_id'] for row in txc.load(LoadCSVFiles.TRIPS)}
+    assert 'VJ_NO_TIME' in out and 'MON+WED' in out and 'service_id 105' in out
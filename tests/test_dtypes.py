@@ -0,0 +1,37 @@
+from slighe.constructors import CorridorConstructor, CorrdidorTimetableConstructor
+from slighe.dtypes import ServiceTypes
+
+from conftest import stop, trip
+
+import pickle
+
+import pytest
+
+@pytest.fixture
+def corridor(feed):
+    stops = [stop('A', 53.00, settlement='Town A'), stop('B', 53.01, settlement='Town B'), stop('C', 53.02, settlement='Town C')]
+    trips = [trip('R1', 'T0800', ['A', 'B', 'C'], ['08:00:00', '08:10:00', '08:20:00']),
+             trip('R1', 'T0900', ['A', 'B', 'C'], ['', '09:10:00', '09:20:00']),
+             trip('R1', 'T2330', ['A', 'B', 'C'], ['23:30:00', '23:50:00', '24:10:00']),
+             trip('R1', 'TSAT', ['A', 'B', 'C'], ['10:00:00', '10:10:00', '10:20:00'], service_id='7')]
+    return CorridorConstructor(1, 'test', ['R1'], feed(stops, trips)).build()
+
+def _trip_columns(view) -> list[str]: return [c for c in view.columns if c.startswith('T')]
+
+def test_index_takes_the_first_time_of_each_trip(corridor):
+    corridor_timetable = CorrdidorTimetableConstructor(corridor).build()
+    index = corridor_timetable.index
+    assert list(zip(index.times, index.time_keys)) == [(8 * 3600, 'T0800'), (9 * 3600 + 600, 'T0900'), (10 * 3600, 'TSAT'), (23 * 3600 + 1800, 'T2330')]
+    assert _trip_columns(corridor_timetable.filter_by(time=('08:30:00', '12:00:00'), service_type=[ServiceTypes.MON_FRI])) == ['T0900']
+    assert _trip_columns(corridor_timetable.filter_by(time=(23 * 3600, None))) == ['T2330']
+
+def test_filter_by_rows_at_settlement(corridor):
+    view = CorrdidorTimetableConstructor(corridor, layout=True).build().filter_by(settlement=['Town B'], time=('08:00:00', '08:30:00'))
+    assert [row['stop_id'] for row in view] == ['B'] and _trip_columns(view) == ['T0800']
+
+def test_index_of_a_pickled_timetable_reads_the_columns(corridor):
+    corridor_timetable = CorrdidorTimetableConstructor(corridor).build()
+    unpickled = pickle.loads(pickle.dumps(corridor_timetable))
+    unpickled._index = None
+    assert all(not trip.stop_times for trip in unpickled.trips)
+    assert unpickled.index.time_keys == corridor_timetable.index.time_keys and unpickled.index.times == corridor_timetable.index.times
@@ -0,0 +1,94 @@
+from slighe.constructors import CorridorConstructor, CorrdidorTimetableConstructor
+from slighe.dtypes import CorridorTimetable, _to_runs, _from_runs
+from slighe.transforms import TimeTransforms
+
+from conftest import stop, trip
+
+import csv
+import os
+
+import pytest
+
+def _trip(route_id: str, trip_id: str, start: str, service_id: str = '1', stops: list[str] = ('A', 'B', 'C')) -> tuple:
+    t = TimeTransforms.ts_to_seconds(start)
+    return trip(route_id, trip_id, list(stops), [TimeTransforms.ts_from_seconds(t + 300 * n) for n in range(len(stops))], service_id=service_id)
+
+def _timetable(feed, trips: list[tuple], route_ids: list[str], layout: bool = True) -> CorridorTimetable:
+    stops = [stop(stop_id, 53 + n / 100) for n, stop_id in enumerate(['A', 'B', 'C', 'D'])]
+    return CorrdidorTimetableConstructor(CorridorConstructor(1, 'test', route_ids, feed(stops, trips)).build(), layout=layout).build()
+
+def _frequencies(file_path: str) -> list[list[str]]:
+    with open(CorridorTimetable._frequencies_path(file_path), newline='') as f: return list(csv.reader(f))
+
+def _round_trip(corridor_timetable: CorridorTimetable, directory: str) -> list:
+    plain, compact, expanded = (os.path.join(directory, name) for name in ('plain.csv', 'compact.csv', 'expanded.csv'))
+    corridor_timetable.to_csv(plain)
+    blocks = corridor_timetable.to_frequency_csv(compact)
+    CorridorTimetable.expand_frequency_csv(compact, expanded)
+    with open(plain, 'rb') as a, open(expanded, 'rb') as b: assert a.read() == b.read()
+    assert len(_frequencies(compact)) == len(blocks) + 1
+    return blocks
+
+def test_constant_headway_becomes_one_block(feed, tmp_path):
+    trips = [_trip('R1', f'T{n}', f'07:{10 * n:02d}:00') for n in range(6)]
+    blocks = _round_trip(_timetable(feed, trips, ['R1']), str(tmp_path))
+    assert [(b.trip_ids, b.headway, b.start, b.end) for b in blocks] == [(tuple(f'T{n}' for n in range(6)), 600, 7 * 3600, 7 * 3600 + 3000)]
+    assert _frequencies(os.path.join(tmp_path, 'compact.csv'))[1] == ['block_0', 'R1', '1', '07:00:00', '07:50:00', '600', 'T0,T1,T2,T3,T4,T5', '0:5:1']
+
+def test_mixed_services_get_their_own_blocks(feed, tmp_path):
+    trips = ([_trip('R1', f'W{n}', f'07:{10 * n:02d}:00') for n in range(6)]
+             + [_trip('R1', f'S{n}', f'07:{10 * n + 5:02d}:00', service_id='7') for n in range(6)])
+    blocks = _round_trip(_timetable(feed, trips, ['R1']), str(tmp_path))
+    assert [(b.service_id, len(b.trip_ids), b.headway) for b in blocks] == [(1, 6, 600), (7, 6, 600)]
+
+def test_routes_and_stop_patterns_split_blocks(feed, tmp_path):
+    trips = ([_trip('R1', f'T{n}', f'07:{10 * n:02d}:00') for n in range(3)]
+             + [_trip('R2', f'U{n}', f'07:{10 * n + 30:02d}:00') for n in range(3)]
+             + [_trip('R1', f'V{n}', f'08:{10 * n + 30:02d}:00', stops=['A', 'B', 'D']) for n in range(3)])
+    blocks = _round_trip(_timetable(feed, trips, ['R1', 'R2']), str(tmp_path))
+    assert {(b.route_id, b.trip_ids) for b in blocks} == {('R1', ('T0', 'T1', 'T2')), ('R1', ('V0', 'V1', 'V2')), ('R2', ('U0', 'U1', 'U2'))}
+
+def test_trips_sharing_a_start_time_run_in_parallel_blocks(feed, tmp_path):
+    trips = [_trip('R1', f'T{n}', f'07:{10 * n:02d}:00') for n in range(4)] + [_trip('R1', f'X{n}', f'07:{10 * n:02d}:00') for n in range(4)]
+    blocks = _round_trip(_timetable(feed, trips, ['R1']), str(tmp_path))
+    assert [(b.trip_ids, b.headway) for b in blocks] == [(('T0', 'T1', 'T2', 'T3'), 600), (('X0', 'X1', 'X2', 'X3'), 600)]
+
+def test_irregular_times_and_odd_trip_ids_round_trip(feed, tmp_path):
+    trips = [_trip('R1', 'T 0, first', '07:00:00'), _trip('R1', 'T1', '07:10:00'), _trip('R1', 'T2', '07:25:00'), _trip('R1', 'T3', '23:55:00')]
+    corridor_timetable = _timetable(feed, trips, ['R1'])
+    corridor_timetable.timetable[1]['T1'] = ''
+    blocks = _round_trip(corridor_timetable, str(tmp_path))
+    assert sorted(trip_id for b in blocks for trip_id in b.trip_ids) == ['T 0, first', 'T1', 'T2', 'T3']
+
+def test_runs_shorter_than_min_trips_are_single_trips(feed):
+    corridor_timetable = _timetable(feed, [_trip('R1', f'T{n}', f'07:{10 * n:02d}:00') for n in range(3)], ['R1'])
+    assert [len(b.trip_ids) for b in corridor_timetable.frequency_blocks(min_trips=3)] == [3]
+    assert [(len(b.trip_ids), b.headway) for b in corridor_timetable.frequency_blocks(min_trips=4)] == [(1, 0), (1, 0), (1, 0)]
+
+def test_frequency_blocks_need_the_layout(feed):
+    corridor_timetable = _timetable(feed, [_trip('R1', f'T{n}', f'07:{10 * n:02d}:00') for n in range(3)], ['R1'], layout=False)
+    with pytest.raises(ValueError, match='layout=True'): corridor_timetable.frequency_blocks()
+
+@pytest.mark.parametrize('positions', [(), (4,), (0, 1), (0, 1, 2, 3), (0, 2, 4, 5, 9, 8, 7, 1), (6, 3, 0, 10, 11)])
+def test_columns_round_trip_as_runs(positions):
+    assert tuple(_from_runs(_to_runs(positions))) == positions
+
+def test_interleaved_columns_are_one_run(feed, tmp_path):
+    trips = [_trip('R1', f'T{n}', f'07:{10 * n:02d}:00', service_id='1' if n % 2 else '7') for n in range(6)]
+    _round_trip(_timetable(feed, trips, ['R1']), str(tmp_path))
+    assert [row[-1] for row in _frequencies(os.path.join(tmp_path, 'compact.csv'))[1:]] == ['0:4:2', '1:5:2']
+
+def test_a_stale_frequencies_file_raises(feed, tmp_path):
+    compact, other, expanded = (os.path.join(tmp_path, name) for name in ('compact.csv', 'other.csv', 'expanded.csv'))
+    _timetable(feed, [_trip('R1', f'T{n}', f'07:{10 * n:02d}:00') for n in range(6)], ['R1']).to_frequency_csv(compact)
+    _timetable(feed, [_trip('R1', f'T{n}', f'07:{10 * n:02d}:00') for n in range(4)] + [_trip('R1', 'X', '09:03:00')], ['R1']).to_frequency_csv(other)
+    with open(CorridorTimetable._frequencies_path(other)) as a, open(CorridorTimetable._frequencies_path(compact), 'w') as b: b.write(a.read())
+    with pytest.raises(ValueError, match='does not match'): CorridorTimetable.expand_frequency_csv(compact, expanded)
+
+    rows = _frequencies(other)
+    rows[1][-2] = 'T0,T1,T2'
+    with open(CorridorTimetable._frequencies_path(other), 'w', newline='') as f: csv.writer(f).writerows(rows)
+    with pytest.raises(ValueError, match='block_0 has 3 trip_ids and 4 columns'): CorridorTimetable.expand_frequency_csv(other, expanded)
+
+    with open(CorridorTimetable._frequencies_path(other), 'w', newline='') as f: f.write('block_id,trip_id,column\nblock_0,T0,0\n')
+    with pytest.raises(ValueError, match='not a frequencies file'): CorridorTimetable.expand_frequency_csv(other, expanded)
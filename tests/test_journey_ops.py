@@ -0,0 +1,38 @@
+from slighe.ops.journey_ops import RaptorPlanner, active_service_ids
+from slighe.transforms import TimeTransforms
+from slighe.dtypes import ServiceTypes
+
+from datetime import date
+
+import pytest
+
+def test_earliest_arrival_transfers_over_a_walk(network):
+    planner = RaptorPlanner.from_loader(network, service_types=[ServiceTypes.MON_FRI])
+    journey = planner.earliest_arrival('A', 'D', '08:00:00')
+    assert TimeTransforms.ts_from_seconds(journey.arrival_time) == '08:40:00'
+    assert [(leg.kind, leg.from_stop, leg.to_stop) for leg in journey.legs] == [('trip', 'A', 'C'), ('walk', 'C', 'C2'), ('trip', 'C2', 'D')]
+    assert [leg.trip_id for leg in journey.legs if leg.kind == 'trip'] == ['R1_0800', 'R2_0825']
+    assert journey.transfers == 1
+
+def test_earliest_arrival_takes_the_direct_trip_once_the_connection_is_missed(network):
+    planner = RaptorPlanner.from_loader(network, service_types=[ServiceTypes.MON_FRI])
+    journey = planner.earliest_arrival('A', 'D', '08:01:00')
+    assert journey.arrival_time == TimeTransforms.ts_to_seconds('09:00:00')
+    assert [leg.trip_id for leg in journey.legs] == ['R3_0805']
+    assert journey.transfers == 0
+
+def test_max_rounds_limits_the_trips_taken(network):
+    planner = RaptorPlanner.from_loader(network, service_types=[ServiceTypes.MON_FRI])
+    assert [leg.trip_id for leg in planner.earliest_arrival('A', 'D', '08:00:00', max_rounds=1).legs] == ['R3_0805']
+
+def test_unreachable_and_unknown_stops(network):
+    planner = RaptorPlanner.from_loader(network)
+    assert planner.earliest_arrival('A', 'E', '08:00:00') is None
+    assert planner.earliest_arrival('D', 'A', '08:00:00') is None
+    with pytest.raises(KeyError): planner.earliest_arrival('A', 'nowhere', '08:00:00')
+
+def test_service_date_selects_the_saturday_trips(network):
+    assert active_service_ids(network, date(2026, 10, 17)) == {'7'}
+    planner = RaptorPlanner.from_loader(network, service_date=date(2026, 10, 17))
+    assert [leg.trip_id for leg in planner.earliest_arrival('A', 'D', '06:50:00').legs] == ['R3_SAT']
+    assert planner.earliest_arrival('A', 'D', '08:00:00') is None
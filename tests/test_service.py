@@ -0,0 +1,105 @@
+from slighe.service import FeedService
+from slighe import constructors
+from slighe import dload
+from slighe import _context
+
+from conftest import FEED_FILES, stop, trip, write_feed
+
+from typing import Callable
+import asyncio
+import json
+import os
+import threading
+import time
+
+import pytest
+
+STOPS = [stop('A', 53.00, settlement='Town A'), stop('B', 53.01), stop('C', 53.02)]
+
+def _trips(start: str = '08') -> list[tuple]:
+    return [trip('R1', 'T1', ['A', 'B', 'C'], [f'{start}:00:00', f'{start}:10:00', f'{start}:20:00']),
+            trip('R1', 'T2', ['A', 'B', 'C'], [f'{start}:30:00', f'{start}:40:00', f'{start}:50:00'])]
+
+@pytest.fixture
+def loader_factory(tmp_path) -> Callable[[], dload.GTFSLoadCSV]:
+    write_feed(str(tmp_path), STOPS, _trips())
+    return lambda: dload.GTFSLoadCSV(*[os.path.join(tmp_path, f'{name}.csv') for name in FEED_FILES])
+
+async def _request(port: int, target: str, method: str = 'GET') -> tuple[int, dict]:
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f'{method} {target} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode('latin_1'))
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b'\r\n\r\n')
+    return int(head.split()[1]), json.loads(body)
+
+def _serve(loader_factory: Callable, test: Callable) -> None:
+    """
+    starts a FeedService on an ephemeral port, awaits test(service, port) and closes it
+    """
+    async def run() -> None:
+        service = FeedService(loader_factory, port=0)
+        await service.start()
+        try: await test(service, service._server.sockets[0].getsockname()[1])
+        finally: await service.close()
+    asyncio.run(run())
+
+def test_corridor_and_health(loader_factory):
+    async def test(service: FeedService, port: int) -> None:
+        status, rows = await _request(port, '/corridor?corridor_id=1&routes=R1&layout=1&start=08:15:00')
+        assert status == 200
+        assert [(row['stop_id'], row['T2']) for row in rows] == [('A', '08:30:00'), ('B', '08:40:00'), ('C', '08:50:00')]
+        assert all('T1' not in row for row in rows)
+        status, health = await _request(port, '/health')
+        assert status == 200 and health['version'] == service.state.version and health['inflight'] == 0
+    _serve(loader_factory, test)
+
+@pytest.mark.parametrize('method, target, status', [
+    ('GET', '/corridor?routes=R1', 400),
+    ('GET', '/corridor?corridor_id=1', 400),
+    ('GET', '/corridor?corridor_id=1&routes=R1&start=8', 400),
+    ('GET', '/frequency?stop_id=A&routes=R1&end=eight', 400),
+    ('GET', '/frequency?stop_id=A&routes=R1&service_type=SOMEDAY', 400),
+    ('GET', '/frequency?stop_id=Z&routes=R1', 404),
+    ('GET', '/trip?trip_id=T9', 404),
+    ('GET', '/timetable', 404),
+    ('PUT', '/corridor?corridor_id=1&routes=R1', 405)])
+def test_error_codes(loader_factory, method, target, status):
+    async def test(service: FeedService, port: int) -> None:
+        got, body = await _request(port, target, method)
+        assert (got, set(body)) == (status, {'error'})
+    _serve(loader_factory, test)
+
+def test_identical_concurrent_requests_build_once(loader_factory, monkeypatch):
+    builds, build = [], constructors.CorrdidorTimetableConstructor.build
+
+    def slow_build(self):
+        builds.append(threading.get_ident())
+        time.sleep(0.2)
+        return build(self)
+    monkeypatch.setattr(constructors.CorrdidorTimetableConstructor, 'build', slow_build)
+
+    async def test(service: FeedService, port: int) -> None:
+        _context.reset(); _context.enable()
+        try: responses = await asyncio.gather(*[_request(port, '/corridor?corridor_id=1&routes=R1') for _ in range(8)])
+        finally: _context.disable()
+        assert [status for status, _ in responses] == [200] * 8
+        assert all(rows == responses[0][1] for _, rows in responses)
+        assert len(builds) == 1 and _context.counters()['service.coalesced'] == 7
+        _context.reset()
+    _serve(loader_factory, test)
+
+def test_reload_swaps_in_the_changed_feed(loader_factory, tmp_path):
+    async def test(service: FeedService, port: int) -> None:
+        before = service.state.version
+        _, trip = await _request(port, '/trip?trip_id=T1')
+        assert trip[0]['stop_time'] == '08:00:00'
+        time.sleep(0.01)
+        write_feed(str(tmp_path), STOPS, _trips('09'))
+        status, body = await _request(port, '/reload', 'POST')
+        assert status == 200 and body['version'] != before and service.state.version == body['version']
+        _, trip = await _request(port, '/trip?trip_id=T1')
+        assert trip[0]['stop_time'] == '09:00:00'
+        assert (await _request(port, '/health'))[1]['version'] == body['version']
+    _serve(loader_factory, test)
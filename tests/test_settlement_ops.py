@@ -0,0 +1,56 @@
+from slighe.ops.settlement_ops import profile_travel_times, settlement_matrix, read_matrix
+from slighe.ops.journey_ops import RaptorPlanner
+from slighe.dtypes import ServiceTypes
+
+from array import array
+import math
+import os
+
+SETTLEMENTS = ['Town A', 'Town C', 'Town D', 'Town E']
+EXPECTED = [[0, 1200, 2400, math.inf],
+            [math.inf, 0, 900, math.inf],
+            [math.inf, math.inf, 0, math.inf],
+            [math.inf, math.inf, math.inf, 0]]
+
+def _matrix(network, output_path: str, **kwargs) -> list[str]:
+    return settlement_matrix(network, output_path, '08:00:00', '09:30:00', service_types=[ServiceTypes.MON_FRI], processes=1, **kwargs)
+
+def test_profile_travel_times_keeps_the_fastest_departure(network):
+    planner = RaptorPlanner.from_loader(network, service_types=[ServiceTypes.MON_FRI])
+    index = planner.stop_index
+    travel = profile_travel_times(planner, [index['A']], 8 * 3600, 9 * 3600)
+    assert travel[index['A']] == 0 and travel[index['C']] == 1200 and travel[index['D']] == 2400
+    assert index['E'] not in travel
+    # only the 08:05 direct trip departs in the window
+    assert profile_travel_times(planner, [index['A']], 8 * 3600 + 60, 8 * 3600 + 600)[index['D']] == 3300
+
+def test_settlement_matrix_rows_and_read_matrix(network, tmp_path):
+    output_path = os.path.join(tmp_path, 'matrix.f32')
+    assert _matrix(network, output_path) == SETTLEMENTS
+    names, rows = read_matrix(output_path)
+    assert names == SETTLEMENTS
+    assert [list(row) for row in rows] == EXPECTED
+    assert os.path.getsize(output_path) == len(SETTLEMENTS) ** 2 * array('f').itemsize
+
+def _write_row(output_path: str, row: int, values: list[float]) -> None:
+    with open(output_path, 'r+b') as f:
+        f.seek(row * len(values) * array('f').itemsize)
+        f.write(array('f', values).tobytes())
+
+def test_settlement_matrix_resumes_rows_not_written_yet(network, tmp_path):
+    output_path = os.path.join(tmp_path, 'matrix.f32')
+    _matrix(network, output_path)
+    _write_row(output_path, 0, [0, 1, 2, 3])              # a finished row, its diagonal is set
+    _write_row(output_path, 1, [math.nan] * 4)            # a row the interrupted run never reached
+    _matrix(network, output_path)
+    assert [list(row) for row in read_matrix(output_path)[1]] == [[0, 1, 2, 3]] + EXPECTED[1:]
+
+    _matrix(network, output_path, resume=False)
+    assert [list(row) for row in read_matrix(output_path)[1]] == EXPECTED
+
+def test_settlement_matrix_restarts_when_the_query_changes(network, tmp_path):
+    output_path = os.path.join(tmp_path, 'matrix.f32')
+    _matrix(network, output_path)
+    _write_row(output_path, 0, [0, 1, 2, 3])
+    settlement_matrix(network, output_path, '08:00:00', '08:30:00', service_types=[ServiceTypes.MON_FRI], processes=1)
+    assert list(read_matrix(output_path)[1][0]) == [0, 1200, 2400, math.inf]
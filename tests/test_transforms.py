@@ -0,0 +1,46 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from slighe.transforms import TimeTransforms
+from slighe.constructors import CorridorConstructor, CorrdidorTimetableConstructor
+
+from conftest import stop, trip
+
+nan = float('nan')
+
+def _interpolate(seconds: list[float], latitude: list[float], trips: list[int]) -> list[float]:
+    return TimeTransforms.interpolate_seconds(np.array(seconds), np.array(latitude), np.full(len(latitude), -6.0), np.array(trips)).tolist()
+
+def test_blank_times_are_weighted_by_distance():
+    # 0.01, 0.02 then 0.01 degrees of latitude between the stops
+    filled = _interpolate([0, nan, nan, 400], [53.00, 53.01, 53.03, 53.04], [0, 0, 0, 0])
+    assert filled == [0, 100, 300, 400]
+
+def test_known_times_are_kept_and_filled_ones_rounded():
+    filled = _interpolate([10, nan, 11, nan, 20.5], [53.00, 53.01, 53.02, 53.03, 53.04], [0] * 5)
+    assert filled[0] == 10 and filled[2] == 11 and filled[4] == 20.5
+    assert filled[1] == 10 and filled[3] == 16
+
+def test_blanks_outside_the_timepoints_of_a_trip_stay_blank():
+    filled = _interpolate([nan, 100, nan, 300, nan, nan, 1000, nan, 1200],
+                          [53.00, 53.01, 53.02, 53.03, 53.04, 53.00, 53.01, 53.02, 53.03], [0, 0, 0, 0, 0, 1, 1, 1, 1])
+    assert np.isnan(filled[0]) and np.isnan(filled[4]) and np.isnan(filled[5])
+    assert filled[2] == 200 and filled[7] == 1100
+
+def test_stops_at_one_place_fall_back_to_stop_position():
+    assert _interpolate([0, nan, nan, 300], [53.0, 53.0, 53.0, 53.0], [0, 0, 0, 0]) == [0, 100, 200, 300]
+
+def test_interpolate_times_fills_the_layout_timetable(feed):
+    stops = [stop('A', 53.00), stop('B', 53.01), stop('C', 53.03), stop('D', 53.04), stop('E', 53.05)]
+    trips = [trip('R1', 'T1', ['A', 'B', 'C', 'D'], ['08:00:00', '', '', '08:40:00']),
+             trip('R1', 'T2', ['B', 'C', 'E'], ['', '09:00:00', '09:10:00'])]
+    corridor = CorridorConstructor(1, 'test', ['R1'], feed(stops, trips)).build()
+    corridor_timetable = CorrdidorTimetableConstructor(corridor, layout=True).build().interpolate_times()
+    assert [(row['stop_id'], row['T1'], row['T2']) for row in corridor_timetable.timetable] == [
+        ('A', '08:00:00', 0), ('B', '08:10:00', ''), ('C', '08:30:00', '09:00:00'), ('D', '08:40:00', 0), ('E', 0, '09:10:00')]
+    assert corridor_timetable.index.time_keys == ['T1', 'T2']
+
+def test_interpolate_times_needs_the_layout(feed):
+    corridor = CorridorConstructor(1, 'test', ['R1'], feed([stop('A', 53.0), stop('B', 53.01)], [trip('R1', 'T1', ['A', 'B'], ['08:00:00', '08:10:00'])])).build()
+    with pytest.raises(ValueError): CorrdidorTimetableConstructor(corridor).build().interpolate_times()
@@ -0,0 +1,62 @@
+import pytest
+
+pytest.importorskip('pandas')
+
+from slighe.ops.validate_ops import validate_feed, ERROR, WARNING
+
+from conftest import stop, trip, write_feed
+
+import os
+
+def _stops() -> list[dict]: return [stop('A', 53.00), stop('B', 53.01), stop('C', 53.02)]
+
+def _trips() -> list[tuple[dict, list[dict]]]:
+    return [trip('R1', 'T1', ['A', 'B', 'C'], ['08:00:00', '08:10:00', '08:20:00']),
+            trip('R1', 'T2', ['A', 'B', 'C'], ['24:50:00', '', '25:10:00'])]
+
+def _validate(tmp_path, stops: list[dict], trips: list[tuple[dict, list[dict]]]):
+    write_feed(str(tmp_path), stops, trips, routes=[{'route_id': 'R1', 'agency_id': 'A', 'route_short_name': '1', 'route_long_name': 'one', 'route_type': '3'}])
+    return validate_feed(str(tmp_path))
+
+def test_clean_feed_passes(tmp_path):
+    report = _validate(tmp_path, _stops(), _trips())
+    assert report.ok and not report.results
+    assert report.rows['stop_times'] == 6
+
+def _set(rows: list[dict], n: int, **values) -> None: rows[n].update(values)
+
+# (rule, table, severity, change to the clean feed, csv line of the first offending row)
+CASES = [('trip_route', 'trips', ERROR, lambda stops, trips: _set([t for t, _ in trips], 1, route_id='R9'), 3),
+         ('trip_service', 'trips', ERROR, lambda stops, trips: _set([t for t, _ in trips], 0, service_id='99'), 2),
+         ('stop_time_trip', 'stop_times', ERROR, lambda stops, trips: _set(trips[1][1], 2, trip_id='T9'), 7),
+         ('stop_time_stop', 'stop_times', ERROR, lambda stops, trips: _set(trips[0][1], 1, stop_id='Z'), 3),
+         ('trip_without_stop_times', 'trips', WARNING, lambda stops, trips: trips.append((trip('R1', 'T3', [], [])[0], [])), 4),
+         ('duplicate_key', 'stops', ERROR, lambda stops, trips: stops.append(stop('B', 53.5)), 5),
+         ('duplicate_key', 'stop_times', ERROR, lambda stops, trips: _set(trips[0][1], 2, stop_sequence='2'), 4),
+         ('unparseable_time', 'stop_times', ERROR, lambda stops, trips: _set(trips[0][1], 1, arrival_time='8:1O:00'), 3),
+         ('unparseable_stop_sequence', 'stop_times', ERROR, lambda stops, trips: _set(trips[0][1], 1, stop_sequence='two'), 3),
+         ('time_travel', 'stop_times', ERROR, lambda stops, trips: _set(trips[0][1], 2, arrival_time='08:05:00', departure_time='08:05:00'), 4),
+         ('departure_before_arrival', 'stop_times', ERROR, lambda stops, trips: _set(trips[0][1], 1, departure_time='08:09:00'), 3),
+         ('missing_endpoint_time', 'stop_times', ERROR, lambda stops, trips: _set(trips[1][1], 2, arrival_time='', departure_time=''), 7)]
+
+@pytest.mark.parametrize('rule, table, severity, change, line', CASES, ids=[f'{case[0]}-{case[1]}' for case in CASES])
+def test_rule_finds_the_bad_row(tmp_path, rule, table, severity, change, line):
+    stops, trips = _stops(), _trips()
+    change(stops, trips)
+    report = _validate(tmp_path, stops, trips)
+    result = next(r for r in report.results if r.rule == rule and r.table == table)
+    assert (result.severity, result.sample[0]['row']) == (severity, line)
+    assert report.ok == (severity == WARNING)
+
+def test_missing_column_skips_the_rules_that_need_it(tmp_path):
+    write_feed(str(tmp_path), _stops(), _trips())
+    with open(os.path.join(tmp_path, 'routes.csv'), 'w') as f: f.write('agency_id,route_short_name\nA,1\n')
+    report = validate_feed(str(tmp_path))
+    assert [(r.rule, r.table, r.sample) for r in report.results] == [('missing_column', 'routes', [{'column': 'route_id'}])]
+    assert not report.ok
+
+def test_loaded_feed_is_validated_the_same(tmp_path):
+    stops, trips = _stops(), _trips()
+    _set(trips[0][1], 1, departure_time='08:09:00')
+    report = validate_feed(write_feed(str(tmp_path), stops, trips))
+    assert [(r.rule, r.count) for r in report.results] == [('departure_before_arrival', 1)]
@@ -1,6 +1,6 @@
-from dtypes import Corridor
-from dload import GTFSLoadCSV
-from constructors import CorridorConstructor, CorrdidorTimetableConstructor
+from slighe.dtypes import Corridor
+from slighe.dload import GTFSLoadCSV
+from slighe.constructors import CorridorConstructor, CorrdidorTimetableConstructor
 
 import csv
 